@@ -0,0 +1,341 @@
+"""
+Generate synthetic CMS Open Payments detail CSVs, zipped like a PGYR archive.
+
+Headers come from the schemas the DAGs parse with, every value is quoted
+as in the published files, free-text columns carry embedded commas, quotes
+and newlines, and manufacturers, recipients and teaching hospitals are drawn
+from pools with CMS-like cardinality and skew, so converter timings and
+Parquet sizes are representative without downloading a real archive.
+
+Usage:
+    python benchmarks/generate_cms_data.py /tmp/cms_synth --rows 1000000
+    python benchmarks/generate_cms_data.py /tmp/cms_synth --rows GNRL=100000000 RSRCH=1000000 --year 2019
+"""
+import argparse
+import datetime
+import os
+import re
+import sys
+import time
+import zipfile
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dags'))
+
+from cms_utils.schemas import DTYPE_DICT_GNRL, DTYPE_DICT_OWNRSHP, DTYPE_DICT_RSRCH  # noqa: E402
+
+FILE_COLUMNS = {
+    "RSRCH": list(DTYPE_DICT_RSRCH),
+    "GNRL": list(DTYPE_DICT_GNRL),
+    "OWNRSHP": list(DTYPE_DICT_OWNRSHP),
+}
+# Publication id stamped into the archive and member names, as in PGYR2019_P01302025_01212025.zip
+PUBLICATION = "P01302025_01212025"
+# Rows built in memory and appended to the CSV at a time
+BATCH_ROWS = 100_000
+
+# Number of distinct manufacturers/GPOs and teaching hospitals in a typical program year
+MANUFACTURERS = 1_800
+HOSPITALS = 1_200
+
+STATES = [
+    "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "DC", "FL", "GA", "HI", "ID", "IL", "IN", "IA", "KS",
+    "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ", "NM", "NY", "NC",
+    "ND", "OH", "OK", "OR", "PA", "RI", "SC", "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY",
+    "PR", "GU", "VI", "AP", "AE",
+]
+CITIES = [
+    "NEW YORK", "HOUSTON", "CHICAGO", "LOS ANGELES", "BOSTON", "PHILADELPHIA", "SAN DIEGO", "DALLAS",
+    "MIAMI", "ATLANTA", "SEATTLE", "DENVER", "NASHVILLE", "COLUMBUS", "ROCHESTER", "CLEVELAND",
+    "PITTSBURGH", "BALTIMORE", "SAINT LOUIS", "PORTLAND", "SALT LAKE CITY", "ANN ARBOR", "DURHAM",
+    "BIRMINGHAM", "LOUISVILLE", "OMAHA", "MADISON", "RICHMOND", "SACRAMENTO", "TAMPA",
+]
+FIRST_NAMES = [
+    "JAMES", "MARY", "ROBERT", "PATRICIA", "JOHN", "JENNIFER", "MICHAEL", "LINDA", "DAVID", "ELIZABETH",
+    "WILLIAM", "BARBARA", "RICHARD", "SUSAN", "JOSEPH", "JESSICA", "THOMAS", "SARAH", "CHARLES", "KAREN",
+    "WEI", "PRIYA", "AHMED", "MARIA", "JOSE", "ANH", "OLUWASEUN", "YUKI", "RAJESH", "ELENA",
+]
+LAST_NAMES = [
+    "SMITH", "JOHNSON", "WILLIAMS", "BROWN", "JONES", "GARCIA", "MILLER", "DAVIS", "RODRIGUEZ", "MARTINEZ",
+    "HERNANDEZ", "LOPEZ", "GONZALEZ", "WILSON", "ANDERSON", "THOMAS", "TAYLOR", "MOORE", "JACKSON", "MARTIN",
+    "LEE", "PEREZ", "THOMPSON", "WHITE", "HARRIS", "SANCHEZ", "CLARK", "RAMIREZ", "LEWIS", "ROBINSON",
+    "NGUYEN", "PATEL", "KIM", "CHEN", "O'BRIEN", "SINGH", "WANG", "COHEN", "MURPHY", "ROSSI",
+]
+STREETS = ["MAIN ST", "OAK AVE", "MEDICAL CENTER DR", "UNIVERSITY BLVD", "PARK AVE", "HOSPITAL RD"]
+WORDS = [
+    "randomized", "phase", "III", "study", "of", "efficacy", "safety", "patients", "with", "advanced",
+    "oncology", "cardiology", "device", "open-label", "multicenter", "trial", "evaluating", "treatment",
+    "chronic", "placebo-controlled", "registry", "long-term", "follow-up", "pediatric", "dose",
+]
+CATEGORIES = {
+    "Change_Type": ["UNCHANGED", "NEW", "CHANGED", "ADDED"],
+    "Covered_Recipient_Type": ["Covered Recipient Physician", "Covered Recipient Teaching Hospital",
+                               "Covered Recipient Non-Physician Practitioner"],
+    "Primary_Type": ["Medical Doctor", "Doctor of Osteopathy", "Nurse Practitioner", "Physician Assistant",
+                     "Doctor of Dentistry", "Doctor of Podiatric Medicine"],
+    "Specialty": ["Allopathic & Osteopathic Physicians|Internal Medicine",
+                  "Allopathic & Osteopathic Physicians|Internal Medicine|Cardiovascular Disease",
+                  "Allopathic & Osteopathic Physicians|Orthopaedic Surgery",
+                  "Allopathic & Osteopathic Physicians|Family Medicine",
+                  "Allopathic & Osteopathic Physicians|Psychiatry & Neurology|Neurology",
+                  "Allopathic & Osteopathic Physicians|Internal Medicine|Medical Oncology",
+                  "Dental Providers|Dentist|General Practice"],
+    "Form_of_Payment_or_Transfer_of_Value": ["In-kind items and services", "Cash or cash equivalent",
+                                             "Stock, stock option, or any other ownership interest"],
+    "Nature_of_Payment_or_Transfer_of_Value": ["Food and Beverage", "Travel and Lodging", "Consulting Fee",
+                                               "Education", "Compensation for services other than consulting",
+                                               "Honoraria", "Gift", "Royalty or License", "Grant"],
+    "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply": ["Drug", "Device", "Biological",
+                                                                "Medical Supply"],
+    "Product_Category_or_Therapeutic_Area": ["Oncology", "Cardiology", "Neurology", "Immunology",
+                                             "Diabetes", "Orthopedics", "Respiratory", "Dermatology"],
+    "Covered_or_Noncovered_Indicator": ["Covered", "Non-Covered"],
+    "Dispute_Status_for_Publication": ["No", "Yes"],
+    "Terms_of_Interest": ["Common Stock", "Preferred Stock", "Stock Options", "LLC Membership Units"],
+    "Interest_Held_by_Physician_or_an_Immediate_Family_Member": ["Physician Covered Recipient",
+                                                                 "Immediate Family Member"],
+}
+YES_NO = ["No", "Yes"]
+# Share of rows that fill the 1st..5th principal investigator block of a research payment
+PI_PRESENCE = [0.85, 0.25, 0.1, 0.05, 0.02]
+
+
+def _skewed(rng, pool_size, n, exponent=1.1):
+    """
+    Draw n indices into a pool with a Zipf-like skew, as a few manufacturers make most payments.
+    """
+    weights = 1.0 / np.arange(1, pool_size + 1) ** exponent
+    return rng.choice(pool_size, size=n, p=weights / weights.sum())
+
+
+def _take(pool, idx, present=None):
+    """
+    Pick pool values by index, null where present is False.
+    """
+    mask = None if present is None else ~present
+    return pa.array(pool).take(pa.array(idx % len(pool), mask=mask))
+
+
+def _ints(values, present=None):
+    return pa.array(values, mask=None if present is None else ~present)
+
+
+def _free_text(rng, n, present):
+    """
+    Study titles and context notes, with the commas, quotes and line breaks the real files contain.
+    """
+    sentences = []
+    for _ in range(512):
+        words = rng.choice(WORDS, size=rng.integers(4, 16))
+        text = " ".join(words).capitalize()
+        roll = rng.random()
+        if roll < 0.3:
+            text += f", {rng.choice(WORDS)} and {rng.choice(WORDS)}"
+        elif roll < 0.4:
+            text += f' ("{rng.choice(WORDS).upper()}-{rng.integers(100, 999)}")'
+        elif roll < 0.45:
+            text += f"\n{' '.join(rng.choice(WORDS, size=5))}"
+        sentences.append(text)
+    return _take(sentences, rng.integers(0, len(sentences), n), present)
+
+
+def _slot(name):
+    """
+    Return the repeat number of a numbered column (Specialty_3, License_State_code2, ...), else 1.
+    """
+    match = re.search(r'(\d)$', name)
+    return int(match.group(1)) if match else 1
+
+
+def _person_column(field, idx, present, rng, n):
+    """
+    A value derived from a person's pool index, so a recipient keeps the same details across payments.
+    """
+    if field == 'First_Name':
+        return _take(FIRST_NAMES, idx, present)
+    if field == 'Middle_Name':
+        return _take([chr(ord('A') + i) for i in range(26)], idx * 7, present & (idx % 3 == 0))
+    if field == 'Last_Name':
+        return _take(LAST_NAMES, idx * 31 + idx // len(FIRST_NAMES), present)
+    if field == 'Name_Suffix':
+        return _take(["JR.", "SR.", "III"], idx, present & (idx % 40 == 0))
+    if field == 'NPI':
+        return _ints(1_000_000_000 + idx, present).cast(pa.string())
+    if field == 'Profile_ID':
+        return _ints(100_000 + idx, present).cast(pa.string())
+    if field == 'Street_Address_Line1':
+        return _take([f"{number} {street}" for number in range(1, 400, 7) for street in STREETS], idx, present)
+    if field == 'Street_Address_Line2':
+        return _take([f"SUITE {number}" for number in range(100, 900, 10)], idx, present & (idx % 4 == 0))
+    if field == 'City':
+        return _take(CITIES, idx * 13, present)
+    if field == 'State' or field.startswith('License_State_code'):
+        slot = _slot(field)
+        return _take(STATES, idx * 17 + slot - 1, present & (rng.random(n) < (1.0 if slot == 1 else 0.2 / slot)))
+    if field == 'Zip_Code':
+        return _take([f"{zip_code:05d}" for zip_code in range(1001, 99950, 97)], idx, present)
+    if field == 'Country':
+        return _take(["United States"], idx, present)
+    if field.startswith('Primary_Type') or field.startswith('Specialty'):
+        slot = _slot(field)
+        pool = CATEGORIES['Primary_Type' if field.startswith('Primary_Type') else 'Specialty']
+        return _take(pool, idx + slot, present & (rng.random(n) < (1.0 if slot == 1 else 0.1 / slot)))
+    if field == 'Covered_Recipient_Type':
+        # About one in ten individual recipients is a non-physician practitioner
+        return _take(CATEGORIES['Covered_Recipient_Type'], np.where(idx % 10 == 9, 2, 0), present)
+    # Province and Postal_Code are only filled for foreign addresses
+    return pa.nulls(n, pa.string())
+
+
+def _column(name, rng, n, start, year, ctx):
+    """
+    Build one column of a batch from the rules that match its name.
+    """
+    everyone = np.ones(n, dtype=bool)
+    if name == 'Record_ID':
+        return pa.array(np.arange(start, start + n) + 100_000_000)
+    if name == 'Program_Year':
+        return pa.array(np.full(n, year))
+    if name == 'Payment_Publication_Date':
+        return pa.array(["01/30/2025"] * n)
+    if 'Date' in name:
+        days = [(datetime.date(year, 1, 1) + datetime.timedelta(days=d)).strftime('%m/%d/%Y') for d in range(365)]
+        return _take(days, rng.integers(0, 365, n))
+    if name.startswith('Total_Amount') or name == 'Value_of_Interest':
+        mean = 7.0 if ctx['file_type'] == 'RSRCH' else 3.5
+        return pa.array(np.round(rng.lognormal(mean, 1.8, n), 2))
+    if name == 'Number_of_Payments_Included_in_Total_Amount':
+        return pa.array(rng.geometric(0.7, n))
+    if 'Manufacturer_or_Applicable_GPO' in name:
+        idx = ctx['manufacturer']
+        if name.endswith('_ID'):
+            return pa.array(100_000_000_000 + idx)
+        if name.endswith('_State'):
+            return _take(STATES, idx * 5)
+        if name.endswith('_Country'):
+            return _take(["United States", "United States", "United States", "Switzerland", "Germany"], idx)
+        return _take([f"Manufacturer {i:04d}, Inc." if i % 9 else f'"{i:04d}" Pharma, LLC'
+                      for i in range(MANUFACTURERS)], idx)
+    if name.startswith('Teaching_Hospital'):
+        idx, present = ctx['hospital'], ctx['is_hospital']
+        if name.endswith('_Name'):
+            return _take([f"{CITIES[i % len(CITIES)].title()} Medical Center {i}" for i in range(HOSPITALS)],
+                         idx, present)
+        return _ints(10_000 + idx, present).cast(pa.string())
+    match = re.match(r'Principal_Investigator_(\d)_(.*)', name)
+    if match:
+        slot = int(match.group(1))
+        return _person_column(match.group(2), ctx['pi'][slot - 1], ctx['pi_present'][slot - 1], rng, n)
+    if name == 'Covered_Recipient_Type':
+        return pa.array(np.where(ctx['is_hospital'], CATEGORIES[name][1], CATEGORIES[name][0]))
+    match = re.match(r'(?:Covered_Recipient|Physician)_(.*)', name)
+    if match:
+        return _person_column(match.group(1), ctx['recipient'], ~ctx['is_hospital'], rng, n)
+    match = re.match(r'Recipient_(?:Primary_Business_)?(.*)', name)
+    if match:
+        return _person_column(match.group(1), ctx['recipient'], everyone, rng, n)
+    if name in ('Name_of_Study', 'Context_of_Research', 'Contextual_Information'):
+        return _free_text(rng, n, rng.random(n) < (0.95 if name == 'Name_of_Study' else 0.3))
+
+    slot = _slot(name)
+    present = rng.random(n) < (0.9 if slot == 1 else 0.15 / slot)
+    category = re.sub(r'_?\d$', '', name)
+    if category in CATEGORIES:
+        return _take(CATEGORIES[category], _skewed(rng, len(CATEGORIES[category]), n), present)
+    if name.endswith('Indicator'):
+        return _take(YES_NO, _skewed(rng, 2, n, exponent=3), present)
+    if 'NDC' in name or 'PDI' in name:
+        return _take([f"{code:05d}-{code % 997:04d}" for code in range(0, 99999, 53)], rng.integers(0, 1887, n),
+                     present)
+    # Anything else: a small categorical column, like most CMS descriptive fields
+    return _take([f"{name.split('_')[0]} {value}" for value in range(40)], _skewed(rng, 40, n), present)
+
+
+def generate_csv(file_type, rows, path, year, seed=0, batch_rows=BATCH_ROWS):
+    """
+    Write rows synthetic records of file_type to path with every non-null value quoted.
+    """
+    columns = FILE_COLUMNS[file_type]
+    recipients = max(1_000, rows // 20)
+    options = pv.WriteOptions(quoting_style='all_valid', batch_size=batch_rows)
+    writer = None
+    try:
+        for batch_index, start in enumerate(range(0, rows, batch_rows)):
+            n = min(batch_rows, rows - start)
+            rng = np.random.default_rng([seed, batch_index, len(file_type)])
+            ctx = {
+                'file_type': file_type,
+                'manufacturer': _skewed(rng, MANUFACTURERS, n),
+                'recipient': _skewed(rng, recipients, n, exponent=0.8),
+                'hospital': _skewed(rng, HOSPITALS, n, exponent=0.9),
+                'is_hospital': rng.random(n) < (0.3 if file_type == 'RSRCH' else 0.02),
+                'pi': [_skewed(rng, recipients, n, exponent=0.8) for _ in PI_PRESENCE],
+                'pi_present': [rng.random(n) < share for share in PI_PRESENCE],
+            }
+            table = pa.table({name: _column(name, rng, n, start, year, ctx) for name in columns})
+            if writer is None:
+                writer = pv.CSVWriter(path, table.schema, write_options=options)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
+
+
+def generate_archive(out_dir, rows_by_type, year, seed=0, keep_csv=False):
+    """
+    Generate each file type's detail CSV and zip them into a PGYR{year} archive; return its path.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    archive = os.path.join(out_dir, f"PGYR{year}_{PUBLICATION}.zip")
+    with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for file_type, rows in rows_by_type.items():
+            member = f"OP_DTL_{file_type}_PGYR{year}_{PUBLICATION}.csv"
+            csv_path = os.path.join(out_dir, member)
+            began = time.monotonic()
+            generate_csv(file_type, rows, csv_path, year, seed=seed)
+            print(f"{member}: {rows} rows, {os.path.getsize(csv_path) / 1e6:.1f} MB "
+                  f"in {time.monotonic() - began:.1f}s")
+            zf.write(csv_path, member)
+            if not keep_csv:
+                os.remove(csv_path)
+        zf.writestr(f"OP_PGYR{year}_README_{PUBLICATION}.txt",
+                    f"Synthetic Open Payments data for program year {year}, not for analysis.\n")
+    print(f"Wrote {archive} ({os.path.getsize(archive) / 1e6:.1f} MB)")
+    return archive
+
+
+def parse_rows(values, file_types):
+    """
+    Turn ['1000000', 'GNRL=50000000'] into a row count per file type.
+    """
+    rows = {}
+    for value in values:
+        if '=' in value:
+            file_type, count = value.split('=', 1)
+            rows[file_type.upper()] = int(count)
+        else:
+            rows.update({file_type: int(value) for file_type in file_types if file_type not in rows})
+    return {file_type: rows[file_type] for file_type in file_types if file_type in rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('out_dir', help="directory for the archive (and the CSVs with --keep-csv)")
+    parser.add_argument('--rows', nargs='+', default=['1000000'],
+                        help="rows for every file type, or TYPE=ROWS per file type")
+    parser.add_argument('--file-types', nargs='+', default=list(FILE_COLUMNS), choices=list(FILE_COLUMNS))
+    parser.add_argument('--year', type=int, default=2019)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep-csv', action='store_true', help="leave the extracted CSVs next to the archive")
+    args = parser.parse_args()
+
+    generate_archive(args.out_dir, parse_rows(args.rows, args.file_types), args.year,
+                     seed=args.seed, keep_csv=args.keep_csv)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Compare single-pass and sharded DuckDB GNRL CSV -> Parquet conversion.
+
+Both modes get the same memory_limit and threads, as the DAG's GNRL budget
+does; the sharded one splits them across its shards.
+
+Usage:
+    python benchmarks/gnrl_sharding.py OP_DTL_GNRL_PGYR2019.csv --shards 2 4 8 --memory-limit 4GB --threads 4
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dags'))
+
+from cms_utils.convert import csv_to_parquet_duckdb, csv_to_parquet_duckdb_sharded  # noqa: E402
+from cms_utils.schemas import DTYPE_DICT_GNRL  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('csv', help="GNRL detail CSV to convert")
+    parser.add_argument('--shards', type=int, nargs='+', default=[2, 4, os.cpu_count()])
+    parser.add_argument('--memory-limit', default='4GB', help="DuckDB memory_limit for the whole conversion")
+    parser.add_argument('--threads', type=int, default=4, help="DuckDB threads for the whole conversion")
+    args = parser.parse_args()
+
+    budget = {'memory_limit': args.memory_limit, 'threads': args.threads}
+    size_mb = os.path.getsize(args.csv) / 1e6
+    work_dir = tempfile.mkdtemp(prefix='gnrl_bench_')
+    try:
+        began = time.monotonic()
+        baseline = csv_to_parquet_duckdb(args.csv, os.path.join(work_dir, 'single.parquet'), DTYPE_DICT_GNRL,
+                                         temp_directory=os.path.join(work_dir, 'spill'), **budget)
+        baseline_seconds = time.monotonic() - began
+        rows = baseline['rows_written']
+        print(f"{'mode':<12}{'rows':>12}{'rejected':>10}{'seconds':>10}{'rows/s':>12}{'MB/s':>8}{'speedup':>9}")
+        print(f"{'single':<12}{rows:>12}{baseline['rows_rejected']:>10}{baseline_seconds:>10.2f}"
+              f"{rows / baseline_seconds:>12.0f}{size_mb / baseline_seconds:>8.1f}{1:>9.2f}")
+
+        for shards in args.shards:
+            output_dir = os.path.join(work_dir, f'shards_{shards}')
+            began = time.monotonic()
+            report = csv_to_parquet_duckdb_sharded(args.csv, output_dir, DTYPE_DICT_GNRL, shards=shards,
+                                                   temp_directory=os.path.join(work_dir, 'spill'), **budget)
+            elapsed = time.monotonic() - began
+            if report != baseline:
+                raise SystemExit(f"{shards} shards reported {report}, expected {baseline}")
+            print(f"{f'{shards} shards':<12}{rows:>12}{report['rows_rejected']:>10}{elapsed:>10.2f}"
+                  f"{rows / elapsed:>12.0f}{size_mb / elapsed:>8.1f}{baseline_seconds / elapsed:>9.2f}")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Compare the Parquet writer profiles on one detail CSV: file size, write time and downstream load cost.
+
+For every profile in cms_utils.parquet_profile the CSV is converted with
+the same converter the DAG uses for that file type, then timed as a
+downstream reader would see it: a DuckDB full scan and a date/state
+filtered aggregate (which sorting lets skip row groups). With --bigquery
+each file is also loaded into <dataset>.parquet_profile_<name> and the
+load job's duration and slot time are recorded. Results go to JSON.
+
+Usage:
+    python benchmarks/parquet_profiles.py /tmp/cms_synth/OP_DTL_GNRL_PGYR2019_P01302025_01212025.csv
+    python benchmarks/parquet_profiles.py OP_DTL_RSRCH_PGYR2019.csv --bigquery my-project.scratch
+"""
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dags'))
+
+from cms_utils.convert import arrow_column_types, csv_to_parquet, csv_to_parquet_duckdb  # noqa: E402
+from cms_utils.parquet_profile import PARQUET_PROFILES  # noqa: E402
+from cms_utils.schemas import DTYPE_DICT_GNRL, DTYPE_DICT_RSRCH  # noqa: E402
+
+# The filtered query a dashboard would run: one month, one state (RSRCH and GNRL only).
+# RSRCH dates are typed; GNRL's are still MM/DD/YYYY strings
+FILTERED_QUERY = """
+    SELECT Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Name, count(*)
+    FROM read_parquet('{path}')
+    WHERE {month_filter} AND Recipient_State = 'CA'
+    GROUP BY 1
+"""
+
+
+def convert(input_csv, output, profile):
+    """
+    Convert with the DAG's converter for the CSV's file type and return the row count.
+    """
+    name = os.path.basename(input_csv)
+    if 'DTL_GNRL' in name:
+        return csv_to_parquet_duckdb(input_csv, output, DTYPE_DICT_GNRL, profile=profile)['rows_written']
+    if 'DTL_RSRCH' in name:
+        return csv_to_parquet(input_csv, output, arrow_column_types(DTYPE_DICT_RSRCH), profile=profile)
+    return csv_to_parquet(input_csv, output, profile=profile)
+
+
+def _timed(conn, query):
+    began = time.monotonic()
+    conn.execute(query).fetchall()
+    return time.monotonic() - began
+
+
+def bigquery_load(path, dataset, profile):
+    """
+    Load path into <dataset>.parquet_profile_<profile> and return the job's seconds and slot milliseconds.
+    """
+    from google.cloud import bigquery
+
+    client = bigquery.Client()
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
+        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+    )
+    with open(path, 'rb') as f:
+        job = client.load_table_from_file(f, f"{dataset}.parquet_profile_{profile}", job_config=job_config)
+    job.result()
+    return {
+        'bq_load_seconds': (job.ended - job.started).total_seconds(),
+        'bq_slot_millis': job.slot_millis,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('csv', help="OP_DTL_* CSV to convert")
+    parser.add_argument('--profiles', nargs='+', default=list(PARQUET_PROFILES), choices=list(PARQUET_PROFILES))
+    parser.add_argument('--bigquery', metavar='PROJECT.DATASET', help="also time a BigQuery load job per profile")
+    parser.add_argument('--output', help="JSON results file (default: benchmarks/results/parquet-profiles-<time>.json)")
+    args = parser.parse_args()
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='parquet_profiles_')
+    print(f"{'profile':<12}{'rows':>10}{'write s':>9}{'MB':>9}{'groups':>8}{'scan s':>8}{'filter s':>9}")
+    try:
+        for profile in args.profiles:
+            output = os.path.join(work_dir, f"{profile}.parquet")
+            began = time.monotonic()
+            rows = convert(args.csv, output, profile)
+            write_seconds = time.monotonic() - began
+
+            conn = duckdb.connect(database=':memory:')
+            schema = pq.read_schema(output)
+            columns = schema.names
+            result = {
+                'profile': profile,
+                'settings': PARQUET_PROFILES[profile],
+                'rows': rows,
+                'write_seconds': write_seconds,
+                'output_bytes': os.path.getsize(output),
+                'row_groups': pq.ParquetFile(output).metadata.num_row_groups,
+                # Materializing every column is what a load into a warehouse has to decode
+                'scan_seconds': _timed(conn, f"CREATE TEMP TABLE scan AS SELECT * FROM read_parquet('{output}')"),
+                'filtered_query_seconds': (
+                    _timed(conn, FILTERED_QUERY.format(path=output, month_filter=(
+                        "month(Date_of_Payment) = 3" if pa.types.is_date(schema.field('Date_of_Payment').type)
+                        else "Date_of_Payment LIKE '03/%'"
+                    )))
+                    if {'Date_of_Payment', 'Recipient_State'} <= set(columns) else None
+                ),
+            }
+            conn.close()
+            if args.bigquery:
+                result.update(bigquery_load(output, args.bigquery, profile))
+            results.append(result)
+            print(f"{profile:<12}{rows:>10}{write_seconds:>9.2f}{result['output_bytes'] / 1e6:>9.1f}"
+                  f"{result['row_groups']:>8}{result['scan_seconds']:>8.2f}{result['filtered_query_seconds'] or 0:>9.3f}"
+                  + (f"  BigQuery load {result['bq_load_seconds']:.1f}s, {result['bq_slot_millis']} slot ms"
+                     if args.bigquery else ""))
+    finally:
+        shutil.rmtree(work_dir)
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'results',
+        f"parquet-profiles-{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'input': os.path.basename(args.csv), 'input_bytes': os.path.getsize(args.csv),
+                   'results': results}, f, indent=2)
+    print(f"Wrote {output}")
+
+
+if __name__ == '__main__':
+    main()
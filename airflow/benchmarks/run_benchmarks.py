@@ -0,0 +1,205 @@
+"""
+Time every CSV -> Parquet converter the DAGs use and record the results as JSON.
+
+Each case runs in a fresh interpreter so its peak RSS is its own. The
+input is a directory of detail CSVs, e.g. from generate_cms_data.py with
+--keep-csv, or a real extracted PGYR archive. Every result carries the git
+commit and library versions, so files from different commits can be
+compared to spot regressions.
+
+Usage:
+    python benchmarks/generate_cms_data.py /tmp/cms_synth --rows 1000000 --keep-csv
+    python benchmarks/run_benchmarks.py /tmp/cms_synth --output results/2019-1m.json
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+DAGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dags')
+sys.path.insert(0, DAGS_PATH)
+
+from cms_utils.convert import (  # noqa: E402
+    arrow_column_types,
+    csv_to_parquet,
+    csv_to_parquet_duckdb,
+    csv_to_parquet_duckdb_sharded,
+)
+from cms_utils.parquet_profile import DEFAULT_PROFILE, PARQUET_PROFILES  # noqa: E402
+from cms_utils.schemas import DTYPE_DICT_GNRL, DTYPE_DICT_OWNRSHP, DTYPE_DICT_RSRCH  # noqa: E402
+
+# Case name -> the file type it reads; the converters mirror the DAG tasks
+CASES = {
+    "rsrch_arrow": "RSRCH",
+    "ownrshp_arrow": "OWNRSHP",
+    "gnrl_arrow": "GNRL",
+    "gnrl_duckdb": "GNRL",
+    "gnrl_duckdb_sharded": "GNRL",
+}
+
+
+def _convert(case, input_csv, output, options):
+    """
+    Run one converter and return (rows_written, rows_rejected).
+    """
+    profile = options['profile']
+    if case == 'rsrch_arrow':
+        # CMS_rsrch.py declares every RSRCH type
+        return csv_to_parquet(input_csv, output, arrow_column_types(DTYPE_DICT_RSRCH), profile=profile), 0
+    if case == 'ownrshp_arrow':
+        return csv_to_parquet(input_csv, output, arrow_column_types(DTYPE_DICT_OWNRSHP), block_size=16 * 1024 * 1024,
+                              profile=profile), 0
+    if case == 'gnrl_arrow':
+        return csv_to_parquet(input_csv, output, arrow_column_types(DTYPE_DICT_GNRL), profile=profile), 0
+    if case == 'gnrl_duckdb_sharded':
+        report = csv_to_parquet_duckdb_sharded(input_csv, output, DTYPE_DICT_GNRL, shards=options['shards'],
+                                               memory_limit=options['memory_limit'], threads=options['threads'],
+                                               temp_directory=os.path.dirname(output), profile=profile)
+        return report['rows_written'], report['rows_rejected']
+    report = csv_to_parquet_duckdb(input_csv, output, DTYPE_DICT_GNRL, memory_limit=options['memory_limit'],
+                                   threads=options['threads'], temp_directory=os.path.dirname(output),
+                                   profile=profile)
+    return report['rows_written'], report['rows_rejected']
+
+
+def _worker(case, input_csv, output, options):
+    """
+    Entry point of the child process: convert, then print the measurements as one JSON line.
+    """
+    began = time.monotonic()
+    rows, rejected = _convert(case, input_csv, output, json.loads(options))
+    elapsed = time.monotonic() - began
+    # ru_maxrss is in KiB on Linux; sharded workers are children of this process
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    print(json.dumps({'rows': rows, 'rows_rejected': rejected, 'seconds': elapsed,
+                      'peak_rss_bytes': own, 'children_peak_rss_bytes': children}))
+
+
+def _size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(p) for p in glob.glob(os.path.join(path, '*')))
+    return os.path.getsize(path)
+
+
+def find_inputs(data_dir):
+    """
+    Map each file type to its detail CSV in data_dir.
+    """
+    inputs = {}
+    for file_type in set(CASES.values()):
+        matches = sorted(glob.glob(os.path.join(data_dir, f"*DTL_{file_type}*.csv")))
+        if matches:
+            inputs[file_type] = matches[0]
+    return inputs
+
+
+def run_case(case, input_csv, work_dir, options):
+    """
+    Convert input_csv with one converter in a child process and return its result record.
+    """
+    output = os.path.join(work_dir, case if case.endswith('_sharded') else f"{case}.parquet")
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', case, input_csv, output, json.dumps(options)],
+        check=True, stdout=subprocess.PIPE, text=True,
+    )
+    measured = json.loads(completed.stdout.strip().splitlines()[-1])
+    input_bytes = os.path.getsize(input_csv)
+    result = {
+        'case': case,
+        'file_type': CASES[case],
+        'input': os.path.basename(input_csv),
+        'input_bytes': input_bytes,
+        'output_bytes': _size(output),
+        'rows_per_sec': measured['rows'] / measured['seconds'],
+        'mb_per_sec': input_bytes / 1e6 / measured['seconds'],
+        **measured,
+    }
+    shutil.rmtree(output) if os.path.isdir(output) else os.remove(output)
+    return result
+
+
+def environment():
+    """
+    Describe what produced the results: commit, interpreter, library versions and cores.
+    """
+    import duckdb
+    import pyarrow
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=DAGS_PATH, check=True,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'pyarrow': pyarrow.__version__,
+        'duckdb': duckdb.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        _worker(*sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('data_dir', help="directory holding the OP_DTL_*.csv files")
+    parser.add_argument('--cases', nargs='+', default=list(CASES), choices=list(CASES))
+    parser.add_argument('--repeat', type=int, default=1, help="runs per case; every run is recorded")
+    parser.add_argument('--shards', type=int, default=os.cpu_count())
+    parser.add_argument('--memory-limit', default='4GB',
+                        help="DuckDB memory_limit for gnrl_duckdb, shared by the gnrl_duckdb_sharded shards")
+    parser.add_argument('--threads', type=int, default=4,
+                        help="DuckDB threads for gnrl_duckdb, shared by the gnrl_duckdb_sharded shards")
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=list(PARQUET_PROFILES),
+                        help="Parquet writer profile for every case")
+    parser.add_argument('--output', help="JSON results file (default: benchmarks/results/conversion-<time>.json)")
+    args = parser.parse_args()
+
+    inputs = find_inputs(args.data_dir)
+    options = {'shards': args.shards, 'memory_limit': args.memory_limit, 'threads': args.threads,
+               'profile': args.profile}
+    run = environment()
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='cms_bench_')
+    width = max(len(case) for case in CASES) + 2
+    print(f"{'case':<{width}}{'rows':>12}{'seconds':>10}{'rows/s':>12}{'MB/s':>8}{'peak MB':>9}{'out MB':>9}")
+    try:
+        for case in args.cases:
+            if CASES[case] not in inputs:
+                print(f"{case:<{width}}skipped, no DTL_{CASES[case]} CSV in {args.data_dir}")
+                continue
+            for _ in range(args.repeat):
+                result = run_case(case, inputs[CASES[case]], work_dir, options)
+                results.append(result)
+                peak = max(result['peak_rss_bytes'], result['children_peak_rss_bytes'])
+                print(f"{case:<{width}}{result['rows']:>12}{result['seconds']:>10.2f}{result['rows_per_sec']:>12.0f}"
+                      f"{result['mb_per_sec']:>8.1f}{peak / 1e6:>9.0f}{result['output_bytes'] / 1e6:>9.1f}")
+    finally:
+        shutil.rmtree(work_dir)
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'results',
+        f"conversion-{datetime.datetime.now().strftime('%Y%m%dT%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'run': dict(run, options=options), 'results': results}, f, indent=2)
+    print(f"Wrote {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,29 @@
 import os
+import shutil
 from datetime import datetime
-import requests
-import zipfile
-import pandas as pd
-import duckdb
 import pyarrow as pa
 
 from airflow import DAG
 from airflow.operators.bash import BashOperator
 from airflow.operators.python import PythonOperator
-from airflow.providers.google.cloud.operators.bigquery import BigQueryInsertJobOperator
-from airflow.providers.google.cloud.hooks.gcs import GCSHook
 from airflow.utils.task_group import TaskGroup
 
+from cms_utils.archive import extract_members
+from cms_utils.cache import DownloadCache
+from cms_utils.convert import (
+    CONVERT_BLOCK_SIZE,
+    arrow_column_types,
+    csv_to_parquet,
+    csv_to_parquet_duckdb,
+    csv_to_parquet_duckdb_sharded,
+)
+from cms_utils.download import parallel_download, stream_download
+from cms_utils.gcs import dataset_path, upload_dataset
+from cms_utils.remote_zip import fetch_remote_members
+from cms_utils.schemas import DTYPE_DICT_GNRL, DTYPE_DICT_OWNRSHP, DTYPE_DICT_RSRCH
+from cms_utils.warehouse import Warehouse
+from cms_utils.workspace import reserve_workspace
+
 # Global configuration values
 PROJECT_ID = "dtc-de-course-447715"
 BUCKET = "cms_bucket_jj"
@@ -20,13 +31,69 @@ BIGQUERY_DATASET = "CMS"
 path_to_local_home = os.environ.get("AIRFLOW_HOME", "/opt/airflow")
 EXTRACT_PATH = os.path.join(path_to_local_home, "downloaded_files")
 FILE_TYPES = ["RSRCH", "OWNRSHP", "GNRL"]
+# Fetch only the FILE_TYPES members via HTTP Range instead of the whole archive
+REMOTE_MEMBERS = False
+# Parallel connections used to fetch each PGYR archive (1 = single stream)
+DOWNLOAD_CONNECTIONS = 8
+# Archive cache shared by both DAGs; lives outside EXTRACT_PATH so cleanup_files keeps it
+DOWNLOAD_CACHE_PATH = os.path.join(path_to_local_home, "download_cache")
+DOWNLOAD_CACHE_MAX_BYTES = 40 * 1024 ** 3
+# Memory budget for each converter, which run side by side (per DAG run): CSV block size
+# for the pyarrow converters, DuckDB memory_limit/threads (spilling into the run workspace) for GNRL
+CONVERT_BUDGETS = {
+    "OWNRSHP": {'block_size': 16 * 1024 ** 2},
+    "RSRCH": {'block_size': 64 * 1024 ** 2},
+    "GNRL": {'memory_limit': '4GB', 'threads': 4},
+}
+# Parquet writer settings for every converter (see cms_utils.parquet_profile.PARQUET_PROFILES)
+PARQUET_PROFILE = "balanced"
+# Processes converting the GNRL CSV in parallel byte-range shards, sharing CONVERT_BUDGETS["GNRL"]
+# (0 or 1 = single DuckDB pass)
+GNRL_SHARDS = 4
+# Each run works in its own EXTRACT_PATH/<dag_id>/<year> directory, so program years can run side by side
+RUN_WORKSPACE = os.path.join(EXTRACT_PATH, "{{ dag.dag_id }}", "{{ execution_date.strftime('%Y') }}")
+# Disk one run needs at its peak (archive, extracted CSVs, Parquet and DuckDB spill), reserved before it starts
+RUN_DISK_BUDGET = 40 * 1024 ** 3
+# Program years ingested concurrently
+MAX_ACTIVE_RUNS = 2
+# Threads uploading the parts of one large Parquet file to GCS
+UPLOAD_PARALLELISM = 8
+# Each year of a file type is written as <file_type>/program_year=<year>/part-*.parquet
+# files of about this size, which BigQuery and other readers load in parallel
+PARQUET_PART_BYTES = 256 * 1024 ** 2
+
+# Where the BigQuery stage runs: "bigquery", or "duckdb" to run the same jobs against a local
+# DuckDB database, with LOCAL_LAKE_PATH standing in for the GCS bucket (see cms_utils.warehouse)
+WAREHOUSE_BACKEND = os.environ.get("CMS_WAREHOUSE", "bigquery")
+LOCAL_WAREHOUSE_PATH = os.path.join(path_to_local_home, "warehouse", "warehouse.duckdb")
+LOCAL_LAKE_PATH = os.path.join(path_to_local_home, "lake")
+# Directory of PGYR<year>_<publication>.zip archives to read instead of download.cms.gov,
+# e.g. sample data from benchmarks/generate_cms_data.py
+SOURCE_DIR = os.environ.get("CMS_SOURCE_DIR")
 
 # URL template for the file to download (templated with execution_date)
-url_template = "https://download.cms.gov/openpayments/PGYR{{ execution_date.strftime('%Y') }}_P01302025_01212025.zip"
+url_template = os.path.join(
+    SOURCE_DIR or "https://download.cms.gov/openpayments",
+    "PGYR{{ execution_date.strftime('%Y') }}_P01302025_01212025.zip",
+)
+
+warehouse = Warehouse(WAREHOUSE_BACKEND, LOCAL_WAREHOUSE_PATH, LOCAL_LAKE_PATH)
 
-def download_and_unzip(url, extract_path, **kwargs):
+def download_and_unzip(url, extract_path, file_types=None, remote_members=False, connections=1,
+                       cache_path=None, cache_max_bytes=None, expected_sha256=None, **kwargs):
     """
     Download a zip file from the rendered URL and extract its contents.
+
+    The archive is streamed to disk in chunks and resumed from the last byte
+    written when a retry finds a partial download. With connections > 1 it is
+    fetched as parallel byte ranges over a pool of connections instead.
+    Only the detail CSVs for file_types (default: FILE_TYPES) are extracted.
+    With remote_members, the archive's central directory is read over HTTP
+    Range first and only those members' bytes are fetched and inflated; the
+    full download is the fallback when the server cannot serve ranges.
+    With cache_path, the archive is served from the shared download cache
+    when the upstream file is unchanged and is kept there after extraction.
+    A url that is a local file (SOURCE_DIR) is extracted without copying.
     """
     execution_date = kwargs.get('execution_date')
     if execution_date:
@@ -35,20 +102,44 @@ def download_and_unzip(url, extract_path, **kwargs):
         formatted_url = url
 
     os.makedirs(extract_path, exist_ok=True)
-    print(f"Downloading file from {formatted_url}...")
-    response = requests.get(formatted_url)
-    if response.status_code != 200:
-        raise Exception(f"Failed to download file from {formatted_url}")
-    
-    zip_path = os.path.join(extract_path, 'downloaded_file.zip')
-    with open(zip_path, 'wb') as f:
-        f.write(response.content)
+    file_types = file_types or FILE_TYPES
+    # An archive in SOURCE_DIR is extracted where it is
+    if os.path.isfile(formatted_url):
+        members = extract_members(formatted_url, extract_path, file_types)
+        print("Extracted members:", members)
+        return extract_path
+    cache = DownloadCache(cache_path, cache_max_bytes) if cache_path else None
+    # A cached full archive beats a ranged fetch; either DAG may have downloaded it
+    if remote_members and not (cache and cache.lookup(formatted_url)):
+        try:
+            members = fetch_remote_members(formatted_url, extract_path, file_types)
+            print("Fetched remote members:", members)
+            return extract_path
+        except Exception as e:
+            print(f"Remote member fetch failed ({e}), downloading the full archive")
+
+    def download(source_url, zip_path):
+        print(f"Downloading file from {source_url}...")
+        if connections > 1:
+            sha256 = parallel_download(source_url, zip_path, connections=connections,
+                                       expected_sha256=expected_sha256)
+        else:
+            sha256 = stream_download(source_url, zip_path, expected_sha256=expected_sha256)
+        print(f"Downloaded {zip_path} (sha256 {sha256})")
+        return sha256
+
+    if cache:
+        zip_path = cache.fetch(formatted_url, download)
+    else:
+        zip_path = os.path.join(extract_path, 'downloaded_file.zip')
+        download(formatted_url, zip_path)
     
     print("Extracting files...")
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(extract_path)
+    members = extract_members(zip_path, extract_path, file_types)
+    print("Extracted members:", members)
     
-    os.remove(zip_path)
+    if not cache:
+        os.remove(zip_path)
     print("Download and extraction complete.")
     return extract_path
 
@@ -60,9 +151,23 @@ def list_files(extract_path):
     print("Found CSV files:", csv_files)
     return csv_files
 
-def convert_dtl_ownrshp_to_parquet(extract_path, **kwargs):
+def _dataset_dir(extract_path, file_type, year):
+    """
+    The empty local directory a year's Parquet parts are written to; a retry starts afresh.
+    """
+    output_dir = os.path.join(extract_path, dataset_path(file_type, year))
+    shutil.rmtree(output_dir, ignore_errors=True)
+    return output_dir
+
+def convert_dtl_ownrshp_to_parquet(extract_path, block_size=CONVERT_BLOCK_SIZE, profile=None,
+                                   part_bytes=PARQUET_PART_BYTES, **kwargs):
     """
     Convert CSV files with 'DTL_OWNRSHP' in the filename to Parquet.
+
+    The CSV is streamed in block_size batches with DTYPE_DICT_OWNRSHP's
+    types and written with the named Parquet profile, so peak memory does
+    not grow with the file. The output is the year's
+    OWNRSHP/program_year=<year>/ directory of part_bytes parts.
     """
     execution_date = kwargs.get('execution_date')
     year = execution_date.strftime('%Y')
@@ -71,17 +176,22 @@ def convert_dtl_ownrshp_to_parquet(extract_path, **kwargs):
     for file in os.listdir(extract_path):
         if 'DTL_OWNRSHP' in file and file.endswith('.csv'):
             input_csv = os.path.join(extract_path, file)
-            output_parquet = os.path.join(extract_path, f"OWNRSHP_{year}.parquet")
+            output_parquet = _dataset_dir(extract_path, 'OWNRSHP', year)
             print(f"Converting {input_csv} to Parquet...")
-            df = pd.read_csv(input_csv)
-            df.to_parquet(output_parquet, index=False)
-            print(f"Converted {input_csv} to {output_parquet}")
+            rows = csv_to_parquet(input_csv, output_parquet, column_types=arrow_column_types(DTYPE_DICT_OWNRSHP),
+                                  block_size=block_size, profile=profile, part_bytes=part_bytes)
+            print(f"Converted {input_csv} to {output_parquet} ({rows} rows)")
             found_file = True
             
 
-def convert_dtl_rsrch_to_parquet(extract_path, **kwargs):
+def convert_dtl_rsrch_to_parquet(extract_path, block_size=CONVERT_BLOCK_SIZE, profile=None,
+                                 part_bytes=PARQUET_PART_BYTES, **kwargs):
     """
     Convert CSV files with 'DTL_RSRCH' in the filename to Parquet.
+
+    The CSV is streamed in block_size batches and written with the named
+    Parquet profile, so peak memory does not grow with the file. The output
+    is the year's RSRCH/program_year=<year>/ directory of part_bytes parts.
     """
     execution_date = kwargs.get('execution_date')
     year = execution_date.strftime('%Y')
@@ -90,397 +200,71 @@ def convert_dtl_rsrch_to_parquet(extract_path, **kwargs):
     for file in os.listdir(extract_path):
         if 'DTL_RSRCH' in file and file.endswith('.csv'):
             input_csv = os.path.join(extract_path, file)
-            output_parquet = os.path.join(extract_path, f"RSRCH_{year}.parquet")
+            output_parquet = _dataset_dir(extract_path, 'RSRCH', year)
             print(f"Converting {input_csv} to Parquet...")
-            dtype_dict_rsrch = {
-        "Change_Type": str,
-        "Covered_Recipient_Type": str,
-        "Noncovered_Recipient_Entity_Name": str,
-        "Teaching_Hospital_CCN": str,
-        "Teaching_Hospital_ID": str,
-        "Teaching_Hospital_Name": str,
-        "Covered_Recipient_Profile_ID": str,
-        "Covered_Recipient_NPI": str,
-        "Covered_Recipient_First_Name": str,
-        "Covered_Recipient_Middle_Name": str,
-        "Covered_Recipient_Last_Name": str,
-        "Covered_Recipient_Name_Suffix": str,
-        "Recipient_Primary_Business_Street_Address_Line1": str,
-        "Recipient_Primary_Business_Street_Address_Line2": str,
-        "Recipient_City": str,
-        "Recipient_State": str,
-        "Recipient_Zip_Code": str,
-        "Recipient_Country": str,
-        "Recipient_Province": str,
-        "Recipient_Postal_Code": str,
-        "Covered_Recipient_Primary_Type_1": str,
-        "Covered_Recipient_Primary_Type_2": str,
-        "Covered_Recipient_Primary_Type_3": str,
-        "Covered_Recipient_Primary_Type_4": str,
-        "Covered_Recipient_Primary_Type_5": str,
-        "Covered_Recipient_Primary_Type_6": str,
-        "Covered_Recipient_Specialty_1": str,
-        "Covered_Recipient_Specialty_2": str,
-        "Covered_Recipient_Specialty_3": str,
-        "Covered_Recipient_Specialty_4": str,
-        "Covered_Recipient_Specialty_5": str,
-        "Covered_Recipient_Specialty_6": str,
-        "Covered_Recipient_License_State_code1": str,
-        "Covered_Recipient_License_State_code2": str,
-        "Covered_Recipient_License_State_code3": str,
-        "Covered_Recipient_License_State_code4": str,
-        "Covered_Recipient_License_State_code5": str,
-        "Principal_Investigator_1_Covered_Recipient_Type": str,
-        "Principal_Investigator_1_Profile_ID": str,
-        "Principal_Investigator_1_NPI": str,
-        "Principal_Investigator_1_First_Name": str,
-        "Principal_Investigator_1_Middle_Name": str,
-        "Principal_Investigator_1_Last_Name": str,
-        "Principal_Investigator_1_Name_Suffix": str,
-        "Principal_Investigator_1_Business_Street_Address_Line1": str,
-        "Principal_Investigator_1_Business_Street_Address_Line2": str,
-        "Principal_Investigator_1_City": str,
-        "Principal_Investigator_1_State": str,
-        "Principal_Investigator_1_Zip_Code": str,
-        "Principal_Investigator_1_Country": str,
-        "Principal_Investigator_1_Province": str,
-        "Principal_Investigator_1_Postal_Code": str,
-        "Principal_Investigator_1_Primary_Type_1": str,
-        "Principal_Investigator_1_Primary_Type_2": str,
-        "Principal_Investigator_1_Primary_Type_3": str,
-        "Principal_Investigator_1_Primary_Type_4": str,
-        "Principal_Investigator_1_Primary_Type_5": str,
-        "Principal_Investigator_1_Primary_Type_6": str,
-        "Principal_Investigator_1_Specialty_1": str,
-        "Principal_Investigator_1_Specialty_2": str,
-        "Principal_Investigator_1_Specialty_3": str,
-        "Principal_Investigator_1_Specialty_4": str,
-        "Principal_Investigator_1_Specialty_5": str,
-        "Principal_Investigator_1_Specialty_6": str,
-        "Principal_Investigator_1_License_State_code1": str,
-        "Principal_Investigator_1_License_State_code2": str,
-        "Principal_Investigator_1_License_State_code3": str,
-        "Principal_Investigator_1_License_State_code4": str,
-        "Principal_Investigator_1_License_State_code5": str,
-        "Principal_Investigator_2_Covered_Recipient_Type": str,
-        "Principal_Investigator_2_Profile_ID": str,
-        "Principal_Investigator_2_NPI": str,
-        "Principal_Investigator_2_First_Name": str,
-        "Principal_Investigator_2_Middle_Name": str,
-        "Principal_Investigator_2_Last_Name": str,
-        "Principal_Investigator_2_Name_Suffix": str,
-        "Principal_Investigator_2_Business_Street_Address_Line1": str,
-        "Principal_Investigator_2_Business_Street_Address_Line2": str,
-        "Principal_Investigator_2_City": str,
-        "Principal_Investigator_2_State": str,
-        "Principal_Investigator_2_Zip_Code": str,
-        "Principal_Investigator_2_Country": str,
-        "Principal_Investigator_2_Province": str,
-        "Principal_Investigator_2_Postal_Code": str,
-        "Principal_Investigator_2_Primary_Type_1": str,
-        "Principal_Investigator_2_Primary_Type_2": str,
-        "Principal_Investigator_2_Primary_Type_3": str,
-        "Principal_Investigator_2_Primary_Type_4": str,
-        "Principal_Investigator_2_Primary_Type_5": str,
-        "Principal_Investigator_2_Primary_Type_6": str,
-        "Principal_Investigator_2_Specialty_1": str,
-        "Principal_Investigator_2_Specialty_2": str,
-        "Principal_Investigator_2_Specialty_3": str,
-        "Principal_Investigator_2_Specialty_4": str,
-        "Principal_Investigator_2_Specialty_5": str,
-        "Principal_Investigator_2_Specialty_6": str,
-        "Principal_Investigator_2_License_State_code1": str,
-        "Principal_Investigator_2_License_State_code2": str,
-        "Principal_Investigator_2_License_State_code3": str,
-        "Principal_Investigator_2_License_State_code4": str,
-        "Principal_Investigator_2_License_State_code5": str,
-        "Principal_Investigator_3_Covered_Recipient_Type": str,
-        "Principal_Investigator_3_Profile_ID": str,
-        "Principal_Investigator_3_NPI": str,
-        "Principal_Investigator_3_First_Name": str,
-        "Principal_Investigator_3_Middle_Name": str,
-        "Principal_Investigator_3_Last_Name": str,
-        "Principal_Investigator_3_Name_Suffix": str,
-        "Principal_Investigator_3_Business_Street_Address_Line1": str,
-        "Principal_Investigator_3_Business_Street_Address_Line2": str,
-        "Principal_Investigator_3_City": str,
-        "Principal_Investigator_3_State": str,
-        "Principal_Investigator_3_Zip_Code": str,
-        "Principal_Investigator_3_Country": str,
-        "Principal_Investigator_3_Province": str,
-        "Principal_Investigator_3_Postal_Code": str,
-        "Principal_Investigator_3_Primary_Type_1": str,
-        "Principal_Investigator_3_Primary_Type_2": str,
-        "Principal_Investigator_3_Primary_Type_3": str,
-        "Principal_Investigator_3_Primary_Type_4": str,
-        "Principal_Investigator_3_Primary_Type_5": str,
-        "Principal_Investigator_3_Primary_Type_6": str,
-        "Principal_Investigator_3_Specialty_1": str,
-        "Principal_Investigator_3_Specialty_2": str,
-        "Principal_Investigator_3_Specialty_3": str,
-        "Principal_Investigator_3_Specialty_4": str,
-        "Principal_Investigator_3_Specialty_5": str,
-        "Principal_Investigator_3_Specialty_6": str,
-        "Principal_Investigator_3_License_State_code1": str,
-        "Principal_Investigator_3_License_State_code2": str,
-        "Principal_Investigator_3_License_State_code3": str,
-        "Principal_Investigator_3_License_State_code4": str,
-        "Principal_Investigator_3_License_State_code5": str,
-        "Principal_Investigator_4_Covered_Recipient_Type": str,
-        "Principal_Investigator_4_Profile_ID": str,
-        "Principal_Investigator_4_NPI": str,
-        "Principal_Investigator_4_First_Name": str,
-        "Principal_Investigator_4_Middle_Name": str,
-        "Principal_Investigator_4_Last_Name": str,
-        "Principal_Investigator_4_Name_Suffix": str,
-        "Principal_Investigator_4_Business_Street_Address_Line1": str,
-        "Principal_Investigator_4_Business_Street_Address_Line2": str,
-        "Principal_Investigator_4_City": str,
-        "Principal_Investigator_4_State": str,
-        "Principal_Investigator_4_Zip_Code": str,
-        "Principal_Investigator_4_Country": str,
-        "Principal_Investigator_4_Province": str,
-        "Principal_Investigator_4_Postal_Code": str,
-        "Principal_Investigator_4_Primary_Type_1": str,
-        "Principal_Investigator_4_Primary_Type_2": str,
-        "Principal_Investigator_4_Primary_Type_3": str,
-        "Principal_Investigator_4_Primary_Type_4": str,
-        "Principal_Investigator_4_Primary_Type_5": str,
-        "Principal_Investigator_4_Primary_Type_6": str,
-        "Principal_Investigator_4_Specialty_1": str,
-        "Principal_Investigator_4_Specialty_2": str,
-        "Principal_Investigator_4_Specialty_3": str,
-        "Principal_Investigator_4_Specialty_4": str,
-        "Principal_Investigator_4_Specialty_5": str,
-        "Principal_Investigator_4_Specialty_6": str,
-        "Principal_Investigator_4_License_State_code1": str,
-        "Principal_Investigator_4_License_State_code2": str,
-        "Principal_Investigator_4_License_State_code3": str,
-        "Principal_Investigator_4_License_State_code4": str,
-        "Principal_Investigator_4_License_State_code5": str,
-        "Principal_Investigator_5_Covered_Recipient_Type": str,
-        "Principal_Investigator_5_Profile_ID": str,
-        "Principal_Investigator_5_NPI": str,
-        "Principal_Investigator_5_First_Name": str,
-        "Principal_Investigator_5_Middle_Name": str,
-        "Principal_Investigator_5_Last_Name": str,
-        "Principal_Investigator_5_Name_Suffix": str,
-        "Principal_Investigator_5_Business_Street_Address_Line1": str,
-        "Principal_Investigator_5_Business_Street_Address_Line2": str,
-        "Principal_Investigator_5_City": str,
-        "Principal_Investigator_5_State": str,
-        "Principal_Investigator_5_Zip_Code": str,
-        "Principal_Investigator_5_Country": str,
-        "Principal_Investigator_5_Province": str,
-        "Principal_Investigator_5_Postal_Code": str,
-        "Principal_Investigator_5_Primary_Type_1": str,
-        "Principal_Investigator_5_Primary_Type_2": str,
-        "Principal_Investigator_5_Primary_Type_3": str,
-        "Principal_Investigator_5_Primary_Type_4": str,
-        "Principal_Investigator_5_Primary_Type_5": str,
-        "Principal_Investigator_5_Primary_Type_6": str,
-        "Principal_Investigator_5_Specialty_1": str,
-        "Principal_Investigator_5_Specialty_2": str,
-        "Principal_Investigator_5_Specialty_3": str,
-        "Principal_Investigator_5_Specialty_4": str,
-        "Principal_Investigator_5_Specialty_5": str,
-        "Principal_Investigator_5_Specialty_6": str,
-        "Principal_Investigator_5_License_State_code1": str,
-        "Principal_Investigator_5_License_State_code2": str,
-        "Principal_Investigator_5_License_State_code3": str,
-        "Principal_Investigator_5_License_State_code4": str,
-        "Principal_Investigator_5_License_State_code5": str,
-        "Submitting_Applicable_Manufacturer_or_Applicable_GPO_Name": str,
-        "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_ID": int,
-        "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Name": str,
-        "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_State": str,
-        "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Country": str,
-        "Related_Product_Indicator": str,
-        "Covered_or_Noncovered_Indicator_1": str,
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_1": str,
-        "Product_Category_or_Therapeutic_Area_1": str,
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_1": str,
-        "Associated_Drug_or_Biological_NDC_1": str,
-        "Associated_Device_or_Medical_Supply_PDI_1": str,
-        "Covered_or_Noncovered_Indicator_2": str,
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_2": str,
-        "Product_Category_or_Therapeutic_Area_2": str,
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_2": str,
-        "Associated_Drug_or_Biological_NDC_2": str,
-        "Associated_Device_or_Medical_Supply_PDI_2": str,
-        "Covered_or_Noncovered_Indicator_3": str,
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_3": str,
-        "Product_Category_or_Therapeutic_Area_3": str,
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_3": str,
-        "Associated_Drug_or_Biological_NDC_3": str,
-        "Associated_Device_or_Medical_Supply_PDI_3": str,
-        "Covered_or_Noncovered_Indicator_4": str,
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_4": str,
-        "Product_Category_or_Therapeutic_Area_4": str,
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_4": str,
-        "Associated_Drug_or_Biological_NDC_4": str,
-        "Associated_Device_or_Medical_Supply_PDI_4": str,
-        "Covered_or_Noncovered_Indicator_5": str,
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_5": str,
-        "Product_Category_or_Therapeutic_Area_5": str,
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_5": str,
-        "Associated_Drug_or_Biological_NDC_5": str,
-        "Associated_Device_or_Medical_Supply_PDI_5": str,
-        "Total_Amount_of_Payment_USDollars": str,
-        "Date_of_Payment": str,
-        "Form_of_Payment_or_Transfer_of_Value": str,
-        "Expenditure_Category1": str,
-        "Expenditure_Category2": str,
-        "Expenditure_Category3": str,
-        "Expenditure_Category4": str,
-        "Expenditure_Category5": str,
-        "Expenditure_Category6": str,
-        "Preclinical_Research_Indicator": str,
-        "Delay_in_Publication_Indicator": str,
-        "Name_of_Study": str,
-        "Dispute_Status_for_Publication": str,
-        "Record_ID": int,
-        "Program_Year": int,
-        "Payment_Publication_Date": str,
-        "ClinicalTrials_Gov_Identifier": str,
-        "Research_Information_Link": str,
-        "Context_of_Research": str
-            }
-            df = pd.read_csv(input_csv, dtype=dtype_dict_rsrch)
-            df.to_parquet(output_parquet, index=False)
-            print(f"Converted {input_csv} to {output_parquet}")
+            rows = csv_to_parquet(
+                input_csv, output_parquet,
+                # This DAG has always landed RSRCH amounts and dates as strings
+                column_types=arrow_column_types({
+                    **DTYPE_DICT_RSRCH,
+                    "Total_Amount_of_Payment_USDollars": str,
+                    "Date_of_Payment": str,
+                    "Payment_Publication_Date": str,
+                }),
+                block_size=block_size,
+                profile=profile,
+                part_bytes=part_bytes,
+            )
+            print(f"Converted {input_csv} to {output_parquet} ({rows} rows)")
             found_file = True
 
-def convert_large_dtl_gnrl_to_parquet(extract_path, **kwargs):
+def convert_large_dtl_gnrl_to_parquet(extract_path, memory_limit=None, threads=None, temp_directory=None,
+                                      shards=None, profile=None, part_bytes=PARQUET_PART_BYTES, **kwargs):
     """
     Convert CSV files with 'DTL_GNRL' in the filename to Parquet using DuckDB.
+
+    The CSV is parsed with the declared GNRL column types instead of being
+    sniffed, and quoted fields are honoured. memory_limit (e.g. '4GB') and
+    threads size DuckDB to its share of the worker next to the other
+    converters, and temp_directory is where it spills when over the limit.
+    Rows DuckDB cannot parse are counted rather than silently dropped.
+    The Parquet output follows the named profile and is the year's
+    GNRL/program_year=<year>/ directory of part_bytes parts.
+    With shards > 1 the CSV is split on record boundaries and the shards
+    are converted the same way by a process pool, sharing the memory_limit
+    and threads between them; the report sums their counts.
     """
-    dtype_dict_gnrl = {
-        "Change_Type": "object",
-        "Covered_Recipient_Type": "object",
-        "Teaching_Hospital_CCN": "object",
-        "Teaching_Hospital_ID": "object",
-        "Teaching_Hospital_Name": "object",
-        "Covered_Recipient_Profile_ID": "object",
-        "Covered_Recipient_NPI": "object",
-        "Covered_Recipient_First_Name": "object",
-        "Covered_Recipient_Middle_Name": "object",
-        "Covered_Recipient_Last_Name": "object",
-        "Covered_Recipient_Name_Suffix": "object",
-        "Recipient_Primary_Business_Street_Address_Line1": "object",
-        "Recipient_Primary_Business_Street_Address_Line2": "object",
-        "Recipient_City": "object",
-        "Recipient_State": "object",
-        "Recipient_Zip_Code": "object",
-        "Recipient_Country": "object",
-        "Recipient_Province": "object",
-        "Recipient_Postal_Code": "object",
-        "Covered_Recipient_Primary_Type_1": "object",
-        "Covered_Recipient_Primary_Type_2": "object",
-        "Covered_Recipient_Primary_Type_3": "object",
-        "Covered_Recipient_Primary_Type_4": "object",
-        "Covered_Recipient_Primary_Type_5": "object",
-        "Covered_Recipient_Primary_Type_6": "object",
-        "Covered_Recipient_Specialty_1": "object",
-        "Covered_Recipient_Specialty_2": "object",
-        "Covered_Recipient_Specialty_3": "object",
-        "Covered_Recipient_Specialty_4": "object",
-        "Covered_Recipient_Specialty_5": "object",
-        "Covered_Recipient_Specialty_6": "object",
-        "Covered_Recipient_License_State_code1": "object",
-        "Covered_Recipient_License_State_code2": "object",
-        "Covered_Recipient_License_State_code3": "object",
-        "Covered_Recipient_License_State_code4": "object",
-        "Covered_Recipient_License_State_code5": "object",
-        "Submitting_Applicable_Manufacturer_or_Applicable_GPO_Name": "object",
-        "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_ID": "object",
-        "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Name": "object",
-        "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_State": "object",
-        "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Country": "object",
-        "Total_Amount_of_Payment_USDollars": "object",
-        "Date_of_Payment": "object",
-        "Number_of_Payments_Included_in_Total_Amount": "int64",
-        "Form_of_Payment_or_Transfer_of_Value": "object",
-        "Nature_of_Payment_or_Transfer_of_Value": "object",
-        "City_of_Travel": "object",
-        "State_of_Travel": "object",
-        "Country_of_Travel": "object",
-        "Physician_Ownership_Indicator": "object",
-        "Third_Party_Payment_Recipient_Indicator": "object",
-        "Name_of_Third_Party_Entity_Receiving_Payment_or_Transfer_of_Value": "object",
-        "Charity_Indicator": "object",
-        "Third_Party_Equals_Covered_Recipient_Indicator": "object",
-        "Contextual_Information": "object",
-        "Delay_in_Publication_Indicator": "object",
-        "Record_ID": "object",
-        "Dispute_Status_for_Publication": "object",
-        "Related_Product_Indicator": "object",
-        "Covered_or_Noncovered_Indicator_1": "object",
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_1": "object",
-        "Product_Category_or_Therapeutic_Area_1": "object",
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_1": "object",
-        "Associated_Drug_or_Biological_NDC_1": "object",
-        "Associated_Device_or_Medical_Supply_PDI_1": "object",
-        "Covered_or_Noncovered_Indicator_2": "object",
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_2": "object",
-        "Product_Category_or_Therapeutic_Area_2": "object",
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_2": "object",
-        "Associated_Drug_or_Biological_NDC_2": "object",
-        "Associated_Device_or_Medical_Supply_PDI_2": "object",
-        "Covered_or_Noncovered_Indicator_3": "object",
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_3": "object",
-        "Product_Category_or_Therapeutic_Area_3": "object",
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_3": "object",
-        "Associated_Drug_or_Biological_NDC_3": "object",
-        "Associated_Device_or_Medical_Supply_PDI_3": "object",
-        "Covered_or_Noncovered_Indicator_4": "object",
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_4": "object",
-        "Product_Category_or_Therapeutic_Area_4": "object",
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_4": "object",
-        "Associated_Drug_or_Biological_NDC_4": "object",
-        "Associated_Device_or_Medical_Supply_PDI_4": "object",
-        "Covered_or_Noncovered_Indicator_5": "object",
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_5": "object",
-        "Product_Category_or_Therapeutic_Area_5": "object",
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_5": "object",
-        "Associated_Drug_or_Biological_NDC_5": "object",
-        "Associated_Device_or_Medical_Supply_PDI_5": "object",
-        "Program_Year": "int64",
-        "Payment_Publication_Date": "object"
-    }
-    # Mapping Python types to DuckDB SQL types
-    type_mapping = {'object': 'VARCHAR', 'float64': 'DOUBLE', 'int64': 'BIGINT'}
     execution_date = kwargs.get("execution_date")
+    report = {}
     for file in os.listdir(extract_path):
         if 'DTL_GNRL' in file and file.endswith('.csv'):
             input_csv = os.path.join(extract_path, file)
-            output_parquet = os.path.join(extract_path, f"GNRL_{execution_date.strftime('%Y')}.parquet")
-            print(f"Converting {input_csv} to Parquet using DuckDB...")
-            conn = duckdb.connect(database=':memory:')
-            schema_parts = []
-            for col, dtype in dtype_dict_gnrl.items():
-                sql_type = type_mapping.get(dtype, 'VARCHAR')
-                schema_parts.append(f'"{col}": {sql_type}')
-            schema_str = '{' + ', '.join(schema_parts) + '}'
-            query = f"""
-                COPY (
-                    SELECT * FROM read_csv_auto(
-                        '{input_csv}', 
-                        header=true,
-                        sample_size=10000,
-                        strict_mode=false,
-                        ignore_errors=true,
-                        quote=''
-                    )
+            output_dir = _dataset_dir(extract_path, 'GNRL', execution_date.strftime('%Y'))
+            if shards and shards > 1:
+                print(f"Converting {input_csv} to Parquet using DuckDB in {shards} shards...")
+                report = csv_to_parquet_duckdb_sharded(
+                    input_csv, output_dir, DTYPE_DICT_GNRL, shards=shards,
+                    memory_limit=memory_limit, threads=threads, temp_directory=temp_directory, profile=profile,
+                    part_bytes=part_bytes,
                 )
-                TO '{output_parquet}' (FORMAT PARQUET);
-            """
-            conn.execute(query)
-            print(f"Converted {input_csv} to {output_parquet}")
+            else:
+                print(f"Converting {input_csv} to Parquet using DuckDB...")
+                report = csv_to_parquet_duckdb(
+                    input_csv, output_dir, DTYPE_DICT_GNRL,
+                    memory_limit=memory_limit, threads=threads, temp_directory=temp_directory, profile=profile,
+                    part_bytes=part_bytes,
+                )
+            print(f"Converted {input_csv} to {output_dir}: read {report['rows_read']} rows, "
+                  f"wrote {report['rows_written']}, rejected {report['rows_rejected']}")
+    return report
 
-def upload_to_gcs_for_file(bucket, extract_path, **kwargs):
+def upload_to_gcs_for_file(bucket, extract_path, parallelism=UPLOAD_PARALLELISM, **kwargs):
     """
-    Upload the Parquet file for a given file_type to GCS.
+    Upload the Parquet parts for a given file_type to raw/<file_type>/program_year=<year>/ in GCS.
+
+    Objects that already hold the same bytes are skipped, so a retried task
+    only sends what is missing, and parts left there by an earlier run are
+    deleted (see cms_utils.gcs.upload_dataset).
     """
     execution_date = kwargs.get('execution_date')
     # Ensure execution_date is a datetime object.
@@ -489,30 +273,24 @@ def upload_to_gcs_for_file(bucket, extract_path, **kwargs):
     
     year = execution_date.strftime('%Y')
     file_type = kwargs.get('file_type')
-    file_name = f"{file_type}_{year}.parquet"
-    local_file = os.path.join(extract_path, file_name)
-    
+    local_dir = os.path.join(extract_path, dataset_path(file_type, year))
+
     # Print more debug info
-    print(f"Looking for file: {local_file}")
-    print(f"File exists: {os.path.exists(local_file)}")
+    print(f"Looking for directory: {local_dir}")
+    print(f"Directory exists: {os.path.isdir(local_dir)}")
     
-    if not os.path.exists(local_file):
-        print(f"File {local_file} does not exist. Listing directory contents:")
+    if not os.path.isdir(local_dir):
+        print(f"Directory {local_dir} does not exist. Listing directory contents:")
         for file in os.listdir(extract_path):
             print(f"  - {file}")
-        raise Exception(f"{local_file} does not exist")
+        raise Exception(f"{local_dir} does not exist")
     
-    object_name = f"raw/{file_name}"
-    print(f"Uploading {local_file} to gs://{bucket}/{object_name}...")
-    hook = GCSHook(gcp_conn_id="gcp-airflow")
-    hook.upload(
-        bucket_name=bucket,
-        object_name=object_name,
-        filename=local_file,
-        timeout=6000
-    )
-    print(f"Uploaded {local_file} to gs://{bucket}/{object_name}")
-    return file_name
+    prefix = f"raw/{dataset_path(file_type, year)}"
+    print(f"Uploading {local_dir} to gs://{bucket}/{prefix}/...")
+    client = warehouse.storage_client()
+    upload_dataset(client, bucket, prefix, local_dir, parallelism=parallelism)
+    print(f"Uploaded {local_dir} to gs://{bucket}/{prefix}/")
+    return prefix
 
 default_args = {
     "start_date": datetime(2017, 1, 1),
@@ -525,15 +303,30 @@ with DAG(
     schedule_interval="0 0 1 1 *",
     default_args=default_args,
     catchup=True,
-    max_active_runs=1,
+    max_active_runs=MAX_ACTIVE_RUNS,
     template_searchpath=[path_to_local_home],
 ) as dag:
 
+    # Step 0: Reserve this run's workspace once the disk can hold it
+    reserve_workspace_task = PythonOperator(
+        task_id="reserve_workspace",
+        python_callable=reserve_workspace,
+        op_kwargs={'root': EXTRACT_PATH, 'workspace': RUN_WORKSPACE, 'required_bytes': RUN_DISK_BUDGET},
+    )
+
     # Step 1: Download and unzip the file
     download_task = PythonOperator(
         task_id="download_and_unzip",
         python_callable=download_and_unzip,
-        op_kwargs={'url': url_template, 'extract_path': EXTRACT_PATH},
+        op_kwargs={
+            'url': url_template,
+            'extract_path': RUN_WORKSPACE,
+            'file_types': FILE_TYPES,
+            'remote_members': REMOTE_MEMBERS,
+            'connections': DOWNLOAD_CONNECTIONS,
+            'cache_path': DOWNLOAD_CACHE_PATH,
+            'cache_max_bytes': DOWNLOAD_CACHE_MAX_BYTES,
+        },
         provide_context=True,
     )
 
@@ -541,32 +334,45 @@ with DAG(
     list_task = PythonOperator(
         task_id="list_files",
         python_callable=list_files,
-        op_kwargs={'extract_path': EXTRACT_PATH},
+        op_kwargs={'extract_path': RUN_WORKSPACE},
         provide_context=True,
     )
 
-    # Step 3: Convert CSVs to Parquet (sequentially)
+    # Step 3: Convert CSVs to Parquet (in parallel, each within its own memory budget)
     ownrshp_to_parquet_task = PythonOperator(
         task_id="convert_dtl_ownrshp_to_parquet",
         python_callable=convert_dtl_ownrshp_to_parquet,
-        op_kwargs={'extract_path': EXTRACT_PATH},
+        op_kwargs={'extract_path': RUN_WORKSPACE, 'profile': PARQUET_PROFILE, **CONVERT_BUDGETS["OWNRSHP"]},
         provide_context=True,
     )
 
     rsrch_to_parquet_task = PythonOperator(
         task_id="convert_dtl_rsrch_to_parquet",
         python_callable=convert_dtl_rsrch_to_parquet,
-        op_kwargs={'extract_path': EXTRACT_PATH},
+        op_kwargs={'extract_path': RUN_WORKSPACE, 'profile': PARQUET_PROFILE, **CONVERT_BUDGETS["RSRCH"]},
         provide_context=True,
     )
 
     gnrl_to_parquet_task = PythonOperator(
         task_id="convert_large_dtl_gnrl_to_parquet",
         python_callable=convert_large_dtl_gnrl_to_parquet,
-        op_kwargs={'extract_path': EXTRACT_PATH},
+        op_kwargs={
+            'extract_path': RUN_WORKSPACE,
+            'shards': GNRL_SHARDS,
+            'profile': PARQUET_PROFILE,
+            'temp_directory': os.path.join(RUN_WORKSPACE, 'duckdb_spill'),
+            **CONVERT_BUDGETS["GNRL"],
+        },
         provide_context=True,
     )
 
+    convert_tasks = {
+        "OWNRSHP": ownrshp_to_parquet_task,
+        "RSRCH": rsrch_to_parquet_task,
+        "GNRL": gnrl_to_parquet_task,
+    }
+    list_task >> list(convert_tasks.values())
+
     # Step 4: Group file type tasks (upload to GCS and BigQuery operations) using TaskGroup
     with TaskGroup(group_id="bigquery_processing") as bq_group:
         for file_type in FILE_TYPES:
@@ -577,25 +383,29 @@ with DAG(
                     python_callable=upload_to_gcs_for_file,
                     op_kwargs={
                         'bucket': BUCKET,
-                        'extract_path': EXTRACT_PATH,
-                        'file_type': file_type
+                        'extract_path': RUN_WORKSPACE,
+                        'file_type': file_type,
+                        'parallelism': UPLOAD_PARALLELISM,
                     },
                     provide_context=True,
                 )
                 # For BigQuery tasks, use a templated year string
                 year_template = "{{ execution_date.strftime('%Y') }}"
+                # Rows keep the <file_type>_<year>.parquet filename they have always been tagged with
                 file_name_parquet = f"{file_type}_{year_template}.parquet"
+                # Every part of the year's prefix; the files already carry Program_Year, so the
+                # program_year= directory is addressed directly rather than as a hive partition key
+                source_uri = f"gs://{BUCKET}/raw/{dataset_path(file_type, year_template)}/*.parquet"
 
                 # Create external table (year-specific)
-                create_external_table = BigQueryInsertJobOperator(
+                create_external_table = warehouse.job(
                     task_id=f"create_external_table_{file_type}",
-                    gcp_conn_id="gcp-airflow",
                     configuration={
                         "query": {
                             "query": f"""
                                 CREATE OR REPLACE EXTERNAL TABLE `{PROJECT_ID}.{BIGQUERY_DATASET}.{file_type}_{year_template}_ext`
                                 OPTIONS (
-                                    uris = ['gs://{BUCKET}/raw/{file_name_parquet}'],
+                                    uris = ['{source_uri}'],
                                     format = 'PARQUET'
                                 );
                             """,
@@ -606,9 +416,8 @@ with DAG(
                 )
 
                 # Create final table (without year; created only if not exists)
-                create_final_table = BigQueryInsertJobOperator(
+                create_final_table = warehouse.job(
                     task_id=f"create_final_table_{file_type}",
-                    gcp_conn_id="gcp-airflow",
                     configuration={
                         "query": {
                             "query": f"""
@@ -627,9 +436,8 @@ with DAG(
                 )
 
                 # Create temporary table (year-specific)
-                create_temp_table = BigQueryInsertJobOperator(
+                create_temp_table = warehouse.job(
                     task_id=f"create_temp_table_{file_type}",
-                    gcp_conn_id="gcp-airflow",
                     configuration={
                         "query": {
                             "query": f"""
@@ -648,9 +456,8 @@ with DAG(
             
                 # Merge temporary table into the final table
                 '''
-                merge_to_final_table = BigQueryInsertJobOperator(
+                merge_to_final_table = warehouse.job(
                     task_id=f"merge_to_final_table_{file_type}",
-                    gcp_conn_id="gcp-airflow",
                     configuration={
                         "query": {
                             "query": f"""
@@ -664,13 +471,14 @@ with DAG(
                     retries=3,
                 ) '''
 
-                # Chain the tasks for this file type sequentially
-                upload_task >> create_external_table >> create_final_table >> create_temp_table
+                # Chain the tasks for this file type sequentially, starting once its own Parquet is ready
+                convert_tasks[file_type] >> upload_task >> create_external_table >> create_final_table >> create_temp_table
     # Step 5: Cleanup local files after all processing is complete
     cleanup_task = BashOperator(
         task_id="cleanup_files",
-        bash_command=f"rm -rf {EXTRACT_PATH}",
+        bash_command=f"rm -rf {RUN_WORKSPACE}",
     )
 
     # Define overall task sequence
-    download_task >> list_task >> ownrshp_to_parquet_task >> rsrch_to_parquet_task >> gnrl_to_parquet_task >> bq_group >> cleanup_task
\ No newline at end of file
+    reserve_workspace_task >> download_task >> list_task
+    bq_group >> cleanup_task
\ No newline at end of file
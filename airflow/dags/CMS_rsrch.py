@@ -1,19 +1,27 @@
 import os
+import shutil
 from datetime import datetime
-import requests
-import zipfile
 import logging
 
-import pandas as pd
 import duckdb
-import pyarrow.csv as pv
 import pyarrow.parquet as pq
 
 from airflow import DAG
 from airflow.operators.bash import BashOperator
-from airflow.operators.python import PythonOperator
-from airflow.providers.google.cloud.operators.bigquery import BigQueryInsertJobOperator
-from airflow.providers.google.cloud.hooks.gcs import GCSHook
+from airflow.operators.python import BranchPythonOperator, PythonOperator
+
+from cms_utils.archive import extract_members
+from cms_utils.cache import DownloadCache
+from cms_utils.convert import CONVERT_BLOCK_SIZE, arrow_column_types, bigquery_columns, csv_to_parquet
+from cms_utils.delta import DELTA_OP_COLUMN, build_manifest, compute_delta, manifest_publication
+from cms_utils.download import parallel_download, stream_download
+from cms_utils.gcs import dataset_path, upload_dataset, upload_file
+from cms_utils.normalize import split_repeated_columns
+from cms_utils.parquet_profile import parquet_profile
+from cms_utils.remote_zip import fetch_remote_members
+from cms_utils.schemas import DTYPE_DICT_RSRCH, RSRCH_HOT_COLUMNS, RSRCH_PI_INDEX, RSRCH_PI_PREFIX
+from cms_utils.warehouse import Warehouse
+from cms_utils.workspace import reserve_workspace
 
 # Global configuration values
 PROJECT_ID = "dtc-de-course-447715"
@@ -21,14 +29,81 @@ BUCKET = "cms_bucket_jj"
 BIGQUERY_DATASET = "CMS"
 path_to_local_home = os.environ.get("AIRFLOW_HOME", "/opt/airflow")
 EXTRACT_PATH = os.path.join(path_to_local_home, "downloaded_files")
-FILE_TYPES = ["RSRCH", "OWNRSHP", "GNRL"]
+FILE_TYPES = ["RSRCH"]
+# Fetch only the FILE_TYPES members via HTTP Range instead of the whole archive
+REMOTE_MEMBERS = True
+# Parallel connections used to fetch each PGYR archive (1 = single stream)
+DOWNLOAD_CONNECTIONS = 8
+# Archive cache shared by both DAGs; lives outside EXTRACT_PATH so cleanup_files keeps it
+DOWNLOAD_CACHE_PATH = os.path.join(path_to_local_home, "download_cache")
+DOWNLOAD_CACHE_MAX_BYTES = 40 * 1024 ** 3
+# Parquet writer settings for the converter (see cms_utils.parquet_profile.PARQUET_PROFILES)
+PARQUET_PROFILE = "balanced"
+# Each run works in its own EXTRACT_PATH/<dag_id>/<year> directory, so program years can run side by side
+RUN_WORKSPACE = os.path.join(EXTRACT_PATH, "{{ dag.dag_id }}", "{{ execution_date.strftime('%Y') }}")
+# Disk one run needs at its peak (the RSRCH CSV, its full-width Parquet and the slim and
+# investigator datasets split from it), reserved before it starts
+RUN_DISK_BUDGET = 10 * 1024 ** 3
+# Program years ingested concurrently
+MAX_ACTIVE_RUNS = 3
+# Threads uploading the parts of one large Parquet file to GCS
+UPLOAD_PARALLELISM = 8
+# A year is written as RSRCH/program_year=<year>/part-NNNN.parquet files of about this size
+PARQUET_PART_BYTES = 256 * 1024 ** 2
+# RSRCH_ALL has one integer-range partition per program year in [start, end)
+PROGRAM_YEAR_RANGE = (2013, 2031)
+# Within a year, RSRCH_ALL is clustered for record lookups first, then manufacturer filters
+RSRCH_ALL_CLUSTERING = ["Record_ID", "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_ID"]
+# How a year reaches RSRCH_ALL: "load" runs one BigQuery load job straight from the GCS Parquet
+# (no query bytes billed); "query" keeps the external table -> _tmp table -> INSERT path
+LOAD_MODE = "load"
+# With LOAD_MODE = "load": "delta" compares the converted year with the manifest (Record_ID and
+# row hash) saved when the year was last loaded and merges only inserted, updated and deleted
+# records into RSRCH_ALL; "full" always reloads the whole year
+INGEST_MODE = "delta"
+# Above this share of changed records a delta run falls back to the full-year load
+DELTA_MAX_SHARE = 0.5
+# CMS publication the archives come from; a republication gets a new suffix
+PUBLICATION = "P01302025_01212025"
+# The converter moves the Principal_Investigator_<n>_* blocks out of RSRCH_ALL into this table,
+# one row per investigator of a record (Record_ID, Program_Year, pi_index and the block's fields)
+PI_TABLE = "RSRCH_PRINCIPAL_INVESTIGATORS"
+# RSRCH_ALL holds only the columns the dbt models read (RSRCH_HOT_COLUMNS); every column of the
+# year is kept in the lake under raw/RSRCH_archive/program_year=<year>/
+RSRCH_ALL_COLUMNS = ",\n".join(bigquery_columns(DTYPE_DICT_RSRCH, RSRCH_HOT_COLUMNS))
+
+# Where the BigQuery stage runs: "bigquery", or "duckdb" to run the same jobs against a local
+# DuckDB database, with LOCAL_LAKE_PATH standing in for the GCS bucket (see cms_utils.warehouse)
+WAREHOUSE_BACKEND = os.environ.get("CMS_WAREHOUSE", "bigquery")
+LOCAL_WAREHOUSE_PATH = os.path.join(path_to_local_home, "warehouse", "warehouse.duckdb")
+LOCAL_LAKE_PATH = os.path.join(path_to_local_home, "lake")
+# Directory of PGYR<year>_<publication>.zip archives to read instead of download.cms.gov,
+# e.g. sample data from benchmarks/generate_cms_data.py
+SOURCE_DIR = os.environ.get("CMS_SOURCE_DIR")
 
 # URL template for the file to download (templated with execution_date)
-url_template = "https://download.cms.gov/openpayments/PGYR{{ execution_date.strftime('%Y') }}_P01302025_01212025.zip"
+url_template = os.path.join(
+    SOURCE_DIR or "https://download.cms.gov/openpayments",
+    "PGYR{{ execution_date.strftime('%Y') }}_" + PUBLICATION + ".zip",
+)
+
+warehouse = Warehouse(WAREHOUSE_BACKEND, LOCAL_WAREHOUSE_PATH, LOCAL_LAKE_PATH)
 
-def download_and_unzip(url, extract_path, **kwargs):
+def download_and_unzip(url, extract_path, file_types=None, remote_members=False, connections=1,
+                       cache_path=None, cache_max_bytes=None, expected_sha256=None, **kwargs):
     """
     Download a zip file from the rendered URL and extract its contents.
+
+    The archive is streamed to disk in chunks and resumed from the last byte
+    written when a retry finds a partial download. With connections > 1 it is
+    fetched as parallel byte ranges over a pool of connections instead.
+    Only the detail CSVs for file_types (default: FILE_TYPES) are extracted.
+    With remote_members, the archive's central directory is read over HTTP
+    Range first and only those members' bytes are fetched and inflated; the
+    full download is the fallback when the server cannot serve ranges.
+    With cache_path, the archive is served from the shared download cache
+    when the upstream file is unchanged and is kept there after extraction.
+    A url that is a local file (SOURCE_DIR) is extracted without copying.
     """
     execution_date = kwargs.get('execution_date')
     formatted_url = (
@@ -37,21 +112,46 @@ def download_and_unzip(url, extract_path, **kwargs):
     )
 
     os.makedirs(extract_path, exist_ok=True)
-    logging.info(f"Downloading file from {formatted_url}...")
+    file_types = file_types or FILE_TYPES
+    # An archive in SOURCE_DIR is extracted where it is
+    if os.path.isfile(formatted_url):
+        members = extract_members(formatted_url, extract_path, file_types)
+        logging.info("Extracted members: %s", members)
+        return extract_path
+    cache = DownloadCache(cache_path, cache_max_bytes) if cache_path else None
+    # A cached full archive beats a ranged fetch; either DAG may have downloaded it
+    if remote_members and not (cache and cache.lookup(formatted_url)):
+        try:
+            members = fetch_remote_members(formatted_url, extract_path, file_types)
+            logging.info("Fetched remote members: %s", members)
+            return extract_path
+        except Exception as e:
+            logging.warning("Remote member fetch failed (%s), downloading the full archive", e)
 
-    # Download the zip file and check for errors
-    response = requests.get(formatted_url)
-    response.raise_for_status()
+    # Stream the zip file to disk, resuming a partial download and verifying it
+    def download(source_url, zip_path):
+        logging.info(f"Downloading file from {source_url}...")
+        if connections > 1:
+            sha256 = parallel_download(source_url, zip_path, connections=connections,
+                                       expected_sha256=expected_sha256)
+        else:
+            sha256 = stream_download(source_url, zip_path, expected_sha256=expected_sha256)
+        logging.info("Downloaded %s (sha256 %s)", zip_path, sha256)
+        return sha256
 
-    zip_path = os.path.join(extract_path, 'downloaded_file.zip')
-    with open(zip_path, 'wb') as f:
-        f.write(response.content)
+    # Reuse the archive from the shared cache when the upstream file hasn't changed
+    if cache:
+        zip_path = cache.fetch(formatted_url, download)
+    else:
+        zip_path = os.path.join(extract_path, 'downloaded_file.zip')
+        download(formatted_url, zip_path)
 
     logging.info("Extracting files...")
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(extract_path)
+    members = extract_members(zip_path, extract_path, file_types)
+    logging.info("Extracted members: %s", members)
 
-    os.remove(zip_path)
+    if not cache:
+        os.remove(zip_path)
     logging.info("Download and extraction complete.")
     return extract_path
 
@@ -63,9 +163,21 @@ def list_files(extract_path, **kwargs):
     logging.info("Found CSV files: %s", csv_files)
     return csv_files
 
-def convert_dtl_rsrch_to_parquet(extract_path, **kwargs):
+def convert_dtl_rsrch_to_parquet(extract_path, block_size=CONVERT_BLOCK_SIZE, profile=None, stamp_filename=False,
+                                 part_bytes=PARQUET_PART_BYTES, **kwargs):
     """
     Convert CSV files with 'DTL_RSRCH' in the filename to Parquet.
+
+    The CSV is streamed in block_size batches into the full-width archive,
+    RSRCH_archive/program_year=<year>/, written with the named Parquet
+    profile, so peak memory does not grow with the file. From it, the
+    year's RSRCH/program_year=<year>/ directory of part_bytes parts gets
+    only RSRCH_HOT_COLUMNS, and the Principal_Investigator_<n>_* blocks
+    are split off into RSRCH_PI/program_year=<year>/, one row per
+    investigator of a record (see cms_utils.normalize).
+    With stamp_filename, a leading 'filename' column holds RSRCH_<year>.parquet,
+    the name RSRCH_ALL rows have always been tagged with, so a BigQuery load
+    job fills RSRCH_ALL.filename without a query.
     """
     execution_date = kwargs.get('execution_date')
     year = execution_date.strftime('%Y')
@@ -74,270 +186,42 @@ def convert_dtl_rsrch_to_parquet(extract_path, **kwargs):
     for file in os.listdir(extract_path):
         if 'DTL_RSRCH' in file and file.endswith('.csv'):
             input_csv = os.path.join(extract_path, file)
-            output_parquet = os.path.join(extract_path, f"RSRCH_{year}.parquet")
+            file_name = f"RSRCH_{year}.parquet"
+            archive_parquet = os.path.join(extract_path, dataset_path('RSRCH_archive', year))
+            output_parquet = os.path.join(extract_path, dataset_path('RSRCH', year))
+            pi_parquet = os.path.join(extract_path, dataset_path('RSRCH_PI', year))
+            # A retry starts from empty directories, so no part of an earlier attempt survives
+            for directory in (archive_parquet, output_parquet, pi_parquet):
+                shutil.rmtree(directory, ignore_errors=True)
             print(f"Converting {input_csv} to Parquet...")
-            dtype_dict_rsrch = {
-        "Change_Type": str,
-        "Covered_Recipient_Type": str,
-        "Noncovered_Recipient_Entity_Name": str,
-        "Teaching_Hospital_CCN": str,
-        "Teaching_Hospital_ID": str,
-        "Teaching_Hospital_Name": str,
-        "Covered_Recipient_Profile_ID": str,
-        "Covered_Recipient_NPI": str,
-        "Covered_Recipient_First_Name": str,
-        "Covered_Recipient_Middle_Name": str,
-        "Covered_Recipient_Last_Name": str,
-        "Covered_Recipient_Name_Suffix": str,
-        "Recipient_Primary_Business_Street_Address_Line1": str,
-        "Recipient_Primary_Business_Street_Address_Line2": str,
-        "Recipient_City": str,
-        "Recipient_State": str,
-        "Recipient_Zip_Code": str,
-        "Recipient_Country": str,
-        "Recipient_Province": str,
-        "Recipient_Postal_Code": str,
-        "Covered_Recipient_Primary_Type_1": str,
-        "Covered_Recipient_Primary_Type_2": str,
-        "Covered_Recipient_Primary_Type_3": str,
-        "Covered_Recipient_Primary_Type_4": str,
-        "Covered_Recipient_Primary_Type_5": str,
-        "Covered_Recipient_Primary_Type_6": str,
-        "Covered_Recipient_Specialty_1": str,
-        "Covered_Recipient_Specialty_2": str,
-        "Covered_Recipient_Specialty_3": str,
-        "Covered_Recipient_Specialty_4": str,
-        "Covered_Recipient_Specialty_5": str,
-        "Covered_Recipient_Specialty_6": str,
-        "Covered_Recipient_License_State_code1": str,
-        "Covered_Recipient_License_State_code2": str,
-        "Covered_Recipient_License_State_code3": str,
-        "Covered_Recipient_License_State_code4": str,
-        "Covered_Recipient_License_State_code5": str,
-        "Principal_Investigator_1_Covered_Recipient_Type": str,
-        "Principal_Investigator_1_Profile_ID": str,
-        "Principal_Investigator_1_NPI": str,
-        "Principal_Investigator_1_First_Name": str,
-        "Principal_Investigator_1_Middle_Name": str,
-        "Principal_Investigator_1_Last_Name": str,
-        "Principal_Investigator_1_Name_Suffix": str,
-        "Principal_Investigator_1_Business_Street_Address_Line1": str,
-        "Principal_Investigator_1_Business_Street_Address_Line2": str,
-        "Principal_Investigator_1_City": str,
-        "Principal_Investigator_1_State": str,
-        "Principal_Investigator_1_Zip_Code": str,
-        "Principal_Investigator_1_Country": str,
-        "Principal_Investigator_1_Province": str,
-        "Principal_Investigator_1_Postal_Code": str,
-        "Principal_Investigator_1_Primary_Type_1": str,
-        "Principal_Investigator_1_Primary_Type_2": str,
-        "Principal_Investigator_1_Primary_Type_3": str,
-        "Principal_Investigator_1_Primary_Type_4": str,
-        "Principal_Investigator_1_Primary_Type_5": str,
-        "Principal_Investigator_1_Primary_Type_6": str,
-        "Principal_Investigator_1_Specialty_1": str,
-        "Principal_Investigator_1_Specialty_2": str,
-        "Principal_Investigator_1_Specialty_3": str,
-        "Principal_Investigator_1_Specialty_4": str,
-        "Principal_Investigator_1_Specialty_5": str,
-        "Principal_Investigator_1_Specialty_6": str,
-        "Principal_Investigator_1_License_State_code1": str,
-        "Principal_Investigator_1_License_State_code2": str,
-        "Principal_Investigator_1_License_State_code3": str,
-        "Principal_Investigator_1_License_State_code4": str,
-        "Principal_Investigator_1_License_State_code5": str,
-        "Principal_Investigator_2_Covered_Recipient_Type": str,
-        "Principal_Investigator_2_Profile_ID": str,
-        "Principal_Investigator_2_NPI": str,
-        "Principal_Investigator_2_First_Name": str,
-        "Principal_Investigator_2_Middle_Name": str,
-        "Principal_Investigator_2_Last_Name": str,
-        "Principal_Investigator_2_Name_Suffix": str,
-        "Principal_Investigator_2_Business_Street_Address_Line1": str,
-        "Principal_Investigator_2_Business_Street_Address_Line2": str,
-        "Principal_Investigator_2_City": str,
-        "Principal_Investigator_2_State": str,
-        "Principal_Investigator_2_Zip_Code": str,
-        "Principal_Investigator_2_Country": str,
-        "Principal_Investigator_2_Province": str,
-        "Principal_Investigator_2_Postal_Code": str,
-        "Principal_Investigator_2_Primary_Type_1": str,
-        "Principal_Investigator_2_Primary_Type_2": str,
-        "Principal_Investigator_2_Primary_Type_3": str,
-        "Principal_Investigator_2_Primary_Type_4": str,
-        "Principal_Investigator_2_Primary_Type_5": str,
-        "Principal_Investigator_2_Primary_Type_6": str,
-        "Principal_Investigator_2_Specialty_1": str,
-        "Principal_Investigator_2_Specialty_2": str,
-        "Principal_Investigator_2_Specialty_3": str,
-        "Principal_Investigator_2_Specialty_4": str,
-        "Principal_Investigator_2_Specialty_5": str,
-        "Principal_Investigator_2_Specialty_6": str,
-        "Principal_Investigator_2_License_State_code1": str,
-        "Principal_Investigator_2_License_State_code2": str,
-        "Principal_Investigator_2_License_State_code3": str,
-        "Principal_Investigator_2_License_State_code4": str,
-        "Principal_Investigator_2_License_State_code5": str,
-        "Principal_Investigator_3_Covered_Recipient_Type": str,
-        "Principal_Investigator_3_Profile_ID": str,
-        "Principal_Investigator_3_NPI": str,
-        "Principal_Investigator_3_First_Name": str,
-        "Principal_Investigator_3_Middle_Name": str,
-        "Principal_Investigator_3_Last_Name": str,
-        "Principal_Investigator_3_Name_Suffix": str,
-        "Principal_Investigator_3_Business_Street_Address_Line1": str,
-        "Principal_Investigator_3_Business_Street_Address_Line2": str,
-        "Principal_Investigator_3_City": str,
-        "Principal_Investigator_3_State": str,
-        "Principal_Investigator_3_Zip_Code": str,
-        "Principal_Investigator_3_Country": str,
-        "Principal_Investigator_3_Province": str,
-        "Principal_Investigator_3_Postal_Code": str,
-        "Principal_Investigator_3_Primary_Type_1": str,
-        "Principal_Investigator_3_Primary_Type_2": str,
-        "Principal_Investigator_3_Primary_Type_3": str,
-        "Principal_Investigator_3_Primary_Type_4": str,
-        "Principal_Investigator_3_Primary_Type_5": str,
-        "Principal_Investigator_3_Primary_Type_6": str,
-        "Principal_Investigator_3_Specialty_1": str,
-        "Principal_Investigator_3_Specialty_2": str,
-        "Principal_Investigator_3_Specialty_3": str,
-        "Principal_Investigator_3_Specialty_4": str,
-        "Principal_Investigator_3_Specialty_5": str,
-        "Principal_Investigator_3_Specialty_6": str,
-        "Principal_Investigator_3_License_State_code1": str,
-        "Principal_Investigator_3_License_State_code2": str,
-        "Principal_Investigator_3_License_State_code3": str,
-        "Principal_Investigator_3_License_State_code4": str,
-        "Principal_Investigator_3_License_State_code5": str,
-        "Principal_Investigator_4_Covered_Recipient_Type": str,
-        "Principal_Investigator_4_Profile_ID": str,
-        "Principal_Investigator_4_NPI": str,
-        "Principal_Investigator_4_First_Name": str,
-        "Principal_Investigator_4_Middle_Name": str,
-        "Principal_Investigator_4_Last_Name": str,
-        "Principal_Investigator_4_Name_Suffix": str,
-        "Principal_Investigator_4_Business_Street_Address_Line1": str,
-        "Principal_Investigator_4_Business_Street_Address_Line2": str,
-        "Principal_Investigator_4_City": str,
-        "Principal_Investigator_4_State": str,
-        "Principal_Investigator_4_Zip_Code": str,
-        "Principal_Investigator_4_Country": str,
-        "Principal_Investigator_4_Province": str,
-        "Principal_Investigator_4_Postal_Code": str,
-        "Principal_Investigator_4_Primary_Type_1": str,
-        "Principal_Investigator_4_Primary_Type_2": str,
-        "Principal_Investigator_4_Primary_Type_3": str,
-        "Principal_Investigator_4_Primary_Type_4": str,
-        "Principal_Investigator_4_Primary_Type_5": str,
-        "Principal_Investigator_4_Primary_Type_6": str,
-        "Principal_Investigator_4_Specialty_1": str,
-        "Principal_Investigator_4_Specialty_2": str,
-        "Principal_Investigator_4_Specialty_3": str,
-        "Principal_Investigator_4_Specialty_4": str,
-        "Principal_Investigator_4_Specialty_5": str,
-        "Principal_Investigator_4_Specialty_6": str,
-        "Principal_Investigator_4_License_State_code1": str,
-        "Principal_Investigator_4_License_State_code2": str,
-        "Principal_Investigator_4_License_State_code3": str,
-        "Principal_Investigator_4_License_State_code4": str,
-        "Principal_Investigator_4_License_State_code5": str,
-        "Principal_Investigator_5_Covered_Recipient_Type": str,
-        "Principal_Investigator_5_Profile_ID": str,
-        "Principal_Investigator_5_NPI": str,
-        "Principal_Investigator_5_First_Name": str,
-        "Principal_Investigator_5_Middle_Name": str,
-        "Principal_Investigator_5_Last_Name": str,
-        "Principal_Investigator_5_Name_Suffix": str,
-        "Principal_Investigator_5_Business_Street_Address_Line1": str,
-        "Principal_Investigator_5_Business_Street_Address_Line2": str,
-        "Principal_Investigator_5_City": str,
-        "Principal_Investigator_5_State": str,
-        "Principal_Investigator_5_Zip_Code": str,
-        "Principal_Investigator_5_Country": str,
-        "Principal_Investigator_5_Province": str,
-        "Principal_Investigator_5_Postal_Code": str,
-        "Principal_Investigator_5_Primary_Type_1": str,
-        "Principal_Investigator_5_Primary_Type_2": str,
-        "Principal_Investigator_5_Primary_Type_3": str,
-        "Principal_Investigator_5_Primary_Type_4": str,
-        "Principal_Investigator_5_Primary_Type_5": str,
-        "Principal_Investigator_5_Primary_Type_6": str,
-        "Principal_Investigator_5_Specialty_1": str,
-        "Principal_Investigator_5_Specialty_2": str,
-        "Principal_Investigator_5_Specialty_3": str,
-        "Principal_Investigator_5_Specialty_4": str,
-        "Principal_Investigator_5_Specialty_5": str,
-        "Principal_Investigator_5_Specialty_6": str,
-        "Principal_Investigator_5_License_State_code1": str,
-        "Principal_Investigator_5_License_State_code2": str,
-        "Principal_Investigator_5_License_State_code3": str,
-        "Principal_Investigator_5_License_State_code4": str,
-        "Principal_Investigator_5_License_State_code5": str,
-        "Submitting_Applicable_Manufacturer_or_Applicable_GPO_Name": str,
-        "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_ID": int,
-        "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Name": str,
-        "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_State": str,
-        "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Country": str,
-        "Related_Product_Indicator": str,
-        "Covered_or_Noncovered_Indicator_1": str,
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_1": str,
-        "Product_Category_or_Therapeutic_Area_1": str,
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_1": str,
-        "Associated_Drug_or_Biological_NDC_1": str,
-        "Associated_Device_or_Medical_Supply_PDI_1": str,
-        "Covered_or_Noncovered_Indicator_2": str,
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_2": str,
-        "Product_Category_or_Therapeutic_Area_2": str,
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_2": str,
-        "Associated_Drug_or_Biological_NDC_2": str,
-        "Associated_Device_or_Medical_Supply_PDI_2": str,
-        "Covered_or_Noncovered_Indicator_3": str,
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_3": str,
-        "Product_Category_or_Therapeutic_Area_3": str,
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_3": str,
-        "Associated_Drug_or_Biological_NDC_3": str,
-        "Associated_Device_or_Medical_Supply_PDI_3": str,
-        "Covered_or_Noncovered_Indicator_4": str,
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_4": str,
-        "Product_Category_or_Therapeutic_Area_4": str,
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_4": str,
-        "Associated_Drug_or_Biological_NDC_4": str,
-        "Associated_Device_or_Medical_Supply_PDI_4": str,
-        "Covered_or_Noncovered_Indicator_5": str,
-        "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_5": str,
-        "Product_Category_or_Therapeutic_Area_5": str,
-        "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_5": str,
-        "Associated_Drug_or_Biological_NDC_5": str,
-        "Associated_Device_or_Medical_Supply_PDI_5": str,
-        "Total_Amount_of_Payment_USDollars": float,
-        "Date_of_Payment": str,
-        "Form_of_Payment_or_Transfer_of_Value": str,
-        "Expenditure_Category1": str,
-        "Expenditure_Category2": str,
-        "Expenditure_Category3": str,
-        "Expenditure_Category4": str,
-        "Expenditure_Category5": str,
-        "Expenditure_Category6": str,
-        "Preclinical_Research_Indicator": str,
-        "Delay_in_Publication_Indicator": str,
-        "Name_of_Study": str,
-        "Dispute_Status_for_Publication": str,
-        "Record_ID": int,
-        "Program_Year": int,
-        "Payment_Publication_Date": str,
-        "ClinicalTrials_Gov_Identifier": str,
-        "Research_Information_Link": str,
-        "Context_of_Research": str
-            }
-            df = pd.read_csv(input_csv, dtype=dtype_dict_rsrch)
-            df.to_parquet(output_parquet, index=False)
-            print(f"Converted {input_csv} to {output_parquet}")
+            csv_to_parquet(
+                input_csv, archive_parquet,
+                column_types=arrow_column_types(DTYPE_DICT_RSRCH),
+                block_size=block_size,
+                # The split below sorts the slim dataset, so the archive is left as written
+                profile={**parquet_profile(profile), 'sort_by': None},
+                constant_columns={'filename': file_name} if stamp_filename else None,
+                part_bytes=part_bytes,
+            )
+            rows, pi_rows = split_repeated_columns(
+                archive_parquet, output_parquet, pi_parquet,
+                prefix=RSRCH_PI_PREFIX,
+                keys=['Record_ID', 'Program_Year'],
+                index_column=RSRCH_PI_INDEX,
+                columns=['filename', *RSRCH_HOT_COLUMNS],
+                profile=profile,
+                part_bytes=part_bytes,
+            )
+            print(f"Converted {input_csv} to {output_parquet} ({rows} rows) and {pi_parquet} ({pi_rows} rows)")
             found_file = True
 
-def upload_to_gcs_for_file(bucket, extract_path, **kwargs):
+def upload_to_gcs_for_file(bucket, extract_path, parallelism=UPLOAD_PARALLELISM, file_type='RSRCH', **kwargs):
     """
-    Upload the Parquet file for a given file_type to GCS.
+    Upload the year's file_type Parquet parts to raw/<file_type>/program_year=<year>/ in GCS.
+
+    Objects that already hold the same bytes are skipped, so a retried task
+    only sends what is missing, and parts left there by an earlier run are
+    deleted (see cms_utils.gcs.upload_dataset).
     """
     execution_date = kwargs.get('execution_date')
     # Ensure execution_date is a datetime object.
@@ -345,28 +229,83 @@ def upload_to_gcs_for_file(bucket, extract_path, **kwargs):
         execution_date = datetime.fromisoformat(execution_date)
 
     year = execution_date.strftime('%Y')
-    file_name = f"RSRCH_{year}.parquet"
-    local_file = os.path.join(extract_path, file_name)
-
-    # Logging for debugging purposes
-    logging.info("Looking for file: %s", local_file)
-    logging.info("File exists: %s", os.path.exists(local_file))
-
-    if not os.path.exists(local_file):
-        logging.error("File %s does not exist. Directory contents: %s", local_file, os.listdir(extract_path))
-        raise Exception(f"{local_file} does not exist")
-
-    object_name = f"raw/{file_name}"
-    logging.info("Uploading %s to gs://%s/%s...", local_file, bucket, object_name)
-    hook = GCSHook(gcp_conn_id="gcp-airflow")
-    hook.upload(
-        bucket_name=bucket,
-        object_name=object_name,
-        filename=local_file,
-        timeout=6000
-    )
-    logging.info("Uploaded %s to gs://%s/%s", local_file, bucket, object_name)
-    return file_name
+    local_dir = os.path.join(extract_path, dataset_path(file_type, year))
+
+    if not os.path.isdir(local_dir):
+        logging.error("Directory %s does not exist. Directory contents: %s", local_dir, os.listdir(extract_path))
+        raise Exception(f"{local_dir} does not exist")
+
+    prefix = f"raw/{dataset_path(file_type, year)}"
+    logging.info("Uploading %s to gs://%s/%s/...", local_dir, bucket, prefix)
+    client = warehouse.storage_client()
+    upload_dataset(client, bucket, prefix, local_dir, parallelism=parallelism)
+    logging.info("Uploaded %s to gs://%s/%s/", local_dir, bucket, prefix)
+    return prefix
+
+def manifest_object(year):
+    """
+    Where the manifest of the year's last loaded publication is kept in GCS.
+    """
+    return f"manifests/{dataset_path('RSRCH', year)}/manifest.parquet"
+
+def plan_ingest(bucket, extract_path, publication, max_delta_share=DELTA_MAX_SHARE, **kwargs):
+    """
+    Hash the converted year into a manifest and choose how it reaches RSRCH_ALL.
+
+    The manifest is compared with the one saved when the year was last
+    loaded. Only the changed records are written to RSRCH_delta and the
+    delta branch is taken; with nothing changed, only the manifest is
+    stored. The full-year load is the fallback when the year has no saved
+    manifest, when RSRCH_ALL no longer holds as many of the year's records
+    as that manifest (the table was recreated or the year deleted), or
+    when more than max_delta_share of its records changed. Returns the
+    task ids to follow.
+    """
+    execution_date = kwargs.get('execution_date')
+    year = execution_date.strftime('%Y')
+    dataset = os.path.join(extract_path, dataset_path('RSRCH', year))
+    manifest = os.path.join(extract_path, 'manifest.parquet')
+    rows = build_manifest(dataset, manifest, publication=publication)
+
+    client = warehouse.storage_client()
+    previous_blob = client.bucket(bucket).get_blob(manifest_object(year))
+    if previous_blob is None:
+        logging.info("No manifest for %s yet, loading the full year", year)
+        return ['load_to_final_table', 'store_manifest']
+    previous = os.path.join(extract_path, 'previous_manifest.parquet')
+    previous_blob.download_to_filename(previous)
+    logging.info("Comparing publication %s of %s with %s", publication, year, manifest_publication(previous))
+
+    # The delta only holds if RSRCH_ALL still has the year the manifest describes
+    manifest_rows = pq.ParquetFile(previous).metadata.num_rows
+    loaded_rows = warehouse.query(
+        f"SELECT count(*) FROM `{PROJECT_ID}.{BIGQUERY_DATASET}.RSRCH_ALL` WHERE Program_Year = {int(year)}"
+    )[0][0]
+    if loaded_rows != manifest_rows:
+        logging.info("RSRCH_ALL has %d records of %s, its manifest %d; loading the full year",
+                     loaded_rows, year, manifest_rows)
+        return ['load_to_final_table', 'store_manifest']
+
+    delta_dir = os.path.join(extract_path, dataset_path('RSRCH_delta', year))
+    shutil.rmtree(delta_dir, ignore_errors=True)
+    report = compute_delta(dataset, previous, manifest, delta_dir, part_bytes=PARQUET_PART_BYTES)
+    changes = report['inserted'] + report['updated'] + report['deleted']
+    logging.info("%d of %d records changed: %s", changes, rows, report)
+    if not changes:
+        return ['store_manifest']
+    if changes > max_delta_share * max(rows, 1):
+        logging.info("More than %.0f%% of %s changed, loading the full year", max_delta_share * 100, year)
+        return ['load_to_final_table', 'store_manifest']
+    return ['upload_delta', 'store_manifest']
+
+def store_manifest(bucket, extract_path, **kwargs):
+    """
+    Save the manifest of the year just loaded, for the next publication's delta.
+    """
+    execution_date = kwargs.get('execution_date')
+    year = execution_date.strftime('%Y')
+    client = warehouse.storage_client()
+    upload_file(client, bucket, manifest_object(year), os.path.join(extract_path, 'manifest.parquet'))
 
 default_args = {
     "start_date": datetime(2018, 1, 1),
@@ -379,304 +318,78 @@ with DAG(
     schedule_interval="0 0 1 1 *",
     default_args=default_args,
     catchup=True,
-    max_active_runs=1,
+    max_active_runs=MAX_ACTIVE_RUNS,
     template_searchpath=[path_to_local_home],
 ) as dag:
 
+    reserve_workspace_task = PythonOperator(
+        task_id="reserve_workspace",
+        python_callable=reserve_workspace,
+        op_kwargs={'root': EXTRACT_PATH, 'workspace': RUN_WORKSPACE, 'required_bytes': RUN_DISK_BUDGET},
+    )
+
     download_task = PythonOperator(
         task_id="download_and_unzip",
         python_callable=download_and_unzip,
-        op_kwargs={'url': url_template, 'extract_path': EXTRACT_PATH},
+        op_kwargs={
+            'url': url_template,
+            'extract_path': RUN_WORKSPACE,
+            'file_types': FILE_TYPES,
+            'remote_members': REMOTE_MEMBERS,
+            'connections': DOWNLOAD_CONNECTIONS,
+            'cache_path': DOWNLOAD_CACHE_PATH,
+            'cache_max_bytes': DOWNLOAD_CACHE_MAX_BYTES,
+        },
     )
 
     list_task = PythonOperator(
         task_id="list_files",
         python_callable=list_files,
-        op_kwargs={'extract_path': EXTRACT_PATH},
+        op_kwargs={'extract_path': RUN_WORKSPACE},
     )
 
     rsrch_to_parquet_task = PythonOperator(
         task_id="convert_dtl_rsrch_to_parquet",
         python_callable=convert_dtl_rsrch_to_parquet,
-        op_kwargs={'extract_path': EXTRACT_PATH},
+        op_kwargs={
+            'extract_path': RUN_WORKSPACE,
+            'profile': PARQUET_PROFILE,
+            'stamp_filename': LOAD_MODE == "load",
+        },
     )
 
     # Parquet file and table name templates (Jinja templated)
     parquet_filename_template = 'RSRCH_{{ execution_date.strftime(\'%Y\') }}.parquet'
     table_name_template = 'RSRCH_{{ execution_date.strftime(\'%Y\') }}'
     final_name_template = 'RSRCH_ALL'
+    year_template = "{{ execution_date.strftime('%Y') }}"
+    # Every part of the year; BigQuery reads the files in parallel. The prefix is named
+    # directly rather than through hive partitioning, whose program_year key would clash
+    # with the Program_Year column the files already have
+    source_uri_template = f"gs://{BUCKET}/raw/{dataset_path('RSRCH', year_template)}/*.parquet"
 
     upload_to_gcs = PythonOperator(
         task_id="upload_to_gcs",
         python_callable=upload_to_gcs_for_file,
         op_kwargs={
             'bucket': BUCKET,
-            'extract_path': EXTRACT_PATH
+            'extract_path': RUN_WORKSPACE,
+            'parallelism': UPLOAD_PARALLELISM,
         },
         retries=10,
     )
 
-    create_final_table_task = BigQueryInsertJobOperator(
+    create_final_table_task = warehouse.job(
         task_id="create_final_table",
-        gcp_conn_id="gcp-airflow",
         configuration={
             "query": {
                 "query": f"""
                     CREATE TABLE IF NOT EXISTS `{PROJECT_ID}.{BIGQUERY_DATASET}.{final_name_template}` (
                     filename STRING,
-                    Change_Type STRING,
-                    Covered_Recipient_Type STRING,
-                    Noncovered_Recipient_Entity_Name STRING,
-                    Teaching_Hospital_CCN STRING,
-                    Teaching_Hospital_ID STRING,
-                    Teaching_Hospital_Name STRING,
-                    Covered_Recipient_Profile_ID STRING,
-                    Covered_Recipient_NPI STRING,
-                    Covered_Recipient_First_Name STRING,
-                    Covered_Recipient_Middle_Name STRING,
-                    Covered_Recipient_Last_Name STRING,
-                    Covered_Recipient_Name_Suffix STRING,
-                    Recipient_Primary_Business_Street_Address_Line1 STRING,
-                    Recipient_Primary_Business_Street_Address_Line2 STRING,
-                    Recipient_City STRING,
-                    Recipient_State STRING,
-                    Recipient_Zip_Code STRING,
-                    Recipient_Country STRING,
-                    Recipient_Province STRING,
-                    Recipient_Postal_Code STRING,
-                    Covered_Recipient_Primary_Type_1 STRING,
-                    Covered_Recipient_Primary_Type_2 STRING,
-                    Covered_Recipient_Primary_Type_3 STRING,
-                    Covered_Recipient_Primary_Type_4 STRING,
-                    Covered_Recipient_Primary_Type_5 STRING,
-                    Covered_Recipient_Primary_Type_6 STRING,
-                    Covered_Recipient_Specialty_1 STRING,
-                    Covered_Recipient_Specialty_2 STRING,
-                    Covered_Recipient_Specialty_3 STRING,
-                    Covered_Recipient_Specialty_4 STRING,
-                    Covered_Recipient_Specialty_5 STRING,
-                    Covered_Recipient_Specialty_6 STRING,
-                    Covered_Recipient_License_State_code1 STRING,
-                    Covered_Recipient_License_State_code2 STRING,
-                    Covered_Recipient_License_State_code3 STRING,
-                    Covered_Recipient_License_State_code4 STRING,
-                    Covered_Recipient_License_State_code5 STRING,
-                    Principal_Investigator_1_Covered_Recipient_Type STRING,
-                    Principal_Investigator_1_Profile_ID STRING,
-                    Principal_Investigator_1_NPI STRING,
-                    Principal_Investigator_1_First_Name STRING,
-                    Principal_Investigator_1_Middle_Name STRING,
-                    Principal_Investigator_1_Last_Name STRING,
-                    Principal_Investigator_1_Name_Suffix STRING,
-                    Principal_Investigator_1_Business_Street_Address_Line1 STRING,
-                    Principal_Investigator_1_Business_Street_Address_Line2 STRING,
-                    Principal_Investigator_1_City STRING,
-                    Principal_Investigator_1_State STRING,
-                    Principal_Investigator_1_Zip_Code STRING,
-                    Principal_Investigator_1_Country STRING,
-                    Principal_Investigator_1_Province STRING,
-                    Principal_Investigator_1_Postal_Code STRING,
-                    Principal_Investigator_1_Primary_Type_1 STRING,
-                    Principal_Investigator_1_Primary_Type_2 STRING,
-                    Principal_Investigator_1_Primary_Type_3 STRING,
-                    Principal_Investigator_1_Primary_Type_4 STRING,
-                    Principal_Investigator_1_Primary_Type_5 STRING,
-                    Principal_Investigator_1_Primary_Type_6 STRING,
-                    Principal_Investigator_1_Specialty_1 STRING,
-                    Principal_Investigator_1_Specialty_2 STRING,
-                    Principal_Investigator_1_Specialty_3 STRING,
-                    Principal_Investigator_1_Specialty_4 STRING,
-                    Principal_Investigator_1_Specialty_5 STRING,
-                    Principal_Investigator_1_Specialty_6 STRING,
-                    Principal_Investigator_1_License_State_code1 STRING,
-                    Principal_Investigator_1_License_State_code2 STRING,
-                    Principal_Investigator_1_License_State_code3 STRING,
-                    Principal_Investigator_1_License_State_code4 STRING,
-                    Principal_Investigator_1_License_State_code5 STRING,
-                    Principal_Investigator_2_Covered_Recipient_Type STRING,
-                    Principal_Investigator_2_Profile_ID STRING,
-                    Principal_Investigator_2_NPI STRING,
-                    Principal_Investigator_2_First_Name STRING,
-                    Principal_Investigator_2_Middle_Name STRING,
-                    Principal_Investigator_2_Last_Name STRING,
-                    Principal_Investigator_2_Name_Suffix STRING,
-                    Principal_Investigator_2_Business_Street_Address_Line1 STRING,
-                    Principal_Investigator_2_Business_Street_Address_Line2 STRING,
-                    Principal_Investigator_2_City STRING,
-                    Principal_Investigator_2_State STRING,
-                    Principal_Investigator_2_Zip_Code STRING,
-                    Principal_Investigator_2_Country STRING,
-                    Principal_Investigator_2_Province STRING,
-                    Principal_Investigator_2_Postal_Code STRING,
-                    Principal_Investigator_2_Primary_Type_1 STRING,
-                    Principal_Investigator_2_Primary_Type_2 STRING,
-                    Principal_Investigator_2_Primary_Type_3 STRING,
-                    Principal_Investigator_2_Primary_Type_4 STRING,
-                    Principal_Investigator_2_Primary_Type_5 STRING,
-                    Principal_Investigator_2_Primary_Type_6 STRING,
-                    Principal_Investigator_2_Specialty_1 STRING,
-                    Principal_Investigator_2_Specialty_2 STRING,
-                    Principal_Investigator_2_Specialty_3 STRING,
-                    Principal_Investigator_2_Specialty_4 STRING,
-                    Principal_Investigator_2_Specialty_5 STRING,
-                    Principal_Investigator_2_Specialty_6 STRING,
-                    Principal_Investigator_2_License_State_code1 STRING,
-                    Principal_Investigator_2_License_State_code2 STRING,
-                    Principal_Investigator_2_License_State_code3 STRING,
-                    Principal_Investigator_2_License_State_code4 STRING,
-                    Principal_Investigator_2_License_State_code5 STRING,
-                    Principal_Investigator_3_Covered_Recipient_Type STRING,
-                    Principal_Investigator_3_Profile_ID STRING,
-                    Principal_Investigator_3_NPI STRING,
-                    Principal_Investigator_3_First_Name STRING,
-                    Principal_Investigator_3_Middle_Name STRING,
-                    Principal_Investigator_3_Last_Name STRING,
-                    Principal_Investigator_3_Name_Suffix STRING,
-                    Principal_Investigator_3_Business_Street_Address_Line1 STRING,
-                    Principal_Investigator_3_Business_Street_Address_Line2 STRING,
-                    Principal_Investigator_3_City STRING,
-                    Principal_Investigator_3_State STRING,
-                    Principal_Investigator_3_Zip_Code STRING,
-                    Principal_Investigator_3_Country STRING,
-                    Principal_Investigator_3_Province STRING,
-                    Principal_Investigator_3_Postal_Code STRING,
-                    Principal_Investigator_3_Primary_Type_1 STRING,
-                    Principal_Investigator_3_Primary_Type_2 STRING,
-                    Principal_Investigator_3_Primary_Type_3 STRING,
-                    Principal_Investigator_3_Primary_Type_4 STRING,
-                    Principal_Investigator_3_Primary_Type_5 STRING,
-                    Principal_Investigator_3_Primary_Type_6 STRING,
-                    Principal_Investigator_3_Specialty_1 STRING,
-                    Principal_Investigator_3_Specialty_2 STRING,
-                    Principal_Investigator_3_Specialty_3 STRING,
-                    Principal_Investigator_3_Specialty_4 STRING,
-                    Principal_Investigator_3_Specialty_5 STRING,
-                    Principal_Investigator_3_Specialty_6 STRING,
-                    Principal_Investigator_3_License_State_code1 STRING,
-                    Principal_Investigator_3_License_State_code2 STRING,
-                    Principal_Investigator_3_License_State_code3 STRING,
-                    Principal_Investigator_3_License_State_code4 STRING,
-                    Principal_Investigator_3_License_State_code5 STRING,
-                    Principal_Investigator_4_Covered_Recipient_Type STRING,
-                    Principal_Investigator_4_Profile_ID STRING,
-                    Principal_Investigator_4_NPI STRING,
-                    Principal_Investigator_4_First_Name STRING,
-                    Principal_Investigator_4_Middle_Name STRING,
-                    Principal_Investigator_4_Last_Name STRING,
-                    Principal_Investigator_4_Name_Suffix STRING,
-                    Principal_Investigator_4_Business_Street_Address_Line1 STRING,
-                    Principal_Investigator_4_Business_Street_Address_Line2 STRING,
-                    Principal_Investigator_4_City STRING,
-                    Principal_Investigator_4_State STRING,
-                    Principal_Investigator_4_Zip_Code STRING,
-                    Principal_Investigator_4_Country STRING,
-                    Principal_Investigator_4_Province STRING,
-                    Principal_Investigator_4_Postal_Code STRING,
-                    Principal_Investigator_4_Primary_Type_1 STRING,
-                    Principal_Investigator_4_Primary_Type_2 STRING,
-                    Principal_Investigator_4_Primary_Type_3 STRING,
-                    Principal_Investigator_4_Primary_Type_4 STRING,
-                    Principal_Investigator_4_Primary_Type_5 STRING,
-                    Principal_Investigator_4_Primary_Type_6 STRING,
-                    Principal_Investigator_4_Specialty_1 STRING,
-                    Principal_Investigator_4_Specialty_2 STRING,
-                    Principal_Investigator_4_Specialty_3 STRING,
-                    Principal_Investigator_4_Specialty_4 STRING,
-                    Principal_Investigator_4_Specialty_5 STRING,
-                    Principal_Investigator_4_Specialty_6 STRING,
-                    Principal_Investigator_4_License_State_code1 STRING,
-                    Principal_Investigator_4_License_State_code2 STRING,
-                    Principal_Investigator_4_License_State_code3 STRING,
-                    Principal_Investigator_4_License_State_code4 STRING,
-                    Principal_Investigator_4_License_State_code5 STRING,
-                    Principal_Investigator_5_Covered_Recipient_Type STRING,
-                    Principal_Investigator_5_Profile_ID STRING,
-                    Principal_Investigator_5_NPI STRING,
-                    Principal_Investigator_5_First_Name STRING,
-                    Principal_Investigator_5_Middle_Name STRING,
-                    Principal_Investigator_5_Last_Name STRING,
-                    Principal_Investigator_5_Name_Suffix STRING,
-                    Principal_Investigator_5_Business_Street_Address_Line1 STRING,
-                    Principal_Investigator_5_Business_Street_Address_Line2 STRING,
-                    Principal_Investigator_5_City STRING,
-                    Principal_Investigator_5_State STRING,
-                    Principal_Investigator_5_Zip_Code STRING,
-                    Principal_Investigator_5_Country STRING,
-                    Principal_Investigator_5_Province STRING,
-                    Principal_Investigator_5_Postal_Code STRING,
-                    Principal_Investigator_5_Primary_Type_1 STRING,
-                    Principal_Investigator_5_Primary_Type_2 STRING,
-                    Principal_Investigator_5_Primary_Type_3 STRING,
-                    Principal_Investigator_5_Primary_Type_4 STRING,
-                    Principal_Investigator_5_Primary_Type_5 STRING,
-                    Principal_Investigator_5_Primary_Type_6 STRING,
-                    Principal_Investigator_5_Specialty_1 STRING,
-                    Principal_Investigator_5_Specialty_2 STRING,
-                    Principal_Investigator_5_Specialty_3 STRING,
-                    Principal_Investigator_5_Specialty_4 STRING,
-                    Principal_Investigator_5_Specialty_5 STRING,
-                    Principal_Investigator_5_Specialty_6 STRING,
-                    Principal_Investigator_5_License_State_code1 STRING,
-                    Principal_Investigator_5_License_State_code2 STRING,
-                    Principal_Investigator_5_License_State_code3 STRING,
-                    Principal_Investigator_5_License_State_code4 STRING,
-                    Principal_Investigator_5_License_State_code5 STRING,
-                    Submitting_Applicable_Manufacturer_or_Applicable_GPO_Name STRING,
-                    Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_ID INT64,
-                    Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Name STRING,
-                    Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_State STRING,
-                    Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Country STRING,
-                    Related_Product_Indicator STRING,
-                    Covered_or_Noncovered_Indicator_1 STRING,
-                    Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_1 STRING,
-                    Product_Category_or_Therapeutic_Area_1 STRING,
-                    Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_1 STRING,
-                    Associated_Drug_or_Biological_NDC_1 STRING,
-                    Associated_Device_or_Medical_Supply_PDI_1 STRING,
-                    Covered_or_Noncovered_Indicator_2 STRING,
-                    Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_2 STRING,
-                    Product_Category_or_Therapeutic_Area_2 STRING,
-                    Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_2 STRING,
-                    Associated_Drug_or_Biological_NDC_2 STRING,
-                    Associated_Device_or_Medical_Supply_PDI_2 STRING,
-                    Covered_or_Noncovered_Indicator_3 STRING,
-                    Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_3 STRING,
-                    Product_Category_or_Therapeutic_Area_3 STRING,
-                    Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_3 STRING,
-                    Associated_Drug_or_Biological_NDC_3 STRING,
-                    Associated_Device_or_Medical_Supply_PDI_3 STRING,
-                    Covered_or_Noncovered_Indicator_4 STRING,
-                    Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_4 STRING,
-                    Product_Category_or_Therapeutic_Area_4 STRING,
-                    Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_4 STRING,
-                    Associated_Drug_or_Biological_NDC_4 STRING,
-                    Associated_Device_or_Medical_Supply_PDI_4 STRING,
-                    Covered_or_Noncovered_Indicator_5 STRING,
-                    Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_5 STRING,
-                    Product_Category_or_Therapeutic_Area_5 STRING,
-                    Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_5 STRING,
-                    Associated_Drug_or_Biological_NDC_5 STRING,
-                    Associated_Device_or_Medical_Supply_PDI_5 STRING,
-                    Total_Amount_of_Payment_USDollars FLOAT64,
-                    Date_of_Payment STRING,
-                    Form_of_Payment_or_Transfer_of_Value STRING,
-                    Expenditure_Category1 STRING,
-                    Expenditure_Category2 STRING,
-                    Expenditure_Category3 STRING,
-                    Expenditure_Category4 STRING,
-                    Expenditure_Category5 STRING,
-                    Expenditure_Category6 STRING,
-                    Preclinical_Research_Indicator STRING,
-                    Delay_in_Publication_Indicator STRING,
-                    Name_of_Study STRING,
-                    Dispute_Status_for_Publication STRING,
-                    Record_ID INT64,
-                    Program_Year INT64,
-                    Payment_Publication_Date STRING,
-                    ClinicalTrials_Gov_Identifier STRING,
-                    Research_Information_Link STRING,
-                    Context_of_Research STRING
+                    {RSRCH_ALL_COLUMNS}
                     )
+                    PARTITION BY RANGE_BUCKET(Program_Year, GENERATE_ARRAY({PROGRAM_YEAR_RANGE[0]}, {PROGRAM_YEAR_RANGE[1]}, 1))
+                    CLUSTER BY {', '.join(RSRCH_ALL_CLUSTERING)}
                 """,
                 "useLegacySql": False,
             }
@@ -684,288 +397,229 @@ with DAG(
         retries=3,
     )
 
-    create_external_table_task = BigQueryInsertJobOperator(
-        task_id="create_external_table",
-        gcp_conn_id="gcp-airflow",
-        configuration={
-            "query": {
-                "query": f"""
-                    CREATE OR REPLACE EXTERNAL TABLE `{PROJECT_ID}.{BIGQUERY_DATASET}.{table_name_template}_ext` (
-                    Change_Type STRING,
-                    Covered_Recipient_Type STRING,
-                    Noncovered_Recipient_Entity_Name STRING,
-                    Teaching_Hospital_CCN STRING,
-                    Teaching_Hospital_ID STRING,
-                    Teaching_Hospital_Name STRING,
-                    Covered_Recipient_Profile_ID STRING,
-                    Covered_Recipient_NPI STRING,
-                    Covered_Recipient_First_Name STRING,
-                    Covered_Recipient_Middle_Name STRING,
-                    Covered_Recipient_Last_Name STRING,
-                    Covered_Recipient_Name_Suffix STRING,
-                    Recipient_Primary_Business_Street_Address_Line1 STRING,
-                    Recipient_Primary_Business_Street_Address_Line2 STRING,
-                    Recipient_City STRING,
-                    Recipient_State STRING,
-                    Recipient_Zip_Code STRING,
-                    Recipient_Country STRING,
-                    Recipient_Province STRING,
-                    Recipient_Postal_Code STRING,
-                    Covered_Recipient_Primary_Type_1 STRING,
-                    Covered_Recipient_Primary_Type_2 STRING,
-                    Covered_Recipient_Primary_Type_3 STRING,
-                    Covered_Recipient_Primary_Type_4 STRING,
-                    Covered_Recipient_Primary_Type_5 STRING,
-                    Covered_Recipient_Primary_Type_6 STRING,
-                    Covered_Recipient_Specialty_1 STRING,
-                    Covered_Recipient_Specialty_2 STRING,
-                    Covered_Recipient_Specialty_3 STRING,
-                    Covered_Recipient_Specialty_4 STRING,
-                    Covered_Recipient_Specialty_5 STRING,
-                    Covered_Recipient_Specialty_6 STRING,
-                    Covered_Recipient_License_State_code1 STRING,
-                    Covered_Recipient_License_State_code2 STRING,
-                    Covered_Recipient_License_State_code3 STRING,
-                    Covered_Recipient_License_State_code4 STRING,
-                    Covered_Recipient_License_State_code5 STRING,
-                    Principal_Investigator_1_Covered_Recipient_Type STRING,
-                    Principal_Investigator_1_Profile_ID STRING,
-                    Principal_Investigator_1_NPI STRING,
-                    Principal_Investigator_1_First_Name STRING,
-                    Principal_Investigator_1_Middle_Name STRING,
-                    Principal_Investigator_1_Last_Name STRING,
-                    Principal_Investigator_1_Name_Suffix STRING,
-                    Principal_Investigator_1_Business_Street_Address_Line1 STRING,
-                    Principal_Investigator_1_Business_Street_Address_Line2 STRING,
-                    Principal_Investigator_1_City STRING,
-                    Principal_Investigator_1_State STRING,
-                    Principal_Investigator_1_Zip_Code STRING,
-                    Principal_Investigator_1_Country STRING,
-                    Principal_Investigator_1_Province STRING,
-                    Principal_Investigator_1_Postal_Code STRING,
-                    Principal_Investigator_1_Primary_Type_1 STRING,
-                    Principal_Investigator_1_Primary_Type_2 STRING,
-                    Principal_Investigator_1_Primary_Type_3 STRING,
-                    Principal_Investigator_1_Primary_Type_4 STRING,
-                    Principal_Investigator_1_Primary_Type_5 STRING,
-                    Principal_Investigator_1_Primary_Type_6 STRING,
-                    Principal_Investigator_1_Specialty_1 STRING,
-                    Principal_Investigator_1_Specialty_2 STRING,
-                    Principal_Investigator_1_Specialty_3 STRING,
-                    Principal_Investigator_1_Specialty_4 STRING,
-                    Principal_Investigator_1_Specialty_5 STRING,
-                    Principal_Investigator_1_Specialty_6 STRING,
-                    Principal_Investigator_1_License_State_code1 STRING,
-                    Principal_Investigator_1_License_State_code2 STRING,
-                    Principal_Investigator_1_License_State_code3 STRING,
-                    Principal_Investigator_1_License_State_code4 STRING,
-                    Principal_Investigator_1_License_State_code5 STRING,
-                    Principal_Investigator_2_Covered_Recipient_Type STRING,
-                    Principal_Investigator_2_Profile_ID STRING,
-                    Principal_Investigator_2_NPI STRING,
-                    Principal_Investigator_2_First_Name STRING,
-                    Principal_Investigator_2_Middle_Name STRING,
-                    Principal_Investigator_2_Last_Name STRING,
-                    Principal_Investigator_2_Name_Suffix STRING,
-                    Principal_Investigator_2_Business_Street_Address_Line1 STRING,
-                    Principal_Investigator_2_Business_Street_Address_Line2 STRING,
-                    Principal_Investigator_2_City STRING,
-                    Principal_Investigator_2_State STRING,
-                    Principal_Investigator_2_Zip_Code STRING,
-                    Principal_Investigator_2_Country STRING,
-                    Principal_Investigator_2_Province STRING,
-                    Principal_Investigator_2_Postal_Code STRING,
-                    Principal_Investigator_2_Primary_Type_1 STRING,
-                    Principal_Investigator_2_Primary_Type_2 STRING,
-                    Principal_Investigator_2_Primary_Type_3 STRING,
-                    Principal_Investigator_2_Primary_Type_4 STRING,
-                    Principal_Investigator_2_Primary_Type_5 STRING,
-                    Principal_Investigator_2_Primary_Type_6 STRING,
-                    Principal_Investigator_2_Specialty_1 STRING,
-                    Principal_Investigator_2_Specialty_2 STRING,
-                    Principal_Investigator_2_Specialty_3 STRING,
-                    Principal_Investigator_2_Specialty_4 STRING,
-                    Principal_Investigator_2_Specialty_5 STRING,
-                    Principal_Investigator_2_Specialty_6 STRING,
-                    Principal_Investigator_2_License_State_code1 STRING,
-                    Principal_Investigator_2_License_State_code2 STRING,
-                    Principal_Investigator_2_License_State_code3 STRING,
-                    Principal_Investigator_2_License_State_code4 STRING,
-                    Principal_Investigator_2_License_State_code5 STRING,
-                    Principal_Investigator_3_Covered_Recipient_Type STRING,
-                    Principal_Investigator_3_Profile_ID STRING,
-                    Principal_Investigator_3_NPI STRING,
-                    Principal_Investigator_3_First_Name STRING,
-                    Principal_Investigator_3_Middle_Name STRING,
-                    Principal_Investigator_3_Last_Name STRING,
-                    Principal_Investigator_3_Name_Suffix STRING,
-                    Principal_Investigator_3_Business_Street_Address_Line1 STRING,
-                    Principal_Investigator_3_Business_Street_Address_Line2 STRING,
-                    Principal_Investigator_3_City STRING,
-                    Principal_Investigator_3_State STRING,
-                    Principal_Investigator_3_Zip_Code STRING,
-                    Principal_Investigator_3_Country STRING,
-                    Principal_Investigator_3_Province STRING,
-                    Principal_Investigator_3_Postal_Code STRING,
-                    Principal_Investigator_3_Primary_Type_1 STRING,
-                    Principal_Investigator_3_Primary_Type_2 STRING,
-                    Principal_Investigator_3_Primary_Type_3 STRING,
-                    Principal_Investigator_3_Primary_Type_4 STRING,
-                    Principal_Investigator_3_Primary_Type_5 STRING,
-                    Principal_Investigator_3_Primary_Type_6 STRING,
-                    Principal_Investigator_3_Specialty_1 STRING,
-                    Principal_Investigator_3_Specialty_2 STRING,
-                    Principal_Investigator_3_Specialty_3 STRING,
-                    Principal_Investigator_3_Specialty_4 STRING,
-                    Principal_Investigator_3_Specialty_5 STRING,
-                    Principal_Investigator_3_Specialty_6 STRING,
-                    Principal_Investigator_3_License_State_code1 STRING,
-                    Principal_Investigator_3_License_State_code2 STRING,
-                    Principal_Investigator_3_License_State_code3 STRING,
-                    Principal_Investigator_3_License_State_code4 STRING,
-                    Principal_Investigator_3_License_State_code5 STRING,
-                    Principal_Investigator_4_Covered_Recipient_Type STRING,
-                    Principal_Investigator_4_Profile_ID STRING,
-                    Principal_Investigator_4_NPI STRING,
-                    Principal_Investigator_4_First_Name STRING,
-                    Principal_Investigator_4_Middle_Name STRING,
-                    Principal_Investigator_4_Last_Name STRING,
-                    Principal_Investigator_4_Name_Suffix STRING,
-                    Principal_Investigator_4_Business_Street_Address_Line1 STRING,
-                    Principal_Investigator_4_Business_Street_Address_Line2 STRING,
-                    Principal_Investigator_4_City STRING,
-                    Principal_Investigator_4_State STRING,
-                    Principal_Investigator_4_Zip_Code STRING,
-                    Principal_Investigator_4_Country STRING,
-                    Principal_Investigator_4_Province STRING,
-                    Principal_Investigator_4_Postal_Code STRING,
-                    Principal_Investigator_4_Primary_Type_1 STRING,
-                    Principal_Investigator_4_Primary_Type_2 STRING,
-                    Principal_Investigator_4_Primary_Type_3 STRING,
-                    Principal_Investigator_4_Primary_Type_4 STRING,
-                    Principal_Investigator_4_Primary_Type_5 STRING,
-                    Principal_Investigator_4_Primary_Type_6 STRING,
-                    Principal_Investigator_4_Specialty_1 STRING,
-                    Principal_Investigator_4_Specialty_2 STRING,
-                    Principal_Investigator_4_Specialty_3 STRING,
-                    Principal_Investigator_4_Specialty_4 STRING,
-                    Principal_Investigator_4_Specialty_5 STRING,
-                    Principal_Investigator_4_Specialty_6 STRING,
-                    Principal_Investigator_4_License_State_code1 STRING,
-                    Principal_Investigator_4_License_State_code2 STRING,
-                    Principal_Investigator_4_License_State_code3 STRING,
-                    Principal_Investigator_4_License_State_code4 STRING,
-                    Principal_Investigator_4_License_State_code5 STRING,
-                    Principal_Investigator_5_Covered_Recipient_Type STRING,
-                    Principal_Investigator_5_Profile_ID STRING,
-                    Principal_Investigator_5_NPI STRING,
-                    Principal_Investigator_5_First_Name STRING,
-                    Principal_Investigator_5_Middle_Name STRING,
-                    Principal_Investigator_5_Last_Name STRING,
-                    Principal_Investigator_5_Name_Suffix STRING,
-                    Principal_Investigator_5_Business_Street_Address_Line1 STRING,
-                    Principal_Investigator_5_Business_Street_Address_Line2 STRING,
-                    Principal_Investigator_5_City STRING,
-                    Principal_Investigator_5_State STRING,
-                    Principal_Investigator_5_Zip_Code STRING,
-                    Principal_Investigator_5_Country STRING,
-                    Principal_Investigator_5_Province STRING,
-                    Principal_Investigator_5_Postal_Code STRING,
-                    Principal_Investigator_5_Primary_Type_1 STRING,
-                    Principal_Investigator_5_Primary_Type_2 STRING,
-                    Principal_Investigator_5_Primary_Type_3 STRING,
-                    Principal_Investigator_5_Primary_Type_4 STRING,
-                    Principal_Investigator_5_Primary_Type_5 STRING,
-                    Principal_Investigator_5_Primary_Type_6 STRING,
-                    Principal_Investigator_5_Specialty_1 STRING,
-                    Principal_Investigator_5_Specialty_2 STRING,
-                    Principal_Investigator_5_Specialty_3 STRING,
-                    Principal_Investigator_5_Specialty_4 STRING,
-                    Principal_Investigator_5_Specialty_5 STRING,
-                    Principal_Investigator_5_Specialty_6 STRING,
-                    Principal_Investigator_5_License_State_code1 STRING,
-                    Principal_Investigator_5_License_State_code2 STRING,
-                    Principal_Investigator_5_License_State_code3 STRING,
-                    Principal_Investigator_5_License_State_code4 STRING,
-                    Principal_Investigator_5_License_State_code5 STRING,
-                    Submitting_Applicable_Manufacturer_or_Applicable_GPO_Name STRING,
-                    Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_ID INT64,
-                    Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Name STRING,
-                    Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_State STRING,
-                    Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Country STRING,
-                    Related_Product_Indicator STRING,
-                    Covered_or_Noncovered_Indicator_1 STRING,
-                    Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_1 STRING,
-                    Product_Category_or_Therapeutic_Area_1 STRING,
-                    Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_1 STRING,
-                    Associated_Drug_or_Biological_NDC_1 STRING,
-                    Associated_Device_or_Medical_Supply_PDI_1 STRING,
-                    Covered_or_Noncovered_Indicator_2 STRING,
-                    Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_2 STRING,
-                    Product_Category_or_Therapeutic_Area_2 STRING,
-                    Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_2 STRING,
-                    Associated_Drug_or_Biological_NDC_2 STRING,
-                    Associated_Device_or_Medical_Supply_PDI_2 STRING,
-                    Covered_or_Noncovered_Indicator_3 STRING,
-                    Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_3 STRING,
-                    Product_Category_or_Therapeutic_Area_3 STRING,
-                    Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_3 STRING,
-                    Associated_Drug_or_Biological_NDC_3 STRING,
-                    Associated_Device_or_Medical_Supply_PDI_3 STRING,
-                    Covered_or_Noncovered_Indicator_4 STRING,
-                    Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_4 STRING,
-                    Product_Category_or_Therapeutic_Area_4 STRING,
-                    Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_4 STRING,
-                    Associated_Drug_or_Biological_NDC_4 STRING,
-                    Associated_Device_or_Medical_Supply_PDI_4 STRING,
-                    Covered_or_Noncovered_Indicator_5 STRING,
-                    Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_5 STRING,
-                    Product_Category_or_Therapeutic_Area_5 STRING,
-                    Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_5 STRING,
-                    Associated_Drug_or_Biological_NDC_5 STRING,
-                    Associated_Device_or_Medical_Supply_PDI_5 STRING,
-                    Total_Amount_of_Payment_USDollars FLOAT64,
-                    Date_of_Payment STRING,
-                    Form_of_Payment_or_Transfer_of_Value STRING,
-                    Expenditure_Category1 STRING,
-                    Expenditure_Category2 STRING,
-                    Expenditure_Category3 STRING,
-                    Expenditure_Category4 STRING,
-                    Expenditure_Category5 STRING,
-                    Expenditure_Category6 STRING,
-                    Preclinical_Research_Indicator STRING,
-                    Delay_in_Publication_Indicator STRING,
-                    Name_of_Study STRING,
-                    Dispute_Status_for_Publication STRING,
-                    Record_ID INT64,
-                    Program_Year INT64,
-                    Payment_Publication_Date STRING,
-                    ClinicalTrials_Gov_Identifier STRING,
-                    Research_Information_Link STRING,
-                    Context_of_Research STRING
-                    )
-                    OPTIONS (
-                        uris = ['gs://{BUCKET}/raw/{parquet_filename_template}'],
-                        format = 'PARQUET'
-                    );
-                """,
-                "useLegacySql": False,
-            }
+    if LOAD_MODE == "load":
+        # One load job from GCS instead of the external/_tmp/INSERT jobs; the filename column
+        # was stamped into the Parquet by the converter. Writing to the year's partition
+        # decorator with WRITE_TRUNCATE atomically replaces that year, so retries and reruns
+        # never append duplicates (and rows of any other year fail the load)
+        load_to_final_table_task = warehouse.job(
+            task_id="load_to_final_table",
+            configuration={
+                "load": {
+                    "sourceUris": [source_uri_template],
+                    "sourceFormat": "PARQUET",
+                    "destinationTable": {
+                        "projectId": PROJECT_ID,
+                        "datasetId": BIGQUERY_DATASET,
+                        "tableId": f"{final_name_template}${year_template}",
+                    },
+                    "createDisposition": "CREATE_NEVER",
+                    "writeDisposition": "WRITE_TRUNCATE",
+                }
+            },
+            retries=3,
+        )
+
+    else:
+        create_external_table_task = warehouse.job(
+            task_id="create_external_table",
+            configuration={
+                "query": {
+                    "query": f"""
+                        CREATE OR REPLACE EXTERNAL TABLE `{PROJECT_ID}.{BIGQUERY_DATASET}.{table_name_template}_ext` (
+                        {RSRCH_ALL_COLUMNS}
+                        )
+                        OPTIONS (
+                            uris = ['{source_uri_template}'],
+                            format = 'PARQUET'
+                        );
+                    """,
+                    "useLegacySql": False,
+                }
+            },
+            retries=3,
+        )
+
+        create_temp_table_task = warehouse.job(
+            task_id="create_temp_table",
+            configuration={
+                "query": {
+                    "query": f"""
+                        CREATE OR REPLACE TABLE `{PROJECT_ID}.{BIGQUERY_DATASET}.{table_name_template}_tmp` AS
+                        SELECT
+                            '{parquet_filename_template}' AS filename,
+                             *
+                        FROM `{PROJECT_ID}.{BIGQUERY_DATASET}.{table_name_template}_ext`;
+                    """,
+                    "useLegacySql": False,
+                }
+            },
+            retries=3,
+        )
+
+        merge_to_final_table_task = warehouse.job(
+            task_id="merge_to_final_table",
+            configuration={
+                "query": {
+                    "query": f"""
+                        -- Replace the year atomically: deleting a whole partition is free, and a
+                        -- retried or re-triggered run cannot leave duplicate rows behind
+                        BEGIN TRANSACTION;
+                        DELETE FROM `{PROJECT_ID}.{BIGQUERY_DATASET}.{final_name_template}`
+                        WHERE Program_Year = {year_template};
+                        INSERT INTO `{PROJECT_ID}.{BIGQUERY_DATASET}.{final_name_template}`
+                        SELECT *
+                        FROM `{PROJECT_ID}.{BIGQUERY_DATASET}.{table_name_template}_tmp`;
+                        COMMIT TRANSACTION;
+                    """,
+                    "useLegacySql": False,
+                }
+            },
+            retries=3,
+        )
+
+    if LOAD_MODE == "load" and INGEST_MODE == "delta":
+        plan_ingest_task = BranchPythonOperator(
+            task_id="plan_ingest",
+            python_callable=plan_ingest,
+            op_kwargs={'bucket': BUCKET, 'extract_path': RUN_WORKSPACE, 'publication': PUBLICATION},
+        )
+
+        upload_delta_task = PythonOperator(
+            task_id="upload_delta",
+            python_callable=upload_to_gcs_for_file,
+            op_kwargs={
+                'bucket': BUCKET,
+                'extract_path': RUN_WORKSPACE,
+                'parallelism': UPLOAD_PARALLELISM,
+                'file_type': 'RSRCH_delta',
+            },
+            retries=10,
+        )
+
+        # The changed records, with their delta_op, in a year-specific staging table
+        load_delta_task = warehouse.job(
+            task_id="load_delta",
+            configuration={
+                "load": {
+                    "sourceUris": [f"gs://{BUCKET}/raw/{dataset_path('RSRCH_delta', year_template)}/*.parquet"],
+                    "sourceFormat": "PARQUET",
+                    "destinationTable": {
+                        "projectId": PROJECT_ID,
+                        "datasetId": BIGQUERY_DATASET,
+                        "tableId": f"{table_name_template}_delta",
+                    },
+                    "createDisposition": "CREATE_IF_NEEDED",
+                    "writeDisposition": "WRITE_TRUNCATE",
+                }
+            },
+            retries=3,
+        )
+
+        # Updated and deleted records are removed, then inserted and updated ones added, in one
+        # transaction. The delta's columns are RSRCH_ALL's in order, plus delta_op at the end
+        merge_delta_task = warehouse.job(
+            task_id="merge_delta",
+            configuration={
+                "query": {
+                    "query": f"""
+                        BEGIN TRANSACTION;
+                        DELETE FROM `{PROJECT_ID}.{BIGQUERY_DATASET}.{final_name_template}`
+                        WHERE Program_Year = {year_template}
+                          AND Record_ID IN (
+                              SELECT Record_ID FROM `{PROJECT_ID}.{BIGQUERY_DATASET}.{table_name_template}_delta`
+                          );
+                        INSERT INTO `{PROJECT_ID}.{BIGQUERY_DATASET}.{final_name_template}`
+                        SELECT * EXCEPT ({DELTA_OP_COLUMN})
+                        FROM `{PROJECT_ID}.{BIGQUERY_DATASET}.{table_name_template}_delta`
+                        WHERE {DELTA_OP_COLUMN} != 'DELETE';
+                        COMMIT TRANSACTION;
+                    """,
+                    "useLegacySql": False,
+                }
+            },
+            retries=3,
+        )
+
+        # Runs after whichever branch plan_ingest took, and only if it succeeded
+        store_manifest_task = PythonOperator(
+            task_id="store_manifest",
+            python_callable=store_manifest,
+            op_kwargs={'bucket': BUCKET, 'extract_path': RUN_WORKSPACE},
+            trigger_rule="none_failed_min_one_success",
+        )
+
+    # Every column of the year, kept only in the lake; unchanged parts are not sent again
+    upload_archive_task = PythonOperator(
+        task_id="upload_archive_to_gcs",
+        python_callable=upload_to_gcs_for_file,
+        op_kwargs={
+            'bucket': BUCKET,
+            'extract_path': RUN_WORKSPACE,
+            'parallelism': UPLOAD_PARALLELISM,
+            'file_type': 'RSRCH_archive',
         },
-        retries=3,
+        retries=10,
+    )
+
+    # The investigators of the year, loaded in every LOAD_MODE and INGEST_MODE: a load job bills
+    # no query bytes, and replacing the year's partition keeps it in step with RSRCH_ALL
+    upload_pi_task = PythonOperator(
+        task_id="upload_pi_to_gcs",
+        python_callable=upload_to_gcs_for_file,
+        op_kwargs={
+            'bucket': BUCKET,
+            'extract_path': RUN_WORKSPACE,
+            'parallelism': UPLOAD_PARALLELISM,
+            'file_type': 'RSRCH_PI',
+        },
+        retries=10,
     )
 
-    create_temp_table_task = BigQueryInsertJobOperator(
-        task_id="create_temp_table",
-        gcp_conn_id="gcp-airflow",
+    create_pi_table_task = warehouse.job(
+        task_id="create_pi_table",
         configuration={
             "query": {
                 "query": f"""
-                    CREATE OR REPLACE TABLE `{PROJECT_ID}.{BIGQUERY_DATASET}.{table_name_template}_tmp` AS
-                    SELECT
-                        "{parquet_filename_template}" AS filename,
-                         *
-                    FROM `{PROJECT_ID}.{BIGQUERY_DATASET}.{table_name_template}_ext`;
+                    CREATE TABLE IF NOT EXISTS `{PROJECT_ID}.{BIGQUERY_DATASET}.{PI_TABLE}` (
+                    Record_ID INT64,
+                    Program_Year INT64,
+                    {RSRCH_PI_INDEX} INT64,
+                    Covered_Recipient_Type STRING,
+                    Profile_ID STRING,
+                    NPI STRING,
+                    First_Name STRING,
+                    Middle_Name STRING,
+                    Last_Name STRING,
+                    Name_Suffix STRING,
+                    Business_Street_Address_Line1 STRING,
+                    Business_Street_Address_Line2 STRING,
+                    City STRING,
+                    State STRING,
+                    Zip_Code STRING,
+                    Country STRING,
+                    Province STRING,
+                    Postal_Code STRING,
+                    Primary_Type_1 STRING,
+                    Primary_Type_2 STRING,
+                    Primary_Type_3 STRING,
+                    Primary_Type_4 STRING,
+                    Primary_Type_5 STRING,
+                    Primary_Type_6 STRING,
+                    Specialty_1 STRING,
+                    Specialty_2 STRING,
+                    Specialty_3 STRING,
+                    Specialty_4 STRING,
+                    Specialty_5 STRING,
+                    Specialty_6 STRING,
+                    License_State_code1 STRING,
+                    License_State_code2 STRING,
+                    License_State_code3 STRING,
+                    License_State_code4 STRING,
+                    License_State_code5 STRING
+                    )
+                    PARTITION BY RANGE_BUCKET(Program_Year, GENERATE_ARRAY({PROGRAM_YEAR_RANGE[0]}, {PROGRAM_YEAR_RANGE[1]}, 1))
+                    CLUSTER BY Record_ID
                 """,
                 "useLegacySql": False,
             }
@@ -973,17 +627,19 @@ with DAG(
         retries=3,
     )
 
-    merge_to_final_table_task = BigQueryInsertJobOperator(
-        task_id="merge_to_final_table",
-        gcp_conn_id="gcp-airflow",
+    load_pi_task = warehouse.job(
+        task_id="load_pi_table",
         configuration={
-            "query": {
-                "query": f"""
-                    INSERT INTO `{PROJECT_ID}.{BIGQUERY_DATASET}.{final_name_template}` 
-                    SELECT *
-                    FROM `{PROJECT_ID}.{BIGQUERY_DATASET}.{table_name_template}_tmp`;
-                """,
-                "useLegacySql": False,
+            "load": {
+                "sourceUris": [f"gs://{BUCKET}/raw/{dataset_path('RSRCH_PI', year_template)}/*.parquet"],
+                "sourceFormat": "PARQUET",
+                "destinationTable": {
+                    "projectId": PROJECT_ID,
+                    "datasetId": BIGQUERY_DATASET,
+                    "tableId": f"{PI_TABLE}${year_template}",
+                },
+                "createDisposition": "CREATE_NEVER",
+                "writeDisposition": "WRITE_TRUNCATE",
             }
         },
         retries=3,
@@ -991,8 +647,23 @@ with DAG(
 
     cleanup_task = BashOperator(
         task_id="cleanup_files",
-        bash_command=f"rm -rf {EXTRACT_PATH}",
+        bash_command=f"rm -rf {RUN_WORKSPACE}",
     )
 
     # Define overall task sequence
-    download_task >> list_task >> rsrch_to_parquet_task >> upload_to_gcs >> create_final_table_task >> create_external_table_task >> create_temp_table_task >> merge_to_final_table_task >> cleanup_task
+    reserve_workspace_task >> download_task >> list_task >> rsrch_to_parquet_task
+    rsrch_to_parquet_task >> upload_pi_task >> create_pi_table_task >> load_pi_task >> cleanup_task
+    rsrch_to_parquet_task >> upload_archive_task >> cleanup_task
+    if LOAD_MODE == "load" and INGEST_MODE == "delta":
+        # The year's lake copy is refreshed whichever way RSRCH_ALL is updated
+        rsrch_to_parquet_task >> upload_to_gcs >> [load_to_final_table_task, store_manifest_task]
+        rsrch_to_parquet_task >> create_final_table_task >> plan_ingest_task
+        plan_ingest_task >> [load_to_final_table_task, upload_delta_task, store_manifest_task]
+        load_to_final_table_task >> store_manifest_task
+        upload_delta_task >> load_delta_task >> merge_delta_task >> store_manifest_task
+        store_manifest_task >> cleanup_task
+    elif LOAD_MODE == "load":
+        rsrch_to_parquet_task >> upload_to_gcs >> create_final_table_task >> load_to_final_table_task >> cleanup_task
+    else:
+        rsrch_to_parquet_task >> upload_to_gcs >> create_final_table_task
+        create_final_table_task >> create_external_table_task >> create_temp_table_task >> merge_to_final_table_task >> cleanup_task
@@ -0,0 +1,44 @@
+import logging
+import os
+import shutil
+import zipfile
+
+from cms_utils.download import CHUNK_SIZE
+
+
+def member_keyword(file_type):
+    """
+    Keyword identifying a file type's detail CSV inside a PGYR archive, e.g. 'DTL_RSRCH'.
+    """
+    return f"DTL_{file_type}"
+
+
+def select_members(names, file_types):
+    """
+    Return the archive member names holding the detail CSVs for file_types.
+    """
+    keywords = [member_keyword(file_type) for file_type in file_types]
+    return [
+        name for name in names
+        if name.endswith('.csv') and any(keyword in name for keyword in keywords)
+    ]
+
+
+def extract_members(zip_path, extract_path, file_types):
+    """
+    Decompress only the detail CSVs for file_types into extract_path.
+
+    Members are written flat under their base name, which is where the
+    converters look for them, and the rest of the archive is left untouched.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        members = select_members(zip_ref.namelist(), file_types)
+        if not members:
+            raise Exception(f"No members for {file_types} in {zip_path}: {zip_ref.namelist()}")
+        for name in members:
+            target = os.path.join(extract_path, os.path.basename(name))
+            logging.info("Extracting %s (%d bytes)", name, zip_ref.getinfo(name).file_size)
+            with zip_ref.open(name) as src, open(target, 'wb') as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    return members
+
@@ -0,0 +1,181 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+import requests
+
+from cms_utils.download import REQUEST_TIMEOUT
+
+INDEX_FILE = 'index.json'
+
+
+@contextmanager
+def file_lock(lock_path):
+    """
+    Hold an exclusive flock on lock_path, shared across processes and DAG runs.
+    """
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def remote_validators(url, timeout=REQUEST_TIMEOUT):
+    """
+    HEAD the URL and return its (ETag, Last-Modified, Content-Length).
+    """
+    response = requests.head(url, allow_redirects=True, timeout=timeout)
+    response.raise_for_status()
+    length = response.headers.get('Content-Length')
+    return (
+        response.headers.get('ETag'),
+        response.headers.get('Last-Modified'),
+        int(length) if length is not None else None,
+    )
+
+
+class DownloadCache:
+    """
+    Local artifact cache for upstream archives, shared by every DAG on the worker.
+
+    Entries are keyed by URL plus the server's ETag/Last-Modified, so a
+    republished file is a miss while reruns and retries are hits. Blobs are
+    stored once under their sha256 and evicted least-recently-used first
+    when the cache grows past max_bytes.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def _index_path(self):
+        return os.path.join(self.root, INDEX_FILE)
+
+    def _read_index(self):
+        path = self._index_path()
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_index(self, index):
+        tmp_path = self._index_path() + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self._index_path())
+
+    def _blob_path(self, sha256):
+        return os.path.join(self.blob_dir, f"{sha256}.zip")
+
+    @staticmethod
+    def cache_key(url, etag, last_modified):
+        return hashlib.sha256(f"{url}\n{etag}\n{last_modified}".encode()).hexdigest()
+
+    def _lookup(self, key, size):
+        """
+        Return the cached blob for key and mark it used, or None on a miss.
+        """
+        with file_lock(os.path.join(self.root, '.index.lock')):
+            index = self._read_index()
+            entry = index.get(key)
+            if not entry:
+                return None
+            blob = self._blob_path(entry['sha256'])
+            if not os.path.exists(blob) or (size is not None and os.path.getsize(blob) != size):
+                del index[key]
+                self._write_index(index)
+                return None
+            entry['last_access'] = time.time()
+            self._write_index(index)
+            return blob
+
+    def _store(self, key, url, etag, last_modified, tmp_path, sha256):
+        blob = self._blob_path(sha256)
+        with file_lock(os.path.join(self.root, '.index.lock')):
+            os.replace(tmp_path, blob)
+            index = self._read_index()
+            index[key] = {
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+                'sha256': sha256,
+                'size': os.path.getsize(blob),
+                'last_access': time.time(),
+            }
+            self._evict(index, keep=sha256)
+            self._write_index(index)
+        return blob
+
+    def _evict(self, index, keep):
+        """
+        Drop least-recently-used blobs until the cache fits in max_bytes.
+        """
+        blobs = {}
+        for key, entry in index.items():
+            blob = blobs.setdefault(entry['sha256'], {'size': entry['size'], 'last_access': 0, 'keys': []})
+            blob['last_access'] = max(blob['last_access'], entry['last_access'])
+            blob['keys'].append(key)
+
+        total = sum(blob['size'] for blob in blobs.values())
+        for sha256, blob in sorted(blobs.items(), key=lambda item: item[1]['last_access']):
+            if total <= self.max_bytes:
+                break
+            if sha256 == keep:
+                continue
+            logging.info("Evicting cached archive %s (%d bytes)", sha256, blob['size'])
+            path = self._blob_path(sha256)
+            if os.path.exists(path):
+                os.remove(path)
+            for key in blob['keys']:
+                del index[key]
+            total -= blob['size']
+
+    def _key_for(self, url):
+        etag, last_modified, size = remote_validators(url)
+        if not etag and not last_modified:
+            # PGYR URLs embed the publication id, so URL plus size still identifies the file
+            logging.warning("%s has no ETag or Last-Modified, keying the cache on URL and size", url)
+            last_modified = f"size={size}"
+        return self.cache_key(url, etag, last_modified), etag, last_modified, size
+
+    def lookup(self, url):
+        """
+        Return the cached archive for url if the upstream file is unchanged, else None.
+        """
+        key, _, _, size = self._key_for(url)
+        return self._lookup(key, size)
+
+    def fetch(self, url, download):
+        """
+        Return a local path to the archive at url, downloading it only on a cache miss.
+
+        download(url, dest_path) is called on a miss and must leave the
+        complete file at dest_path and return its sha256. Concurrent callers
+        for the same entry wait on a per-entry lock and then hit the cache.
+        The returned path belongs to the cache and must not be deleted.
+        """
+        key, etag, last_modified, size = self._key_for(url)
+        blob = self._lookup(key, size)
+        if blob:
+            logging.info("Cache hit for %s: %s", url, blob)
+            return blob
+
+        with file_lock(os.path.join(self.tmp_dir, f"{key}.lock")):
+            blob = self._lookup(key, size)
+            if blob:
+                logging.info("Cache hit for %s after waiting on another download: %s", url, blob)
+                return blob
+            logging.info("Cache miss for %s, downloading", url)
+            tmp_path = os.path.join(self.tmp_dir, f"{key}.zip")
+            sha256 = download(url, tmp_path)
+            return self._store(key, url, etag, last_modified, tmp_path, sha256)
@@ -0,0 +1,509 @@
+import csv
+import io
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+
+from cms_utils.parquet_profile import (
+    PART_NAME,
+    copy_to_parts,
+    duckdb_copy_options,
+    sort_order,
+    sort_parquet,
+    write_batches,
+)
+
+# Bytes of CSV parsed into one record batch; this and the Parquet profile's row
+# group size, not the file size, bound a converter's peak memory
+CONVERT_BLOCK_SIZE = 64 * 1024 * 1024
+
+# The strings pandas.read_csv treats as missing, so streamed output keeps the same nulls
+PANDAS_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+# CMS dates are MM/DD/YYYY
+DATE_FORMAT = '%m/%d/%Y'
+
+# "decimal" is BigQuery's NUMERIC, so amounts load exactly
+_ARROW_TYPES = {
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    "object": pa.string(),
+    "int64": pa.int64(),
+    "float64": pa.float64(),
+    "decimal": pa.decimal128(38, 9),
+    "date": pa.date32(),
+}
+
+# Mapping Python types to DuckDB SQL types
+_DUCKDB_TYPES = {
+    str: 'VARCHAR',
+    int: 'BIGINT',
+    float: 'DOUBLE',
+    'object': 'VARCHAR',
+    'int64': 'BIGINT',
+    'float64': 'DOUBLE',
+    'decimal': 'DECIMAL(38, 9)',
+    'date': 'DATE',
+}
+
+# Mapping Python types to BigQuery column types
+_BIGQUERY_TYPES = {
+    str: 'STRING',
+    int: 'INT64',
+    float: 'FLOAT64',
+    'object': 'STRING',
+    'int64': 'INT64',
+    'float64': 'FLOAT64',
+    'decimal': 'NUMERIC',
+    'date': 'DATE',
+}
+
+_INTEGER_PATTERN = r'^\s*[+-]?\d{1,18}\s*$'
+_DATE_PATTERN = r'^\s*\d{1,2}/(?P<day>\d{1,2})/\d{4}\s*$'
+_FLOAT_PATTERN = r'^\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*$'
+
+
+def arrow_column_types(dtype_dict):
+    """
+    Translate a pandas-style dtype dict into Arrow column types.
+    """
+    return {col: _ARROW_TYPES.get(dtype, pa.string()) for col, dtype in dtype_dict.items()}
+
+
+def bigquery_columns(dtype_dict, columns=None):
+    """
+    BigQuery column definitions ("name TYPE") for dtype_dict's columns, or only those of columns, in order.
+    """
+    return [f"{col} {_BIGQUERY_TYPES.get(dtype_dict[col], 'STRING')}" for col in (columns or dtype_dict)]
+
+
+def _parse_column(values, arrow_type):
+    """
+    Parse a string array into arrow_type; return it and the number of values that did not parse.
+
+    Values that do not parse become null instead of failing the batch.
+    """
+    if pa.types.is_date(arrow_type):
+        parsed = pc.strptime(values, format=DATE_FORMAT, unit='s', error_is_null=True)
+        # strptime rolls a day past the month's end over (02/30 becomes 03/02), so the day must survive
+        day = pc.struct_field(pc.extract_regex(values, _DATE_PATTERN), 'day').cast(pa.int64())
+        parsed = pc.if_else(pc.equal(pc.day(parsed), day), parsed, None).cast(arrow_type)
+    else:
+        if pa.types.is_decimal(arrow_type):
+            digits, scale = arrow_type.precision - arrow_type.scale, arrow_type.scale
+            pattern = rf'^\s*[+-]?(\d{{1,{digits}}}(\.\d{{0,{scale}}})?|\.\d{{1,{scale}}})\s*$'
+        else:
+            pattern = _INTEGER_PATTERN if pa.types.is_integer(arrow_type) else _FLOAT_PATTERN
+        valid = pc.match_substring_regex(values, pattern)
+        parsed = pc.if_else(valid, pc.utf8_trim_whitespace(values), None).cast(arrow_type)
+    return parsed, parsed.null_count - values.null_count
+
+
+def _with_parsed_columns(schema, batches, parsed_types, unparsed):
+    """
+    Parse the parsed_types columns of every batch (read as strings); return (schema, batches).
+
+    Counts of values that did not parse are added to unparsed ({column: count}) as batches are read.
+    """
+    if not parsed_types:
+        return schema, batches
+    schema = pa.schema([
+        pa.field(field.name, parsed_types[field.name]) if field.name in parsed_types else field for field in schema
+    ])
+
+    def parse():
+        for batch in batches:
+            columns = []
+            for field, values in zip(batch.schema, batch.columns):
+                if field.name in parsed_types:
+                    values, failed = _parse_column(values, parsed_types[field.name])
+                    unparsed[field.name] = unparsed.get(field.name, 0) + failed
+                columns.append(values)
+            yield pa.RecordBatch.from_arrays(columns, schema=schema)
+    return schema, parse()
+
+
+def _with_constants(schema, batches, constants):
+    """
+    Prepend a constant string column per constants entry to every batch; return (schema, batches).
+    """
+    if not constants:
+        return schema, batches
+    schema = pa.schema([pa.field(name, pa.string()) for name in constants] + list(schema))
+
+    def prepend():
+        for batch in batches:
+            columns = [pa.array([value] * batch.num_rows, pa.string()) for value in constants.values()]
+            yield pa.RecordBatch.from_arrays(columns + batch.columns, schema=schema)
+    return schema, prepend()
+
+
+def csv_to_parquet(source, output_parquet, column_types=None, block_size=CONVERT_BLOCK_SIZE, column_names=None,
+                   profile=None, constant_columns=None, part_bytes=None, part_name=PART_NAME):
+    """
+    Stream a CSV into a Parquet file one record batch at a time and return the row count.
+
+    source may be a path or a binary file object. Declared columns get the
+    given Arrow types; the rest are inferred from the first block only, so
+    a later value that does not fit fails the conversion: declare every
+    column of files larger than block_size. Declared non-string columns
+    are read as strings and parsed batch by batch (dates as DATE_FORMAT):
+    a value that does not parse is written as null, and how many did so is
+    logged per column. Pass column_names when source has no header row. constant_columns ({name: value}) are added
+    in front of the CSV's columns, e.g. to stamp the source file name. The
+    file is written with the named parquet_profile settings and sorted
+    afterwards if the profile says so. With part_bytes, output_parquet is a
+    directory of part_name files of about part_bytes each.
+    """
+    parsed_types = {name: arrow_type for name, arrow_type in (column_types or {}).items()
+                    if not pa.types.is_string(arrow_type)}
+    read_options = pv.ReadOptions(block_size=block_size, column_names=column_names)
+    # CMS free-text fields can hold quoted newlines
+    parse_options = pv.ParseOptions(newlines_in_values=True)
+    convert_options = pv.ConvertOptions(
+        column_types={name: pa.string() if name in parsed_types else arrow_type
+                      for name, arrow_type in (column_types or {}).items()},
+        null_values=PANDAS_NA_VALUES,
+        strings_can_be_null=True,
+    )
+    reader = pv.open_csv(
+        source, read_options=read_options, parse_options=parse_options, convert_options=convert_options
+    )
+    unparsed = {}
+    schema, batches = _with_parsed_columns(reader.schema, reader, parsed_types, unparsed)
+    schema, batches = _with_constants(schema, batches, constant_columns)
+    rows = write_batches(batches, schema, output_parquet, profile, part_bytes=part_bytes, part_name=part_name)
+    sort_parquet(output_parquet, profile, part_bytes=part_bytes, part_name=part_name)
+    for column, count in unparsed.items():
+        if count:
+            logging.warning("%d values of %s in %s could not be parsed as %s and were written as null",
+                            count, column, output_parquet, parsed_types[column])
+    logging.info("Wrote %d rows to %s", rows, output_parquet)
+    return rows
+
+
+# Bytes scanned per read while locating shard boundaries
+SCAN_CHUNK_SIZE = 16 * 1024 * 1024
+
+
+def record_boundaries(path, offsets, chunk_size=SCAN_CHUNK_SIZE):
+    """
+    Map each byte offset to the start of the first CSV record at or after it.
+
+    A newline only ends a record when it is outside a quoted field, which is
+    tracked by quote parity ('""' escapes count twice, so parity holds). The
+    file is read once in chunks, counting quotes, and only the neighbourhood
+    of each offset is scanned newline by newline.
+    """
+    offsets = sorted(offsets)
+    boundaries = []
+    parity = 0
+    pos = 0
+    with open(path, 'rb') as f:
+        while len(boundaries) < len(offsets):
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            chunk_end = pos + len(chunk)
+            cursor = 0
+            while len(boundaries) < len(offsets) and offsets[len(boundaries)] < chunk_end:
+                target = max(offsets[len(boundaries)] - pos, cursor)
+                parity ^= chunk.count(b'"', cursor, target) & 1
+                cursor = target
+                found = None
+                while found is None:
+                    newline = chunk.find(b'\n', cursor)
+                    if newline < 0:
+                        break
+                    parity ^= chunk.count(b'"', cursor, newline) & 1
+                    cursor = newline + 1
+                    if not parity:
+                        found = pos + cursor
+                if found is None:
+                    break
+                boundaries.append(found)
+            parity ^= chunk.count(b'"', cursor) & 1
+            pos = chunk_end
+    size = os.path.getsize(path)
+    return boundaries + [size] * (len(offsets) - len(boundaries))
+
+
+class RecordCounter:
+    """
+    Count the CSV records in bytes fed to it chunk by chunk.
+
+    Quote parity decides which newlines end a record, as in
+    record_boundaries, and carries across chunks. A last record without a
+    trailing newline still counts.
+    """
+
+    def __init__(self):
+        self.records = 0
+        self._parity = 0
+        self._open = False
+
+    def update(self, chunk):
+        data = np.frombuffer(chunk, dtype=np.uint8)
+        if not len(data):
+            return
+        # Low bit of the running quote count; wrapping at 256 keeps it
+        quotes = np.cumsum(data == ord('"'), dtype=np.uint8)
+        ends = np.flatnonzero((data == ord('\n')) & (((quotes + self._parity) & 1) == 0))
+        self.records += len(ends)
+        # Bytes after the last record end start a record the next chunk may finish
+        self._open = not len(ends) or ends[-1] < len(data) - 1
+        self._parity = (self._parity + int(quotes[-1])) & 1
+
+    def total(self):
+        return self.records + self._open
+
+
+def count_records(path, chunk_size=SCAN_CHUNK_SIZE):
+    """
+    Number of CSV records in a file, header included.
+    """
+    counter = RecordCounter()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            counter.update(chunk)
+    return counter.total()
+
+
+def shard_ranges(path, shards):
+    """
+    Split a CSV's data rows into at most shards (start, end) byte ranges on record boundaries.
+
+    Returns the ranges and the header's column names.
+    """
+    size = os.path.getsize(path)
+    offsets = [0] + [size * i // shards for i in range(1, shards)]
+    boundaries = sorted(set(record_boundaries(path, offsets) + [size]))
+    with open(path, 'rb') as f:
+        header = f.read(boundaries[0]).decode('utf-8-sig')
+    column_names = next(csv.reader(io.StringIO(header)))
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start], column_names
+
+
+class _RangeReader(io.RawIOBase):
+    """
+    Read-only view of bytes start..end of a file.
+    """
+
+    def __init__(self, path, start, end):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        read = self._file.readinto(memoryview(buffer)[:size])
+        self._remaining -= read
+        return read
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def csv_to_parquet_duckdb(input_csv, output_parquet, dtype_dict, memory_limit=None, threads=None,
+                          temp_directory=None, profile=None, part_bytes=None, column_names=None,
+                          part_name=PART_NAME):
+    """
+    Convert a CSV to Parquet with DuckDB using the declared column types.
+
+    Types come from dtype_dict instead of being sniffed, and quoted fields
+    are honoured. memory_limit (e.g. '4GB') and threads bound DuckDB, which
+    spills to temp_directory when over the limit. Rows DuckDB cannot parse
+    are kept in its reject table and counted, so the returned report has
+    rows_written, rows_rejected and rows_read, the records counted in
+    input_csv by a separate scan (None when input_csv is a pipe, which
+    cannot be read twice). The output uses the named
+    parquet_profile settings; a sorting profile sorts in the same pass.
+    With part_bytes, output_parquet is a directory of part_name files of
+    about part_bytes each. Pass column_names when input_csv has no header
+    row; its columns then take dtype_dict's types by name (strings when
+    undeclared).
+    """
+    conn = duckdb.connect(database=':memory:')
+    if memory_limit:
+        conn.execute(f"SET memory_limit = '{memory_limit}'")
+    if threads:
+        conn.execute(f"SET threads = {int(threads)}")
+    if temp_directory:
+        os.makedirs(temp_directory, exist_ok=True)
+        conn.execute(f"SET temp_directory = '{temp_directory}'")
+    # Row order is irrelevant here and keeping it forces DuckDB to buffer more
+    conn.execute("SET preserve_insertion_order = false")
+
+    columns = {col: dtype_dict.get(col, str) for col in column_names} if column_names else dtype_dict
+    schema_parts = [f"'{col}': '{_DUCKDB_TYPES.get(dtype, 'VARCHAR')}'" for col, dtype in columns.items()]
+    schema_str = '{' + ', '.join(schema_parts) + '}'
+    text = [col for col, dtype in columns.items() if _DUCKDB_TYPES.get(dtype, 'VARCHAR') == 'VARCHAR']
+    order_by = sort_order(profile, columns, text)
+    query = f"""
+        SELECT * FROM read_csv(
+            '{input_csv}',
+            header={'false' if column_names else 'true'},
+            columns={schema_str},
+            auto_detect=false,
+            dateformat='{DATE_FORMAT}',
+            quote='"',
+            escape='"',
+            ignore_errors=true,
+            store_rejects=true
+        )
+        {f'ORDER BY {order_by}' if order_by else ''}
+    """
+    if part_bytes:
+        rows_written = copy_to_parts(conn, query, output_parquet, profile, part_bytes, part_name)
+    else:
+        rows_written = conn.execute(
+            f"COPY ({query}) TO '{output_parquet}' ({duckdb_copy_options(profile)})"
+        ).fetchone()[0]
+    rows_rejected, sample_error = conn.execute(
+        "SELECT count(DISTINCT line), any_value(error_message) FROM reject_errors"
+    ).fetchone()
+    conn.close()
+    if rows_rejected:
+        logging.warning("%d rows of %s could not be parsed, e.g. %s", rows_rejected, input_csv, sample_error)
+    report = {
+        'rows_read': None,
+        'rows_written': rows_written,
+        'rows_rejected': rows_rejected,
+    }
+    if os.path.isfile(input_csv):
+        report['rows_read'] = count_records(input_csv) - (0 if column_names else 1)
+        _check_rows_read(report, input_csv)
+    return report
+
+
+def _check_rows_read(report, input_csv):
+    """
+    Warn when DuckDB accounted for fewer or more records than input_csv holds.
+    """
+    missing = report['rows_read'] - report['rows_written'] - report['rows_rejected']
+    if missing:
+        logging.warning("%d of %d records in %s were neither written nor rejected",
+                        missing, report['rows_read'], input_csv)
+
+
+# memory_limit units as DuckDB reads them: KB, MB, ... are powers of 1000, KiB, MiB, ... of 1024
+_MEMORY_UNITS = {
+    'B': 1, 'KB': 1000, 'MB': 1000 ** 2, 'GB': 1000 ** 3, 'TB': 1000 ** 4,
+    'KIB': 1024, 'MIB': 1024 ** 2, 'GIB': 1024 ** 3, 'TIB': 1024 ** 4,
+}
+
+
+def split_memory_limit(memory_limit, parts):
+    """
+    One of parts equal shares of a DuckDB memory_limit such as '4GB', as a memory_limit string.
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?I?B)\s*', memory_limit, re.IGNORECASE)
+    if not match:
+        raise Exception(f"Cannot split memory_limit {memory_limit!r}")
+    total = float(match.group(1)) * _MEMORY_UNITS[match.group(2).upper()]
+    return f"{max(1, int(total / parts / 1000 ** 2))}MB"
+
+
+def _feed_range(path, start, end, fifo, counter):
+    """
+    Write bytes start..end of path into fifo, for DuckDB to read as a headerless CSV.
+
+    counter counts the records on the way through, so the range is read once.
+    """
+    try:
+        with open(fifo, 'wb') as out, io.BufferedReader(_RangeReader(path, start, end), 1024 * 1024) as source:
+            for chunk in iter(lambda: source.read(1024 * 1024), b''):
+                counter.update(chunk)
+                out.write(chunk)
+    except BrokenPipeError:
+        # DuckDB stopped reading; the query raises the reason
+        pass
+
+
+def _convert_duckdb_shard(path, start, end, column_names, dtype_dict, output_dir, index, memory_limit,
+                          threads, temp_directory, profile, part_bytes):
+    if part_bytes:
+        output, part_name = output_dir, f"part-{index:04d}-{{index}}.parquet"
+    else:
+        output, part_name = os.path.join(output_dir, f"part-{index:04d}.parquet"), PART_NAME
+    work_dir = tempfile.mkdtemp(prefix=f'shard-{index:04d}-', dir=temp_directory)
+    # Named after the CSV, so DuckDB's reject warnings still say which file they come from
+    fifo = os.path.join(work_dir, os.path.basename(path))
+    os.mkfifo(fifo)
+    counter = RecordCounter()
+    feeder = threading.Thread(target=_feed_range, args=(path, start, end, fifo, counter), daemon=True)
+    feeder.start()
+    try:
+        report = csv_to_parquet_duckdb(
+            fifo, output, dtype_dict, memory_limit=memory_limit, threads=threads,
+            temp_directory=os.path.join(work_dir, 'spill'), profile=profile, part_bytes=part_bytes,
+            column_names=column_names, part_name=part_name,
+        )
+    finally:
+        # Releases a feeder still waiting for DuckDB to open the pipe
+        os.close(os.open(fifo, os.O_RDONLY | os.O_NONBLOCK))
+        feeder.join()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    report['rows_read'] = counter.total()
+    _check_rows_read(report, f"{path} bytes {start}-{end}")
+    return report
+
+
+def csv_to_parquet_duckdb_sharded(input_csv, output_dir, dtype_dict, shards=None, memory_limit=None, threads=None,
+                                  temp_directory=None, profile=None, part_bytes=None):
+    """
+    Convert one large CSV with DuckDB in a process pool, shard by shard, and return the summed report.
+
+    The CSV is split into byte ranges aligned to record boundaries (quoted
+    newlines included, see shard_ranges), and each process streams its
+    range through a named pipe into csv_to_parquet_duckdb, so throughput
+    scales with cores and every shard parses with the declared dtype_dict
+    types and counts its rejected rows like a single pass. memory_limit
+    and threads are the budget for the whole
+    conversion and are split evenly across the shards; each shard spills
+    under temp_directory. Parts are named part-<shard>-NNNN.parquet (or
+    part-<shard>.parquet without part_bytes).
+    """
+    shards = shards or os.cpu_count()
+    ranges, column_names = shard_ranges(input_csv, shards)
+    shard_memory = split_memory_limit(memory_limit, len(ranges)) if memory_limit and ranges else None
+    shard_threads = max(1, (threads or os.cpu_count()) // max(len(ranges), 1))
+    os.makedirs(output_dir, exist_ok=True)
+    if temp_directory:
+        os.makedirs(temp_directory, exist_ok=True)
+    logging.info("Converting %s as %d DuckDB shards into %s (memory_limit %s, %d threads each)",
+                 input_csv, len(ranges), output_dir, shard_memory, shard_threads)
+
+    with ProcessPoolExecutor(max_workers=len(ranges) or 1) as pool:
+        futures = [
+            pool.submit(
+                _convert_duckdb_shard, input_csv, start, end, column_names, dtype_dict, output_dir, index,
+                shard_memory, shard_threads, temp_directory, profile, part_bytes,
+            )
+            for index, (start, end) in enumerate(ranges)
+        ]
+        reports = [future.result() for future in futures]
+    report = {key: sum(shard[key] for shard in reports) for key in ('rows_read', 'rows_written', 'rows_rejected')}
+    logging.info("Wrote %d of %d rows from %d shards to %s, %d rejected",
+                 report['rows_written'], report['rows_read'], len(ranges), output_dir, report['rows_rejected'])
+    return report
@@ -0,0 +1,116 @@
+import logging
+import os
+
+import duckdb
+import pyarrow.parquet as pq
+
+from cms_utils.parquet_profile import copy_to_parts
+
+# Columns left out of the row hash: the stamped file name, CMS's own change flag and the
+# publication date differ between publications even when the record itself has not changed
+UNHASHED_COLUMNS = ('filename', 'Change_Type', 'Payment_Publication_Date')
+# Added to every delta row: 'INSERT', 'UPDATE' or 'DELETE' (key-only row)
+DELTA_OP_COLUMN = 'delta_op'
+
+
+def _source(dataset):
+    """
+    A read_parquet argument for a Parquet file or a directory of parts.
+    """
+    return f"'{os.path.join(dataset, '*.parquet')}'" if os.path.isdir(dataset) else f"'{dataset}'"
+
+
+def _columns(dataset):
+    path = os.path.join(dataset, sorted(os.listdir(dataset))[0]) if os.path.isdir(dataset) else dataset
+    return pq.read_schema(path).names
+
+
+def build_manifest(dataset, manifest_path, key='Record_ID', publication=None, unhashed=UNHASHED_COLUMNS):
+    """
+    Write one (key, row_hash) row per record of a Parquet dataset to manifest_path and return the row count.
+
+    row_hash is the md5 of the record's columns other than unhashed, as
+    JSON so that a null and an empty string differ. The publication, when
+    given, is kept in the file's key-value metadata.
+    """
+    hashed = [column for column in _columns(dataset) if column not in unhashed and column != key]
+    record = ', '.join(f"""'{column}': "{column}\"""" for column in hashed)
+    conn = duckdb.connect(database=':memory:')
+    conn.execute("SET preserve_insertion_order = false")
+    metadata = f", KV_METADATA {{publication: '{publication}'}}" if publication else ''
+    rows = conn.execute(f"""
+        COPY (
+            SELECT "{key}" AS key, md5(to_json({{{record}}})) AS row_hash
+            FROM read_parquet({_source(dataset)})
+        )
+        TO '{manifest_path}' (FORMAT PARQUET, COMPRESSION zstd{metadata})
+    """).fetchone()[0]
+    conn.close()
+    logging.info("Hashed %d rows of %s into %s", rows, dataset, manifest_path)
+    return rows
+
+
+def manifest_publication(manifest_path):
+    """
+    The publication a manifest was built from, or None.
+    """
+    metadata = pq.read_schema(manifest_path).metadata or {}
+    publication = metadata.get(b'publication')
+    return publication.decode() if publication else None
+
+
+def compute_delta(dataset, previous_manifest, current_manifest, output_dir, key='Record_ID', profile=None,
+                  part_bytes=None):
+    """
+    Write the records of dataset that changed since previous_manifest to output_dir and return the counts.
+
+    Records are matched on key and compared by row hash: keys only in the
+    current manifest are inserted, keys in both with different hashes are
+    updated, and keys only in the previous manifest are deleted. Inserted
+    and updated records are written whole; each deleted one is a row with
+    only key set. Every row has a delta_op column naming its change. The
+    returned report counts inserted, updated, deleted and unchanged records,
+    plus the Change_Type CMS gave the written records, as a cross-check.
+    Nothing is written when no record changed.
+    """
+    conn = duckdb.connect(database=':memory:')
+    conn.execute("SET preserve_insertion_order = false")
+    conn.execute(f"""
+        CREATE TEMP TABLE diff AS
+        SELECT
+            coalesce(current.key, previous.key) AS key,
+            CASE
+                WHEN previous.key IS NULL THEN 'INSERT'
+                WHEN current.key IS NULL THEN 'DELETE'
+                WHEN current.row_hash <> previous.row_hash THEN 'UPDATE'
+            END AS op
+        FROM read_parquet('{current_manifest}') AS current
+        FULL OUTER JOIN read_parquet('{previous_manifest}') AS previous ON current.key = previous.key
+    """)
+    counts = dict(conn.execute("SELECT coalesce(op, 'UNCHANGED'), count(*) FROM diff GROUP BY 1").fetchall())
+    report = {
+        'inserted': counts.get('INSERT', 0),
+        'updated': counts.get('UPDATE', 0),
+        'deleted': counts.get('DELETE', 0),
+        'unchanged': counts.get('UNCHANGED', 0),
+        'change_types': {},
+    }
+    if report['inserted'] or report['updated'] or report['deleted']:
+        changed = f"""
+            SELECT data.*, diff.op AS {DELTA_OP_COLUMN}
+            FROM read_parquet({_source(dataset)}) AS data
+            JOIN diff ON data."{key}" = diff.key
+            WHERE diff.op IN ('INSERT', 'UPDATE')
+        """
+        copy_to_parts(conn, f"""
+            {changed}
+            UNION ALL BY NAME
+            SELECT key AS "{key}", op AS {DELTA_OP_COLUMN} FROM diff WHERE op = 'DELETE'
+        """, output_dir, profile, part_bytes)
+        if 'Change_Type' in _columns(dataset):
+            report['change_types'] = dict(conn.execute(
+                f"SELECT coalesce(Change_Type, 'NULL'), count(*) FROM ({changed}) GROUP BY 1"
+            ).fetchall())
+    conn.close()
+    logging.info("Delta of %s: %s", dataset, report)
+    return report
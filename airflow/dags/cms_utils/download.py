@@ -0,0 +1,252 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Bytes held in memory at any one time while streaming an archive to disk
+CHUNK_SIZE = 8 * 1024 * 1024
+REQUEST_TIMEOUT = 60
+# Byte span fetched by one request in parallel mode; several per connection balance slow ranges
+RANGE_SIZE = 64 * 1024 * 1024
+
+
+def _read_meta(meta_path):
+    if not os.path.exists(meta_path):
+        return {}
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def _write_meta(meta_path, meta):
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+
+
+def _hash_existing(path, chunk_size):
+    """
+    Hash the bytes already on disk so a resumed download still yields a full-file digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest
+
+
+def _total_size(response, offset):
+    """
+    Work out the full object size from a 200 or 206 response.
+    """
+    content_range = response.headers.get('Content-Range')
+    if content_range and '/' in content_range:
+        total = content_range.rsplit('/', 1)[1]
+        if total != '*':
+            return int(total)
+    length = response.headers.get('Content-Length')
+    if length is None:
+        return None
+    return int(length) + (offset if response.status_code == 206 else 0)
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    """
+    Return the sha256 hex digest of a file, read in chunks.
+    """
+    return _hash_existing(path, chunk_size).hexdigest()
+
+
+def stream_download(url, dest_path, chunk_size=CHUNK_SIZE, expected_sha256=None,
+                    timeout=REQUEST_TIMEOUT, session=None):
+    """
+    Stream a URL to dest_path in fixed-size chunks and return its sha256.
+
+    Bytes are written to '<dest_path>.part'. If an earlier attempt (e.g. a
+    previous Airflow retry) left a partial file behind, the download resumes
+    from its last byte with an HTTP Range request guarded by If-Range, so a
+    changed upstream object restarts from zero instead of being spliced.
+    The finished file is checked against the server-reported size and,
+    when given, expected_sha256 before being moved into place.
+    """
+    session = session or requests.Session()
+    part_path = dest_path + '.part'
+    meta_path = dest_path + '.part.json'
+    meta = _read_meta(meta_path)
+
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {}
+    # A part file preallocated by parallel_download has holes, so it cannot be appended to
+    if offset and meta.get('validator') and meta.get('mode') != 'parallel':
+        headers['Range'] = f"bytes={offset}-"
+        headers['If-Range'] = meta['validator']
+    else:
+        offset = 0
+
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416:
+            # The part file already holds every byte the server has
+            total = _total_size(response, offset)
+            if total != offset:
+                os.remove(part_path)
+                os.remove(meta_path)
+                raise Exception(f"Server rejected resume of {url} at byte {offset}")
+            digest = _hash_existing(part_path, chunk_size)
+        else:
+            response.raise_for_status()
+            if response.status_code == 206:
+                logging.info("Resuming download of %s at byte %d", url, offset)
+                digest = _hash_existing(part_path, chunk_size)
+                mode = 'ab'
+            else:
+                if offset:
+                    logging.info("Server ignored Range for %s, restarting from byte 0", url)
+                offset = 0
+                digest = hashlib.sha256()
+                mode = 'wb'
+
+            total = _total_size(response, offset)
+            validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+            _write_meta(meta_path, {'url': url, 'validator': validator, 'total': total})
+
+            written = offset
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    written += len(chunk)
+            logging.info("Downloaded %d of %s bytes from %s", written, total, url)
+
+    size = os.path.getsize(part_path)
+    if total is not None and size != total:
+        raise Exception(f"Incomplete download of {url}: got {size} of {total} bytes")
+
+    sha256 = digest.hexdigest()
+    if expected_sha256 and sha256 != expected_sha256.lower():
+        os.remove(part_path)
+        os.remove(meta_path)
+        raise Exception(f"Checksum mismatch for {url}: expected {expected_sha256}, got {sha256}")
+
+    os.replace(part_path, dest_path)
+    os.remove(meta_path)
+    logging.info("Verified %s (sha256 %s)", dest_path, sha256)
+    return sha256
+
+
+def _pooled_session(connections):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _probe(url, session, timeout):
+    """
+    HEAD the URL and return (size, supports_ranges, validator).
+    """
+    response = session.head(url, allow_redirects=True, timeout=timeout)
+    response.raise_for_status()
+    length = response.headers.get('Content-Length')
+    size = int(length) if length is not None else None
+    supports_ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+    validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+    return size, supports_ranges, validator
+
+
+def _split_ranges(size, range_size):
+    return [(start, min(start + range_size, size) - 1) for start in range(0, size, range_size)]
+
+
+def _fetch_range(session, url, part_path, start, end, validator, chunk_size, timeout):
+    """
+    Fetch bytes start..end (inclusive) and write them in place in the preallocated part file.
+    """
+    headers = {'Range': f"bytes={start}-{end}"}
+    if validator:
+        headers['If-Range'] = validator
+    began = time.monotonic()
+    written = 0
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise Exception(f"Server ignored Range {start}-{end} for {url} (HTTP {response.status_code})")
+        with open(part_path, 'r+b') as f:
+            f.seek(start)
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                written += len(chunk)
+    if written != end - start + 1:
+        raise Exception(f"Short read for range {start}-{end} of {url}: got {written} bytes")
+    elapsed = max(time.monotonic() - began, 1e-6)
+    logging.info("Range %d-%d: %.1f MB in %.1fs (%.1f MB/s)",
+                 start, end, written / 1e6, elapsed, written / 1e6 / elapsed)
+    return start, end
+
+
+def parallel_download(url, dest_path, connections=8, range_size=RANGE_SIZE, chunk_size=CHUNK_SIZE,
+                      expected_sha256=None, timeout=REQUEST_TIMEOUT):
+    """
+    Download a URL over several pooled connections and return its sha256.
+
+    The object is split into byte ranges that are fetched concurrently and
+    written in place into a preallocated '<dest_path>.part' file. Finished
+    ranges are recorded next to it, so a retry only fetches what is missing.
+    Falls back to stream_download when the server does not advertise Range
+    support or a size.
+    """
+    session = _pooled_session(connections)
+    size, supports_ranges, validator = _probe(url, session, timeout)
+    if not supports_ranges or not size:
+        logging.info("%s does not support ranged requests, using a single stream", url)
+        return stream_download(url, dest_path, chunk_size=chunk_size,
+                               expected_sha256=expected_sha256, timeout=timeout, session=session)
+
+    part_path = dest_path + '.part'
+    meta_path = dest_path + '.part.json'
+    meta = _read_meta(meta_path)
+    expected = {'mode': 'parallel', 'url': url, 'validator': validator, 'total': size, 'range_size': range_size}
+    if any(meta.get(key) != value for key, value in expected.items()):
+        meta = dict(expected, done=[])
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+        _write_meta(meta_path, meta)
+
+    done = {tuple(r) for r in meta['done']}
+    pending = [r for r in _split_ranges(size, range_size) if r not in done]
+    logging.info("Fetching %d of %d ranges of %s over %d connections",
+                 len(pending), len(pending) + len(done), url, connections)
+
+    began = time.monotonic()
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+        futures = [
+            pool.submit(_fetch_range, session, url, part_path, start, end, validator, chunk_size, timeout)
+            for start, end in pending
+        ]
+        errors = []
+        for future in as_completed(futures):
+            # Record every range that landed before surfacing a failure, so the retry skips them
+            if future.exception():
+                errors.append(future.exception())
+                continue
+            meta['done'].append(list(future.result()))
+            _write_meta(meta_path, meta)
+    if errors:
+        raise Exception(f"{len(errors)} of {len(pending)} ranges of {url} failed") from errors[0]
+    elapsed = max(time.monotonic() - began, 1e-6)
+    fetched = sum(end - start + 1 for start, end in pending)
+    logging.info("Fetched %.1f MB in %.1fs (%.1f MB/s)", fetched / 1e6, elapsed, fetched / 1e6 / elapsed)
+
+    sha256 = file_sha256(part_path, chunk_size)
+    if expected_sha256 and sha256 != expected_sha256.lower():
+        os.remove(part_path)
+        os.remove(meta_path)
+        raise Exception(f"Checksum mismatch for {url}: expected {expected_sha256}, got {sha256}")
+
+    os.replace(part_path, dest_path)
+    os.remove(meta_path)
+    logging.info("Verified %s (sha256 %s)", dest_path, sha256)
+    return sha256
@@ -0,0 +1,173 @@
+import base64
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import google_crc32c
+
+from cms_utils.download import CHUNK_SIZE
+
+# Files larger than this are uploaded as parallel parts and composed into one object
+UPLOAD_PART_SIZE = 64 * 1024 * 1024
+UPLOAD_TIMEOUT = 600
+# GCS composes at most this many sources per request
+COMPOSE_LIMIT = 32
+
+
+def dataset_path(file_type, year):
+    """
+    Hive-style location of one program year of a file type, used locally and under raw/ in GCS.
+    """
+    return f"{file_type}/program_year={year}"
+
+
+def _encode(checksum):
+    """
+    GCS reports crc32c as the base64 of its big-endian bytes.
+    """
+    return base64.b64encode(checksum.digest()).decode()
+
+
+def file_checksums(path, part_size=UPLOAD_PART_SIZE, chunk_size=CHUNK_SIZE):
+    """
+    Return the file's crc32c and md5 (base64, as GCS reports them) and the crc32c of each part_size part.
+    """
+    whole = google_crc32c.Checksum()
+    md5 = hashlib.md5()
+    parts = []
+    with open(path, 'rb') as f:
+        while True:
+            part = google_crc32c.Checksum()
+            remaining = part_size
+            while remaining:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                whole.update(chunk)
+                part.update(chunk)
+                md5.update(chunk)
+                remaining -= len(chunk)
+            if remaining == part_size:
+                break
+            parts.append(_encode(part))
+    return _encode(whole), base64.b64encode(md5.digest()).decode(), parts
+
+
+def _part_name(object_name, index, crc32c):
+    # The part's crc is in its name, so a retry can tell which parts already landed intact
+    return f"{object_name}.parts/{index:05d}-{crc32c.replace('/', '_').replace('+', '-')}"
+
+
+def _upload_part(bucket, name, path, start, size, timeout):
+    blob = bucket.blob(name)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        blob.upload_from_file(f, size=size, checksum='crc32c', timeout=timeout)
+    return name
+
+
+def _compose(bucket, object_name, sources, timeout):
+    """
+    Compose sources into object_name, in rounds of COMPOSE_LIMIT, and return the intermediates to delete.
+    """
+    intermediates = []
+    level = 0
+    while len(sources) > COMPOSE_LIMIT:
+        grouped = []
+        for index in range(0, len(sources), COMPOSE_LIMIT):
+            target = bucket.blob(f"{object_name}.parts/compose-{level}-{index // COMPOSE_LIMIT:05d}")
+            target.compose(sources[index:index + COMPOSE_LIMIT], timeout=timeout)
+            grouped.append(target)
+        intermediates.extend(grouped)
+        sources = grouped
+        level += 1
+    bucket.blob(object_name).compose(sources, timeout=timeout)
+    return intermediates
+
+
+def upload_file(client, bucket_name, object_name, path, parallelism=8, part_size=UPLOAD_PART_SIZE,
+                timeout=UPLOAD_TIMEOUT):
+    """
+    Upload a local file to gs://bucket_name/object_name and return True if bytes were sent.
+
+    The upload is skipped when the object already exists with the same
+    crc32c (or md5). Files up to part_size go up as one checksummed upload;
+    larger ones are split into part_size parts uploaded over parallelism
+    threads, then joined with compose and the parts deleted. Parts are
+    named by their crc32c and kept until the compose succeeds, so a retry
+    only uploads the parts that are missing. Throughput is logged.
+    """
+    bucket = client.bucket(bucket_name)
+    size = os.path.getsize(path)
+    crc32c, md5, part_crcs = file_checksums(path, part_size)
+
+    existing = bucket.get_blob(object_name)
+    if existing is not None and (existing.crc32c == crc32c or (existing.md5_hash and existing.md5_hash == md5)):
+        logging.info("gs://%s/%s already matches %s (crc32c %s), skipping upload",
+                     bucket_name, object_name, path, crc32c)
+        return False
+
+    began = time.monotonic()
+    if len(part_crcs) <= 1:
+        bucket.blob(object_name).upload_from_filename(path, checksum='crc32c', timeout=timeout)
+        sent = size
+    else:
+        names = [_part_name(object_name, index, crc) for index, crc in enumerate(part_crcs)]
+        landed = {
+            blob.name for blob in client.list_blobs(bucket_name, prefix=f"{object_name}.parts/")
+            if blob.name in names
+        }
+        pending = [(index, name) for index, name in enumerate(names) if name not in landed]
+        logging.info("Uploading %d of %d parts of %s over %d threads",
+                     len(pending), len(names), path, parallelism)
+        with ThreadPoolExecutor(max_workers=parallelism) as pool:
+            futures = [
+                pool.submit(_upload_part, bucket, name, path, index * part_size,
+                            min(part_size, size - index * part_size), timeout)
+                for index, name in pending
+            ]
+            for future in futures:
+                future.result()
+        sent = sum(min(part_size, size - index * part_size) for index, _ in pending)
+
+        intermediates = _compose(bucket, object_name, [bucket.blob(name) for name in names], timeout)
+        composed = bucket.get_blob(object_name)
+        if composed.crc32c != crc32c:
+            raise Exception(f"Composed gs://{bucket_name}/{object_name} has crc32c {composed.crc32c}, "
+                            f"expected {crc32c}")
+        for blob in [bucket.blob(name) for name in names] + intermediates:
+            blob.delete(timeout=timeout)
+
+    elapsed = max(time.monotonic() - began, 1e-6)
+    logging.info("Uploaded %s to gs://%s/%s: %.1f MB sent in %.1fs (%.1f MB/s)",
+                 path, bucket_name, object_name, sent / 1e6, elapsed, sent / 1e6 / elapsed)
+    return True
+
+
+def upload_dataset(client, bucket_name, prefix, local_dir, parallelism=8):
+    """
+    Upload every part in local_dir to gs://bucket_name/prefix/ and delete the objects there that are not among them.
+
+    Parts go up one after the other with upload_file, each split over
+    parallelism threads when large. Once all are in place, objects under
+    prefix left by an earlier run that wrote more parts (or by an
+    interrupted upload) are deleted, so a reader of prefix/*.parquet sees
+    exactly this dataset. Returns the number of parts whose bytes were sent.
+    """
+    parts = sorted(name for name in os.listdir(local_dir) if not name.startswith('.'))
+    if not parts:
+        raise Exception(f"{local_dir} has no parts to upload")
+    sent = 0
+    for part in parts:
+        sent += upload_file(client, bucket_name, f"{prefix}/{part}", os.path.join(local_dir, part),
+                            parallelism=parallelism)
+
+    keep = {f"{prefix}/{part}" for part in parts}
+    for blob in client.list_blobs(bucket_name, prefix=f"{prefix}/"):
+        if blob.name not in keep:
+            logging.info("Deleting stale gs://%s/%s", bucket_name, blob.name)
+            blob.delete(timeout=UPLOAD_TIMEOUT)
+    logging.info("gs://%s/%s/ holds %d parts, %d uploaded", bucket_name, prefix, len(parts), sent)
+    return sent
@@ -0,0 +1,66 @@
+import logging
+import re
+
+import duckdb
+import pyarrow.parquet as pq
+
+from cms_utils.parquet_profile import copy_to_parts, dataset_parts, sort_order, text_columns
+
+
+def repeated_column_groups(columns, prefix):
+    """
+    Group the <prefix><n>_<field> columns by n: {n: {field: column}}, in column order.
+    """
+    pattern = re.compile(rf"^{re.escape(prefix)}(\d+)_(.+)$")
+    groups = {}
+    for column in columns:
+        match = pattern.match(column)
+        if match:
+            groups.setdefault(int(match.group(1)), {})[match.group(2)] = column
+    return dict(sorted(groups.items()))
+
+
+def split_repeated_columns(dataset, output_dir, long_output_dir, prefix, keys, index_column, columns=None,
+                           profile=None, part_bytes=None):
+    """
+    Split a Parquet dataset's repeated <prefix><n>_<field> column blocks into a long dataset.
+
+    output_dir gets every other column, or only those of columns that the
+    dataset has (in that order) when given, one row per record as before.
+    long_output_dir gets the keys, index_column (the block's n) and one
+    column per field, with a row only for the blocks that have a value,
+    so the mostly empty blocks cost nothing. Both are written as parts
+    of about part_bytes with the profile's settings; output_dir is sorted
+    when the profile says so. Returns (rows, long_rows).
+    """
+    sources = dataset_parts(dataset)
+    schema = pq.read_schema(sources[0])
+    names = schema.names
+    groups = repeated_column_groups(names, prefix)
+    if not groups:
+        raise Exception(f"{dataset} has no {prefix}<n>_<field> columns to split")
+    repeated = {column for group in groups.values() for column in group.values()}
+    fields = list(dict.fromkeys(field for group in groups.values() for field in group))
+
+    conn = duckdb.connect(database=':memory:')
+    conn.execute("SET preserve_insertion_order = false")
+    source = f"read_parquet({sources!r})"
+    kept = [column for column in columns or names if column in names and column not in repeated]
+    order_by = sort_order(profile, kept, text_columns(schema))
+    rows = copy_to_parts(conn, f"""
+        SELECT {', '.join(f'"{column}"' for column in kept)} FROM {source}
+        {f'ORDER BY {order_by}' if order_by else ''}
+    """, output_dir, profile, part_bytes)
+
+    key_list = ', '.join(f'"{key}"' for key in keys)
+    blocks = []
+    for index, group in groups.items():
+        values = ', '.join(
+            f'"{group[field]}" AS "{field}"' if field in group else f'NULL AS "{field}"' for field in fields
+        )
+        present = ' OR '.join(f'"{column}" IS NOT NULL' for column in group.values())
+        blocks.append(f"SELECT {key_list}, {index}::BIGINT AS {index_column}, {values} FROM {source} WHERE {present}")
+    long_rows = copy_to_parts(conn, '\nUNION ALL\n'.join(blocks), long_output_dir, profile, part_bytes)
+    conn.close()
+    logging.info("Split %d %s* blocks of %d rows of %s into %s", long_rows, prefix, rows, dataset, long_output_dir)
+    return rows, long_rows
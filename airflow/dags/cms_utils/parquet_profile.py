@@ -0,0 +1,263 @@
+import glob
+import logging
+import os
+import shutil
+import tempfile
+
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Named Parquet writer settings shared by every converter. Keys:
+#   compression / compression_level: codec and its level
+#   row_group_bytes: target in-memory size of a row group (None = one per CSV block)
+#   dictionary_ratio: dictionary-encode only columns whose distinct values in
+#       the first batch are at most this share of its rows (None = every column)
+#   sort_by: columns to sort the output by, where present
+#   sort_dates: {column: strptime format} for sort_by columns that may arrive
+#       as date text; text columns are sorted by the date they parse to
+PARQUET_PROFILES = {
+    # Library defaults: snappy, dictionary on every column, row groups as they come
+    'default': {},
+    'balanced': {
+        'compression': 'zstd',
+        'compression_level': 3,
+        'row_group_bytes': 128 * 1024 ** 2,
+        'dictionary_ratio': 0.1,
+    },
+    # Heavier zstd, sorted so BigQuery and DuckDB can prune on date and state.
+    # RSRCH's Date_of_Payment is a date; GNRL's stays MM/DD/YYYY text, whose
+    # string order is by month first and not by year, so it is parsed to sort.
+    'sorted': {
+        'compression': 'zstd',
+        'compression_level': 9,
+        'row_group_bytes': 128 * 1024 ** 2,
+        'dictionary_ratio': 0.1,
+        'sort_by': ['Date_of_Payment', 'Recipient_State'],
+        'sort_dates': {'Date_of_Payment': '%m/%d/%Y'},
+    },
+}
+DEFAULT_PROFILE = 'balanced'
+# File name of a dataset's parts; {index} is the part number, zero-padded to four digits
+PART_NAME = 'part-{index}.parquet'
+
+
+def parquet_profile(profile=None):
+    """
+    Resolve a profile name (or an explicit settings dict) into its settings.
+    """
+    if isinstance(profile, dict):
+        return profile
+    name = profile or DEFAULT_PROFILE
+    if name not in PARQUET_PROFILES:
+        raise Exception(f"Unknown Parquet profile {name!r}, expected one of {sorted(PARQUET_PROFILES)}")
+    return PARQUET_PROFILES[name]
+
+
+def low_cardinality_columns(batch, ratio):
+    """
+    Names of the columns whose distinct values are at most ratio of the batch's rows.
+    """
+    limit = max(1, int(batch.num_rows * ratio))
+    return [
+        name for name, column in zip(batch.schema.names, batch.columns)
+        # All-null columns (inferred as the null type) have nothing to encode
+        if not pa.types.is_null(column.type) and pc.count_distinct(column, mode='all').as_py() <= limit
+    ]
+
+
+def _writer_options(profile, first_batch):
+    options = {}
+    if profile.get('compression'):
+        options['compression'] = profile['compression']
+        options['compression_level'] = profile.get('compression_level')
+    if profile.get('dictionary_ratio') is not None and first_batch is not None:
+        options['use_dictionary'] = low_cardinality_columns(first_batch, profile['dictionary_ratio'])
+    return options
+
+
+def part_path(output_dir, index, part_name=PART_NAME):
+    return os.path.join(output_dir, part_name.format(index=f"{index:04d}"))
+
+
+def dataset_parts(output_dir, part_name=PART_NAME):
+    """
+    The part files of a dataset directory written with part_name, in order.
+    """
+    return sorted(glob.glob(os.path.join(output_dir, part_name.format(index='*'))))
+
+
+def _row_groups(first, batches, schema, target):
+    """
+    Regroup record batches into tables of about target in-memory bytes (None = as they come).
+    """
+    pending = pa.Table.from_batches([first], schema=schema)
+    for batch in batches:
+        pending = pa.concat_tables([pending, pa.Table.from_batches([batch], schema=schema)])
+        while target and pending.nbytes >= target:
+            group_rows = max(1, pending.num_rows * target // pending.nbytes)
+            yield pending.slice(0, group_rows)
+            pending = pending.slice(group_rows)
+        if not target:
+            yield pending
+            pending = pending.slice(0, 0)
+    if pending.num_rows:
+        yield pending
+
+
+def write_batches(batches, schema, output_parquet, profile=None, part_bytes=None, part_name=PART_NAME):
+    """
+    Write record batches to a Parquet file with a profile's settings and return the row count.
+
+    Batches are regrouped into row groups of about row_group_bytes, whatever
+    the CSV block size, so wide and narrow files get similar row groups and
+    peak memory is about one row group. Dictionary encoding is chosen
+    per column from the first batch. Sorting, when the profile asks for it,
+    is a separate pass (sort_parquet) because it needs the whole file.
+    With part_bytes, output_parquet is a directory and a new part_name file
+    is started once the current one reaches part_bytes on disk.
+    """
+    profile = parquet_profile(profile)
+    batches = iter(batches)
+    first = next(batches, None)
+    options = _writer_options(profile, first)
+    groups = _row_groups(first, batches, schema, profile.get('row_group_bytes')) if first is not None else iter([])
+    if part_bytes:
+        os.makedirs(output_parquet, exist_ok=True)
+    rows = 0
+    part = 0
+    path = part_path(output_parquet, part, part_name) if part_bytes else output_parquet
+    writer = pq.ParquetWriter(path, schema, **options)
+    try:
+        for table in groups:
+            if writer is None:
+                path = part_path(output_parquet, part, part_name)
+                writer = pq.ParquetWriter(path, schema, **options)
+            writer.write_table(table, row_group_size=table.num_rows)
+            rows += table.num_rows
+            if part_bytes and os.path.getsize(path) >= part_bytes:
+                writer.close()
+                writer = None
+                part += 1
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def duckdb_copy_options(profile=None):
+    """
+    The profile as DuckDB COPY ... TO options, e.g. "FORMAT PARQUET, COMPRESSION zstd".
+    """
+    profile = parquet_profile(profile)
+    options = ['FORMAT PARQUET']
+    if profile.get('compression'):
+        options.append(f"COMPRESSION {profile['compression']}")
+        if profile.get('compression_level') is not None:
+            options.append(f"COMPRESSION_LEVEL {int(profile['compression_level'])}")
+    if profile.get('row_group_bytes'):
+        options.append(f"ROW_GROUP_SIZE_BYTES {int(profile['row_group_bytes'])}")
+    # DuckDB already falls back to plain encoding for high-cardinality columns
+    return ', '.join(options)
+
+
+def sort_columns(profile, columns):
+    """
+    The profile's sort_by columns that exist in columns, in order.
+    """
+    return [column for column in parquet_profile(profile).get('sort_by') or [] if column in columns]
+
+
+def sort_order(profile, columns, text_columns=()):
+    """
+    The DuckDB ORDER BY list for the profile's sort columns in columns ('' when none are).
+
+    A sort_dates column that is among text_columns is ordered by the date
+    it parses to, with text that does not parse last; the others by value.
+    """
+    sort_dates = parquet_profile(profile).get('sort_dates') or {}
+    return ', '.join(
+        f"try_strptime(\"{column}\", '{sort_dates[column]}')"
+        if column in sort_dates and column in text_columns else f'"{column}"'
+        for column in sort_columns(profile, columns)
+    )
+
+
+def text_columns(schema):
+    """
+    Names of a Parquet schema's string columns.
+    """
+    return [field.name for field in schema if pa.types.is_string(field.type) or pa.types.is_large_string(field.type)]
+
+
+def copy_to_parts(conn, query, output_dir, profile=None, part_bytes=None, part_name=PART_NAME):
+    """
+    COPY a DuckDB query's result into output_dir as part_name files of about part_bytes each.
+
+    DuckDB numbers its files without padding, so they are written to a
+    staging directory and moved into place as part-0000, part-0001, ... in
+    the order DuckDB wrote them (which keeps an ORDER BY across parts).
+    Without part_bytes the result is the single part-0000.
+    Returns the number of rows written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    # ROW_GROUP_SIZE_BYTES needs it off; an ORDER BY in query still holds
+    conn.execute("SET preserve_insertion_order = false")
+    options = duckdb_copy_options(profile)
+    if not part_bytes:
+        return conn.execute(f"COPY ({query}) TO '{part_path(output_dir, 0, part_name)}' ({options})").fetchone()[0]
+    staging = tempfile.mkdtemp(prefix='.copy-', dir=output_dir)
+    try:
+        rows = conn.execute(
+            f"COPY ({query}) TO '{staging}' "
+            f"({options}, FILE_SIZE_BYTES {int(part_bytes)}, FILENAME_PATTERN 'part-{{i}}', OVERWRITE_OR_IGNORE true)"
+        ).fetchone()[0]
+        written = sorted(os.listdir(staging), key=lambda name: int(name[len('part-'):-len('.parquet')]))
+        for index, name in enumerate(written):
+            os.replace(os.path.join(staging, name), part_path(output_dir, index, part_name))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return rows
+
+
+def sort_parquet(path, profile=None, memory_limit=None, temp_directory=None, part_bytes=None, part_name=PART_NAME):
+    """
+    Rewrite a Parquet file in place sorted by the profile's sort_by columns.
+
+    DuckDB does the sort, spilling to temp_directory (default: next to the
+    file) beyond memory_limit, so files larger than memory can be sorted.
+    With part_bytes, path is a directory and its part_name parts are sorted
+    together and rewritten as new parts of about part_bytes. Does nothing
+    when the profile has no sort columns present in the file.
+    """
+    sources = dataset_parts(path, part_name) if part_bytes else [path]
+    schema = pq.read_schema(sources[0]) if sources else None
+    columns = sort_columns(profile, schema.names) if schema else []
+    if not columns:
+        return path
+    conn = duckdb.connect(database=':memory:')
+    if memory_limit:
+        conn.execute(f"SET memory_limit = '{memory_limit}'")
+    directory = path if part_bytes else os.path.dirname(os.path.abspath(path))
+    conn.execute(f"SET temp_directory = '{temp_directory or directory}'")
+    # ORDER BY still holds without it, and ROW_GROUP_SIZE_BYTES needs it off
+    conn.execute("SET preserve_insertion_order = false")
+    order_by = sort_order(profile, schema.names, text_columns(schema))
+    query = f"SELECT * FROM read_parquet({sources!r}) ORDER BY {order_by}"
+    if part_bytes:
+        sorted_dir = tempfile.mkdtemp(prefix='.sorted-', dir=path)
+        copy_to_parts(conn, query, sorted_dir, profile, part_bytes, part_name)
+        conn.close()
+        for source in sources:
+            os.remove(source)
+        for index, sorted_part in enumerate(dataset_parts(sorted_dir, part_name)):
+            os.replace(sorted_part, part_path(path, index, part_name))
+        os.rmdir(sorted_dir)
+    else:
+        sorted_path = path + '.sorted'
+        conn.execute(f"COPY ({query}) TO '{sorted_path}' ({duckdb_copy_options(profile)})")
+        conn.close()
+        os.replace(sorted_path, path)
+    logging.info("Sorted %s by %s", path, columns)
+    return path
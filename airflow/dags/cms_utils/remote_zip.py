@@ -0,0 +1,202 @@
+import logging
+import os
+import struct
+import zlib
+from collections import namedtuple
+
+import requests
+
+from cms_utils.archive import select_members
+from cms_utils.download import CHUNK_SIZE, REQUEST_TIMEOUT
+
+# Zip record layouts (see APPNOTE.TXT); the same formats zipfile uses internally
+_EOCD = struct.Struct('<4s4H2LH')
+_ZIP64_LOCATOR = struct.Struct('<4sLQL')
+_ZIP64_EOCD = struct.Struct('<4sQ2H2L4Q')
+_CENTRAL_DIR = struct.Struct('<4s4B4HL2L5H2L')
+_LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+
+_EOCD_SIG = b'PK\x05\x06'
+_ZIP64_LOCATOR_SIG = b'PK\x06\x07'
+_ZIP64_EOCD_SIG = b'PK\x06\x06'
+_CENTRAL_DIR_SIG = b'PK\x01\x02'
+_LOCAL_HEADER_SIG = b'PK\x03\x04'
+
+# End of central directory record plus the longest possible archive comment
+_TAIL_SIZE = _EOCD.size + 0xFFFF + _ZIP64_LOCATOR.size
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+RemoteMember = namedtuple(
+    'RemoteMember',
+    ['name', 'compressed_size', 'file_size', 'crc', 'header_offset', 'compress_type'],
+)
+
+
+def _fetch(session, url, start, end, timeout=REQUEST_TIMEOUT):
+    """
+    Return bytes start..end (inclusive) of a remote object.
+    """
+    response = session.get(url, headers={'Range': f"bytes={start}-{end}"}, timeout=timeout)
+    response.raise_for_status()
+    if response.status_code != 206:
+        raise Exception(f"{url} does not support HTTP Range requests")
+    return response.content
+
+
+def _remote_size(session, url, timeout=REQUEST_TIMEOUT):
+    response = session.head(url, allow_redirects=True, timeout=timeout)
+    response.raise_for_status()
+    if response.headers.get('Accept-Ranges', '').lower() != 'bytes':
+        raise Exception(f"{url} does not support HTTP Range requests")
+    return int(response.headers['Content-Length'])
+
+
+def _parse_zip64_extra(extra, file_size, compressed_size, header_offset):
+    """
+    Replace 0xFFFFFFFF placeholders with the 64-bit values from the zip64 extra field.
+    """
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, length = struct.unpack('<2H', extra[pos:pos + 4])
+        if tag == 0x0001:
+            values = iter(struct.unpack(f'<{length // 8}Q', extra[pos + 4:pos + 4 + length - length % 8]))
+            if file_size == 0xFFFFFFFF:
+                file_size = next(values)
+            if compressed_size == 0xFFFFFFFF:
+                compressed_size = next(values)
+            if header_offset == 0xFFFFFFFF:
+                header_offset = next(values)
+            break
+        pos += 4 + length
+    return file_size, compressed_size, header_offset
+
+
+def list_remote_members(url, session=None):
+    """
+    Read a remote zip's central directory with Range requests and return its members.
+
+    Only the archive tail and the central directory are transferred, a few
+    KB for a PGYR archive regardless of its size. Zip64 archives are supported.
+    """
+    session = session or requests.Session()
+    size = _remote_size(session, url)
+    tail_start = max(0, size - _TAIL_SIZE)
+    tail = _fetch(session, url, tail_start, size - 1)
+
+    eocd_pos = tail.rfind(_EOCD_SIG)
+    if eocd_pos < 0:
+        raise Exception(f"No end of central directory record found in {url}")
+    (_, _, _, _, entries, cd_size, cd_offset, _) = _EOCD.unpack(tail[eocd_pos:eocd_pos + _EOCD.size])
+
+    locator_pos = eocd_pos - _ZIP64_LOCATOR.size
+    if locator_pos >= 0 and tail[locator_pos:locator_pos + 4] == _ZIP64_LOCATOR_SIG:
+        _, _, zip64_offset, _ = _ZIP64_LOCATOR.unpack(tail[locator_pos:eocd_pos])
+        record = _fetch(session, url, zip64_offset, zip64_offset + _ZIP64_EOCD.size - 1)
+        if record[:4] != _ZIP64_EOCD_SIG:
+            raise Exception(f"Corrupt zip64 end of central directory in {url}")
+        (_, _, _, _, _, _, _, entries, cd_size, cd_offset) = _ZIP64_EOCD.unpack(record)
+
+    directory = _fetch(session, url, cd_offset, cd_offset + cd_size - 1) if cd_size else b''
+    members = []
+    pos = 0
+    for _ in range(entries):
+        fields = _CENTRAL_DIR.unpack(directory[pos:pos + _CENTRAL_DIR.size])
+        if fields[0] != _CENTRAL_DIR_SIG:
+            raise Exception(f"Corrupt central directory in {url} at offset {cd_offset + pos}")
+        flags, compress_type, crc = fields[5], fields[6], fields[9]
+        compressed_size, file_size = fields[10], fields[11]
+        name_len, extra_len, comment_len = fields[12], fields[13], fields[14]
+        header_offset = fields[18]
+
+        pos += _CENTRAL_DIR.size
+        raw_name = directory[pos:pos + name_len]
+        name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+        extra = directory[pos + name_len:pos + name_len + extra_len]
+        pos += name_len + extra_len + comment_len
+
+        file_size, compressed_size, header_offset = _parse_zip64_extra(
+            extra, file_size, compressed_size, header_offset
+        )
+        members.append(RemoteMember(name, compressed_size, file_size, crc, header_offset, compress_type))
+    return members
+
+
+def fetch_remote_member(url, member, dest_path, session=None, chunk_size=CHUNK_SIZE):
+    """
+    Download only one member's byte range and inflate it locally into dest_path.
+
+    The data is streamed through a raw-deflate decompressor, so memory stays
+    at one chunk, and the CRC-32 and size from the central directory are
+    checked before the file is moved into place.
+    """
+    session = session or requests.Session()
+    if member.compress_type not in (ZIP_STORED, ZIP_DEFLATED):
+        raise Exception(f"Unsupported compression method {member.compress_type} for {member.name}")
+
+    header = _fetch(session, url, member.header_offset, member.header_offset + _LOCAL_HEADER.size - 1)
+    fields = _LOCAL_HEADER.unpack(header)
+    if fields[0] != _LOCAL_HEADER_SIG:
+        raise Exception(f"Corrupt local header for {member.name} in {url}")
+    data_start = member.header_offset + _LOCAL_HEADER.size + fields[10] + fields[11]
+    data_end = data_start + member.compressed_size - 1
+
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if member.compress_type == ZIP_DEFLATED else None
+    crc = 0
+    written = 0
+    part_path = dest_path + '.part'
+    with open(part_path, 'wb') as f:
+        if member.compressed_size:
+            response = session.get(url, headers={'Range': f"bytes={data_start}-{data_end}"},
+                                   stream=True, timeout=REQUEST_TIMEOUT)
+            with response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise Exception(f"{url} does not support HTTP Range requests")
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    data = decompressor.decompress(chunk) if decompressor else chunk
+                    f.write(data)
+                    crc = zlib.crc32(data, crc)
+                    written += len(data)
+        if decompressor:
+            data = decompressor.flush()
+            f.write(data)
+            crc = zlib.crc32(data, crc)
+            written += len(data)
+
+    if written != member.file_size or crc != member.crc:
+        os.remove(part_path)
+        raise Exception(
+            f"Verification failed for {member.name}: {written} bytes, crc {crc:08x} "
+            f"(expected {member.file_size} bytes, crc {member.crc:08x})"
+        )
+    os.replace(part_path, dest_path)
+    logging.info("Fetched %s: %d compressed -> %d bytes", member.name, member.compressed_size, written)
+    return dest_path
+
+
+def fetch_remote_members(url, extract_path, file_types, session=None):
+    """
+    Pre-flight a remote PGYR archive and fetch only the detail CSVs for file_types.
+
+    Logs every member's name, sizes and CRC, then inflates just the matching
+    members into extract_path. Returns the fetched member names.
+    """
+    session = session or requests.Session()
+    members = list_remote_members(url, session=session)
+    for member in members:
+        logging.info("Remote member %s: %d bytes (%d compressed), crc %08x",
+                     member.name, member.file_size, member.compressed_size, member.crc)
+
+    wanted = select_members([member.name for member in members], file_types)
+    if not wanted:
+        raise Exception(f"No members for {file_types} in {url}")
+    skipped = sum(member.compressed_size for member in members if member.name not in wanted)
+    logging.info("Fetching %s, skipping %d compressed bytes", wanted, skipped)
+
+    for member in members:
+        if member.name in wanted:
+            target = os.path.join(extract_path, os.path.basename(member.name))
+            fetch_remote_member(url, member, target, session=session)
+    return wanted
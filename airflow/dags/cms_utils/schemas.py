@@ -0,0 +1,424 @@
+"""
+Column types of the CMS Open Payments detail CSVs, shared by the DAGs and converters.
+"""
+
+# Research payments (DTL_RSRCH); amounts are read as decimals (NUMERIC) and dates as dates to match the RSRCH_ALL DDL
+DTYPE_DICT_RSRCH = {
+    "Change_Type": str,
+    "Covered_Recipient_Type": str,
+    "Noncovered_Recipient_Entity_Name": str,
+    "Teaching_Hospital_CCN": str,
+    "Teaching_Hospital_ID": str,
+    "Teaching_Hospital_Name": str,
+    "Covered_Recipient_Profile_ID": str,
+    "Covered_Recipient_NPI": str,
+    "Covered_Recipient_First_Name": str,
+    "Covered_Recipient_Middle_Name": str,
+    "Covered_Recipient_Last_Name": str,
+    "Covered_Recipient_Name_Suffix": str,
+    "Recipient_Primary_Business_Street_Address_Line1": str,
+    "Recipient_Primary_Business_Street_Address_Line2": str,
+    "Recipient_City": str,
+    "Recipient_State": str,
+    "Recipient_Zip_Code": str,
+    "Recipient_Country": str,
+    "Recipient_Province": str,
+    "Recipient_Postal_Code": str,
+    "Covered_Recipient_Primary_Type_1": str,
+    "Covered_Recipient_Primary_Type_2": str,
+    "Covered_Recipient_Primary_Type_3": str,
+    "Covered_Recipient_Primary_Type_4": str,
+    "Covered_Recipient_Primary_Type_5": str,
+    "Covered_Recipient_Primary_Type_6": str,
+    "Covered_Recipient_Specialty_1": str,
+    "Covered_Recipient_Specialty_2": str,
+    "Covered_Recipient_Specialty_3": str,
+    "Covered_Recipient_Specialty_4": str,
+    "Covered_Recipient_Specialty_5": str,
+    "Covered_Recipient_Specialty_6": str,
+    "Covered_Recipient_License_State_code1": str,
+    "Covered_Recipient_License_State_code2": str,
+    "Covered_Recipient_License_State_code3": str,
+    "Covered_Recipient_License_State_code4": str,
+    "Covered_Recipient_License_State_code5": str,
+    "Principal_Investigator_1_Covered_Recipient_Type": str,
+    "Principal_Investigator_1_Profile_ID": str,
+    "Principal_Investigator_1_NPI": str,
+    "Principal_Investigator_1_First_Name": str,
+    "Principal_Investigator_1_Middle_Name": str,
+    "Principal_Investigator_1_Last_Name": str,
+    "Principal_Investigator_1_Name_Suffix": str,
+    "Principal_Investigator_1_Business_Street_Address_Line1": str,
+    "Principal_Investigator_1_Business_Street_Address_Line2": str,
+    "Principal_Investigator_1_City": str,
+    "Principal_Investigator_1_State": str,
+    "Principal_Investigator_1_Zip_Code": str,
+    "Principal_Investigator_1_Country": str,
+    "Principal_Investigator_1_Province": str,
+    "Principal_Investigator_1_Postal_Code": str,
+    "Principal_Investigator_1_Primary_Type_1": str,
+    "Principal_Investigator_1_Primary_Type_2": str,
+    "Principal_Investigator_1_Primary_Type_3": str,
+    "Principal_Investigator_1_Primary_Type_4": str,
+    "Principal_Investigator_1_Primary_Type_5": str,
+    "Principal_Investigator_1_Primary_Type_6": str,
+    "Principal_Investigator_1_Specialty_1": str,
+    "Principal_Investigator_1_Specialty_2": str,
+    "Principal_Investigator_1_Specialty_3": str,
+    "Principal_Investigator_1_Specialty_4": str,
+    "Principal_Investigator_1_Specialty_5": str,
+    "Principal_Investigator_1_Specialty_6": str,
+    "Principal_Investigator_1_License_State_code1": str,
+    "Principal_Investigator_1_License_State_code2": str,
+    "Principal_Investigator_1_License_State_code3": str,
+    "Principal_Investigator_1_License_State_code4": str,
+    "Principal_Investigator_1_License_State_code5": str,
+    "Principal_Investigator_2_Covered_Recipient_Type": str,
+    "Principal_Investigator_2_Profile_ID": str,
+    "Principal_Investigator_2_NPI": str,
+    "Principal_Investigator_2_First_Name": str,
+    "Principal_Investigator_2_Middle_Name": str,
+    "Principal_Investigator_2_Last_Name": str,
+    "Principal_Investigator_2_Name_Suffix": str,
+    "Principal_Investigator_2_Business_Street_Address_Line1": str,
+    "Principal_Investigator_2_Business_Street_Address_Line2": str,
+    "Principal_Investigator_2_City": str,
+    "Principal_Investigator_2_State": str,
+    "Principal_Investigator_2_Zip_Code": str,
+    "Principal_Investigator_2_Country": str,
+    "Principal_Investigator_2_Province": str,
+    "Principal_Investigator_2_Postal_Code": str,
+    "Principal_Investigator_2_Primary_Type_1": str,
+    "Principal_Investigator_2_Primary_Type_2": str,
+    "Principal_Investigator_2_Primary_Type_3": str,
+    "Principal_Investigator_2_Primary_Type_4": str,
+    "Principal_Investigator_2_Primary_Type_5": str,
+    "Principal_Investigator_2_Primary_Type_6": str,
+    "Principal_Investigator_2_Specialty_1": str,
+    "Principal_Investigator_2_Specialty_2": str,
+    "Principal_Investigator_2_Specialty_3": str,
+    "Principal_Investigator_2_Specialty_4": str,
+    "Principal_Investigator_2_Specialty_5": str,
+    "Principal_Investigator_2_Specialty_6": str,
+    "Principal_Investigator_2_License_State_code1": str,
+    "Principal_Investigator_2_License_State_code2": str,
+    "Principal_Investigator_2_License_State_code3": str,
+    "Principal_Investigator_2_License_State_code4": str,
+    "Principal_Investigator_2_License_State_code5": str,
+    "Principal_Investigator_3_Covered_Recipient_Type": str,
+    "Principal_Investigator_3_Profile_ID": str,
+    "Principal_Investigator_3_NPI": str,
+    "Principal_Investigator_3_First_Name": str,
+    "Principal_Investigator_3_Middle_Name": str,
+    "Principal_Investigator_3_Last_Name": str,
+    "Principal_Investigator_3_Name_Suffix": str,
+    "Principal_Investigator_3_Business_Street_Address_Line1": str,
+    "Principal_Investigator_3_Business_Street_Address_Line2": str,
+    "Principal_Investigator_3_City": str,
+    "Principal_Investigator_3_State": str,
+    "Principal_Investigator_3_Zip_Code": str,
+    "Principal_Investigator_3_Country": str,
+    "Principal_Investigator_3_Province": str,
+    "Principal_Investigator_3_Postal_Code": str,
+    "Principal_Investigator_3_Primary_Type_1": str,
+    "Principal_Investigator_3_Primary_Type_2": str,
+    "Principal_Investigator_3_Primary_Type_3": str,
+    "Principal_Investigator_3_Primary_Type_4": str,
+    "Principal_Investigator_3_Primary_Type_5": str,
+    "Principal_Investigator_3_Primary_Type_6": str,
+    "Principal_Investigator_3_Specialty_1": str,
+    "Principal_Investigator_3_Specialty_2": str,
+    "Principal_Investigator_3_Specialty_3": str,
+    "Principal_Investigator_3_Specialty_4": str,
+    "Principal_Investigator_3_Specialty_5": str,
+    "Principal_Investigator_3_Specialty_6": str,
+    "Principal_Investigator_3_License_State_code1": str,
+    "Principal_Investigator_3_License_State_code2": str,
+    "Principal_Investigator_3_License_State_code3": str,
+    "Principal_Investigator_3_License_State_code4": str,
+    "Principal_Investigator_3_License_State_code5": str,
+    "Principal_Investigator_4_Covered_Recipient_Type": str,
+    "Principal_Investigator_4_Profile_ID": str,
+    "Principal_Investigator_4_NPI": str,
+    "Principal_Investigator_4_First_Name": str,
+    "Principal_Investigator_4_Middle_Name": str,
+    "Principal_Investigator_4_Last_Name": str,
+    "Principal_Investigator_4_Name_Suffix": str,
+    "Principal_Investigator_4_Business_Street_Address_Line1": str,
+    "Principal_Investigator_4_Business_Street_Address_Line2": str,
+    "Principal_Investigator_4_City": str,
+    "Principal_Investigator_4_State": str,
+    "Principal_Investigator_4_Zip_Code": str,
+    "Principal_Investigator_4_Country": str,
+    "Principal_Investigator_4_Province": str,
+    "Principal_Investigator_4_Postal_Code": str,
+    "Principal_Investigator_4_Primary_Type_1": str,
+    "Principal_Investigator_4_Primary_Type_2": str,
+    "Principal_Investigator_4_Primary_Type_3": str,
+    "Principal_Investigator_4_Primary_Type_4": str,
+    "Principal_Investigator_4_Primary_Type_5": str,
+    "Principal_Investigator_4_Primary_Type_6": str,
+    "Principal_Investigator_4_Specialty_1": str,
+    "Principal_Investigator_4_Specialty_2": str,
+    "Principal_Investigator_4_Specialty_3": str,
+    "Principal_Investigator_4_Specialty_4": str,
+    "Principal_Investigator_4_Specialty_5": str,
+    "Principal_Investigator_4_Specialty_6": str,
+    "Principal_Investigator_4_License_State_code1": str,
+    "Principal_Investigator_4_License_State_code2": str,
+    "Principal_Investigator_4_License_State_code3": str,
+    "Principal_Investigator_4_License_State_code4": str,
+    "Principal_Investigator_4_License_State_code5": str,
+    "Principal_Investigator_5_Covered_Recipient_Type": str,
+    "Principal_Investigator_5_Profile_ID": str,
+    "Principal_Investigator_5_NPI": str,
+    "Principal_Investigator_5_First_Name": str,
+    "Principal_Investigator_5_Middle_Name": str,
+    "Principal_Investigator_5_Last_Name": str,
+    "Principal_Investigator_5_Name_Suffix": str,
+    "Principal_Investigator_5_Business_Street_Address_Line1": str,
+    "Principal_Investigator_5_Business_Street_Address_Line2": str,
+    "Principal_Investigator_5_City": str,
+    "Principal_Investigator_5_State": str,
+    "Principal_Investigator_5_Zip_Code": str,
+    "Principal_Investigator_5_Country": str,
+    "Principal_Investigator_5_Province": str,
+    "Principal_Investigator_5_Postal_Code": str,
+    "Principal_Investigator_5_Primary_Type_1": str,
+    "Principal_Investigator_5_Primary_Type_2": str,
+    "Principal_Investigator_5_Primary_Type_3": str,
+    "Principal_Investigator_5_Primary_Type_4": str,
+    "Principal_Investigator_5_Primary_Type_5": str,
+    "Principal_Investigator_5_Primary_Type_6": str,
+    "Principal_Investigator_5_Specialty_1": str,
+    "Principal_Investigator_5_Specialty_2": str,
+    "Principal_Investigator_5_Specialty_3": str,
+    "Principal_Investigator_5_Specialty_4": str,
+    "Principal_Investigator_5_Specialty_5": str,
+    "Principal_Investigator_5_Specialty_6": str,
+    "Principal_Investigator_5_License_State_code1": str,
+    "Principal_Investigator_5_License_State_code2": str,
+    "Principal_Investigator_5_License_State_code3": str,
+    "Principal_Investigator_5_License_State_code4": str,
+    "Principal_Investigator_5_License_State_code5": str,
+    "Submitting_Applicable_Manufacturer_or_Applicable_GPO_Name": str,
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_ID": int,
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Name": str,
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_State": str,
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Country": str,
+    "Related_Product_Indicator": str,
+    "Covered_or_Noncovered_Indicator_1": str,
+    "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_1": str,
+    "Product_Category_or_Therapeutic_Area_1": str,
+    "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_1": str,
+    "Associated_Drug_or_Biological_NDC_1": str,
+    "Associated_Device_or_Medical_Supply_PDI_1": str,
+    "Covered_or_Noncovered_Indicator_2": str,
+    "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_2": str,
+    "Product_Category_or_Therapeutic_Area_2": str,
+    "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_2": str,
+    "Associated_Drug_or_Biological_NDC_2": str,
+    "Associated_Device_or_Medical_Supply_PDI_2": str,
+    "Covered_or_Noncovered_Indicator_3": str,
+    "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_3": str,
+    "Product_Category_or_Therapeutic_Area_3": str,
+    "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_3": str,
+    "Associated_Drug_or_Biological_NDC_3": str,
+    "Associated_Device_or_Medical_Supply_PDI_3": str,
+    "Covered_or_Noncovered_Indicator_4": str,
+    "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_4": str,
+    "Product_Category_or_Therapeutic_Area_4": str,
+    "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_4": str,
+    "Associated_Drug_or_Biological_NDC_4": str,
+    "Associated_Device_or_Medical_Supply_PDI_4": str,
+    "Covered_or_Noncovered_Indicator_5": str,
+    "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_5": str,
+    "Product_Category_or_Therapeutic_Area_5": str,
+    "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_5": str,
+    "Associated_Drug_or_Biological_NDC_5": str,
+    "Associated_Device_or_Medical_Supply_PDI_5": str,
+    "Total_Amount_of_Payment_USDollars": "decimal",
+    "Date_of_Payment": "date",
+    "Form_of_Payment_or_Transfer_of_Value": str,
+    "Expenditure_Category1": str,
+    "Expenditure_Category2": str,
+    "Expenditure_Category3": str,
+    "Expenditure_Category4": str,
+    "Expenditure_Category5": str,
+    "Expenditure_Category6": str,
+    "Preclinical_Research_Indicator": str,
+    "Delay_in_Publication_Indicator": str,
+    "Name_of_Study": str,
+    "Dispute_Status_for_Publication": str,
+    "Record_ID": int,
+    "Program_Year": int,
+    "Payment_Publication_Date": "date",
+    "ClinicalTrials_Gov_Identifier": str,
+    "Research_Information_Link": str,
+    "Context_of_Research": str
+}
+
+# The five Principal_Investigator_<n>_* blocks of DTL_RSRCH are split off at conversion into a
+# long table with one row per investigator, numbered by this column
+RSRCH_PI_PREFIX = "Principal_Investigator_"
+RSRCH_PI_INDEX = "pi_index"
+
+# The RSRCH columns the dbt models read, in RSRCH_ALL order: the RSRCH_ALL source columns
+# declared in dbt/models/staging/schema.yml, which lists the same names. RSRCH_ALL keeps only
+# these (plus the stamped filename); the full-width year is archived in the lake. The
+# manufacturer ID is kept for RSRCH_ALL's clustering
+RSRCH_HOT_COLUMNS = [
+    "Change_Type",
+    "Covered_Recipient_Type",
+    "Noncovered_Recipient_Entity_Name",
+    "Teaching_Hospital_Name",
+    "Recipient_City",
+    "Recipient_State",
+    "Recipient_Zip_Code",
+    "Recipient_Country",
+    "Submitting_Applicable_Manufacturer_or_Applicable_GPO_Name",
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_ID",
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Name",
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_State",
+    "Related_Product_Indicator",
+    "Covered_or_Noncovered_Indicator_1",
+    "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_1",
+    "Product_Category_or_Therapeutic_Area_1",
+    "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_1",
+    "Total_Amount_of_Payment_USDollars",
+    "Date_of_Payment",
+    "Form_of_Payment_or_Transfer_of_Value",
+    "Record_ID",
+    "Program_Year",
+    "Payment_Publication_Date",
+]
+
+# General payments (DTL_GNRL)
+DTYPE_DICT_GNRL = {
+    "Change_Type": "object",
+    "Covered_Recipient_Type": "object",
+    "Teaching_Hospital_CCN": "object",
+    "Teaching_Hospital_ID": "object",
+    "Teaching_Hospital_Name": "object",
+    "Covered_Recipient_Profile_ID": "object",
+    "Covered_Recipient_NPI": "object",
+    "Covered_Recipient_First_Name": "object",
+    "Covered_Recipient_Middle_Name": "object",
+    "Covered_Recipient_Last_Name": "object",
+    "Covered_Recipient_Name_Suffix": "object",
+    "Recipient_Primary_Business_Street_Address_Line1": "object",
+    "Recipient_Primary_Business_Street_Address_Line2": "object",
+    "Recipient_City": "object",
+    "Recipient_State": "object",
+    "Recipient_Zip_Code": "object",
+    "Recipient_Country": "object",
+    "Recipient_Province": "object",
+    "Recipient_Postal_Code": "object",
+    "Covered_Recipient_Primary_Type_1": "object",
+    "Covered_Recipient_Primary_Type_2": "object",
+    "Covered_Recipient_Primary_Type_3": "object",
+    "Covered_Recipient_Primary_Type_4": "object",
+    "Covered_Recipient_Primary_Type_5": "object",
+    "Covered_Recipient_Primary_Type_6": "object",
+    "Covered_Recipient_Specialty_1": "object",
+    "Covered_Recipient_Specialty_2": "object",
+    "Covered_Recipient_Specialty_3": "object",
+    "Covered_Recipient_Specialty_4": "object",
+    "Covered_Recipient_Specialty_5": "object",
+    "Covered_Recipient_Specialty_6": "object",
+    "Covered_Recipient_License_State_code1": "object",
+    "Covered_Recipient_License_State_code2": "object",
+    "Covered_Recipient_License_State_code3": "object",
+    "Covered_Recipient_License_State_code4": "object",
+    "Covered_Recipient_License_State_code5": "object",
+    "Submitting_Applicable_Manufacturer_or_Applicable_GPO_Name": "object",
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_ID": "object",
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Name": "object",
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_State": "object",
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Country": "object",
+    "Total_Amount_of_Payment_USDollars": "object",
+    "Date_of_Payment": "object",
+    "Number_of_Payments_Included_in_Total_Amount": "int64",
+    "Form_of_Payment_or_Transfer_of_Value": "object",
+    "Nature_of_Payment_or_Transfer_of_Value": "object",
+    "City_of_Travel": "object",
+    "State_of_Travel": "object",
+    "Country_of_Travel": "object",
+    "Physician_Ownership_Indicator": "object",
+    "Third_Party_Payment_Recipient_Indicator": "object",
+    "Name_of_Third_Party_Entity_Receiving_Payment_or_Transfer_of_Value": "object",
+    "Charity_Indicator": "object",
+    "Third_Party_Equals_Covered_Recipient_Indicator": "object",
+    "Contextual_Information": "object",
+    "Delay_in_Publication_Indicator": "object",
+    "Record_ID": "object",
+    "Dispute_Status_for_Publication": "object",
+    "Related_Product_Indicator": "object",
+    "Covered_or_Noncovered_Indicator_1": "object",
+    "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_1": "object",
+    "Product_Category_or_Therapeutic_Area_1": "object",
+    "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_1": "object",
+    "Associated_Drug_or_Biological_NDC_1": "object",
+    "Associated_Device_or_Medical_Supply_PDI_1": "object",
+    "Covered_or_Noncovered_Indicator_2": "object",
+    "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_2": "object",
+    "Product_Category_or_Therapeutic_Area_2": "object",
+    "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_2": "object",
+    "Associated_Drug_or_Biological_NDC_2": "object",
+    "Associated_Device_or_Medical_Supply_PDI_2": "object",
+    "Covered_or_Noncovered_Indicator_3": "object",
+    "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_3": "object",
+    "Product_Category_or_Therapeutic_Area_3": "object",
+    "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_3": "object",
+    "Associated_Drug_or_Biological_NDC_3": "object",
+    "Associated_Device_or_Medical_Supply_PDI_3": "object",
+    "Covered_or_Noncovered_Indicator_4": "object",
+    "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_4": "object",
+    "Product_Category_or_Therapeutic_Area_4": "object",
+    "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_4": "object",
+    "Associated_Drug_or_Biological_NDC_4": "object",
+    "Associated_Device_or_Medical_Supply_PDI_4": "object",
+    "Covered_or_Noncovered_Indicator_5": "object",
+    "Indicate_Drug_or_Biological_or_Device_or_Medical_Supply_5": "object",
+    "Product_Category_or_Therapeutic_Area_5": "object",
+    "Name_of_Drug_or_Biological_or_Device_or_Medical_Supply_5": "object",
+    "Associated_Drug_or_Biological_NDC_5": "object",
+    "Associated_Device_or_Medical_Supply_PDI_5": "object",
+    "Program_Year": "int64",
+    "Payment_Publication_Date": "object"
+}
+
+# Ownership and investment interests (DTL_OWNRSHP), in published header order, with the types
+# pandas gives complete records; declared so every block is read alike, not inferred from the first
+DTYPE_DICT_OWNRSHP = {
+    "Change_Type": "object",
+    "Physician_Profile_ID": "int64",
+    "Physician_NPI": "int64",
+    "Physician_First_Name": "object",
+    "Physician_Middle_Name": "object",
+    "Physician_Last_Name": "object",
+    "Physician_Name_Suffix": "object",
+    "Recipient_Primary_Business_Street_Address_Line1": "object",
+    "Recipient_Primary_Business_Street_Address_Line2": "object",
+    "Recipient_City": "object",
+    "Recipient_State": "object",
+    "Recipient_Zip_Code": "object",
+    "Recipient_Country": "object",
+    "Recipient_Province": "object",
+    "Recipient_Postal_Code": "object",
+    "Physician_Primary_Type": "object",
+    "Physician_Specialty": "object",
+    "Record_ID": "int64",
+    "Program_Year": "int64",
+    "Total_Amount_Invested_USDollars": "float64",
+    "Value_of_Interest": "float64",
+    "Terms_of_Interest": "object",
+    "Submitting_Applicable_Manufacturer_or_Applicable_GPO_Name": "object",
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_ID": "int64",
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Name": "object",
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_State": "object",
+    "Applicable_Manufacturer_or_Applicable_GPO_Making_Payment_Country": "object",
+    "Dispute_Status_for_Publication": "object",
+    "Interest_Held_by_Physician_or_an_Immediate_Family_Member": "object",
+    "Payment_Publication_Date": "object"
+}
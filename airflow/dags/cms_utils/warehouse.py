@@ -0,0 +1,339 @@
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+import duckdb
+
+from cms_utils.cache import file_lock
+from cms_utils.gcs import file_checksums
+
+# "bigquery" runs the jobs in BigQuery against GCS; "duckdb" runs the same job
+# configurations against a local DuckDB database, with a directory standing in for GCS
+WAREHOUSE_BACKENDS = ('bigquery', 'duckdb')
+
+# BigQuery column types that DuckDB spells differently
+_DUCKDB_TYPES = {
+    'STRING': 'VARCHAR',
+    'INT64': 'BIGINT',
+    'FLOAT64': 'DOUBLE',
+    'NUMERIC': 'DECIMAL(38, 9)',
+    'BOOL': 'BOOLEAN',
+    'BYTES': 'BLOB',
+}
+
+_TABLE_REF = re.compile(r"`([^`]+)`")
+_GCS_URI = re.compile(r"gs://([^/'\"\s]+)/([^'\"\s]*)")
+_EXTERNAL_TABLE = re.compile(
+    r"CREATE\s+OR\s+REPLACE\s+EXTERNAL\s+TABLE\s+(?P<name>\S+)\s*(?:\((?P<columns>[^()]*)\))?"
+    r"\s*OPTIONS\s*\((?P<options>.*?)\)\s*;",
+    re.IGNORECASE | re.DOTALL,
+)
+_CREATE_TABLE = re.compile(
+    r"CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?P<name>\S+)(?P<body>.*?)(?:;|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+_PARTITION_COLUMN = re.compile(r"^\s*PARTITION\s+BY\s+(?:RANGE_BUCKET\s*\(|DATE\s*\(|DATE_TRUNC\s*\()?\s*(\w+)",
+                               re.IGNORECASE | re.MULTILINE)
+# Table clauses DuckDB has no equivalent for; each sits on its own line in the DAGs' DDL
+_TABLE_CLAUSES = re.compile(r"^\s*(?:PARTITION\s+BY|CLUSTER\s+BY)\b.*$", re.IGNORECASE | re.MULTILINE)
+
+
+def local_uri(uri, lake_path):
+    """
+    The path under lake_path that stands in for a gs://bucket/object URI.
+    """
+    return _GCS_URI.sub(lambda match: os.path.join(lake_path, match.group(1), match.group(2)), uri)
+
+
+def duckdb_table(table_id):
+    """
+    The DuckDB name of a BigQuery table, unique even though DuckDB ignores case.
+
+    BigQuery keeps RSRCH_all and RSRCH_ALL apart; DuckDB would resolve both
+    to one table. Names without lowercase letters (RSRCH_ALL, the ones dbt
+    reads) are kept, and the rest get a '~' suffix, which BigQuery names
+    cannot contain, holding the hex mask of their lowercase positions:
+    RSRCH_all becomes RSRCH_all~1c0.
+    """
+    mask = sum(1 << position for position, char in enumerate(table_id) if char.islower())
+    return f"{table_id}~{mask:x}" if mask else table_id
+
+
+def _table_name(reference):
+    # `project.dataset.table` -> "dataset"."table"; DuckDB schemas stand in for datasets
+    dataset, table = reference.split('.')[-2:]
+    return f'"{dataset}"."{duckdb_table(table)}"'
+
+
+def _external_view(match):
+    """
+    A BigQuery external table over Parquet as a DuckDB view over read_parquet.
+    """
+    options = match.group('options')
+    file_format = re.search(r"format\s*=\s*'(\w+)'", options, re.IGNORECASE).group(1).upper()
+    if file_format != 'PARQUET':
+        raise Exception(f"Only Parquet external tables run on DuckDB, not {file_format}")
+    uris = re.search(r"uris\s*=\s*\[(.*?)\]", options, re.DOTALL).group(1)
+    columns = [column.split() for column in (match.group('columns') or '').split(',') if column.strip()]
+    select = ', '.join(f'CAST("{name}" AS {column_type}) AS "{name}"' for name, column_type in columns) or '*'
+    return f"CREATE OR REPLACE VIEW {match.group('name')} AS SELECT {select} FROM read_parquet([{uris}]);"
+
+
+def to_duckdb_sql(sql, lake_path):
+    """
+    Translate the BigQuery SQL the DAGs run into DuckDB SQL; return it and the tables' partition columns.
+
+    Covers what the DAGs use: `project.dataset.table` references (datasets
+    become schemas, created on demand, and tables are named by
+    duckdb_table), gs:// URIs (mapped under lake_path), Parquet external
+    tables (views over read_parquet), BigQuery type names, SELECT * EXCEPT
+    and the PARTITION BY/CLUSTER BY clauses, which are dropped after the
+    partition column is noted so that loads into a partition decorator can
+    replace that partition.
+    """
+    sql = _TABLE_REF.sub(lambda match: _table_name(match.group(1)), sql)
+    sql = local_uri(sql, lake_path)
+    sql = _EXTERNAL_TABLE.sub(_external_view, sql)
+    partitions = {}
+    for match in _CREATE_TABLE.finditer(sql):
+        partition = _PARTITION_COLUMN.search(match.group('body'))
+        if partition:
+            partitions[match.group('name')] = partition.group(1)
+    sql = _TABLE_CLAUSES.sub('', sql)
+    for bigquery_type, duckdb_type in _DUCKDB_TYPES.items():
+        sql = re.sub(rf"\b{bigquery_type}\b", duckdb_type, sql)
+    sql = re.sub(r"\*\s+EXCEPT\s*\(", "* EXCLUDE (", sql, flags=re.IGNORECASE)
+    schemas = sorted(set(re.findall(r'("[^"]+")\."[^"]+"', sql)))
+    sql = ''.join(f"CREATE SCHEMA IF NOT EXISTS {schema};\n" for schema in schemas) + sql
+    return sql, partitions
+
+
+def _table_exists(conn, schema, table):
+    return conn.execute(
+        "SELECT count(*) FROM duckdb_tables() WHERE schema_name = ? AND table_name = ?", [schema, table]
+    ).fetchone()[0] > 0
+
+
+def _load(conn, load, lake_path):
+    """
+    Run a BigQuery load job configuration (Parquet from GCS) against DuckDB.
+    """
+    source_format = load.get('sourceFormat', 'CSV').upper()
+    if source_format != 'PARQUET':
+        raise Exception(f"Only Parquet loads run on DuckDB, not {source_format}")
+    uris = [local_uri(uri, lake_path) for uri in load['sourceUris']]
+    destination = load['destinationTable']
+    table_id, _, partition = destination['tableId'].partition('$')
+    table_id = duckdb_table(table_id)
+    schema = destination['datasetId']
+    table = f'"{schema}"."{table_id}"'
+    source = f"SELECT * FROM read_parquet({uris!r})"
+    write = load.get('writeDisposition', 'WRITE_APPEND')
+
+    conn.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+    if not _table_exists(conn, schema, table_id):
+        if load.get('createDisposition', 'CREATE_IF_NEEDED') == 'CREATE_NEVER':
+            raise Exception(f"Table {table} does not exist and createDisposition is CREATE_NEVER")
+        conn.execute(f"CREATE TABLE {table} AS {source}")
+        return
+    if write == 'WRITE_EMPTY' and conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]:
+        raise Exception(f"Table {table} is not empty and writeDisposition is WRITE_EMPTY")
+    if write == 'WRITE_TRUNCATE' and not partition:
+        conn.execute(f"CREATE OR REPLACE TABLE {table} AS {source}")
+        return
+
+    conn.execute("BEGIN TRANSACTION")
+    if write == 'WRITE_TRUNCATE':
+        # table$partition: replace only that partition, as BigQuery does
+        column = conn.execute(
+            "SELECT column_name FROM _warehouse_partitions WHERE table_name = ?", [table]
+        ).fetchone()
+        if column is None:
+            raise Exception(f"{table} is not partitioned, so it has no partition {partition}")
+        column_type = conn.execute(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_schema = ? AND table_name = ? AND column_name = ?", [schema, table_id, column[0]]
+        ).fetchone()[0]
+        value = "strptime(?, '%Y%m%d')::DATE" if column_type == 'DATE' else "CAST(? AS BIGINT)"
+        conn.execute(f'DELETE FROM {table} WHERE "{column[0]}" = {value}', [partition])
+    conn.execute(f"INSERT INTO {table} BY NAME {source}")
+    conn.execute("COMMIT")
+
+
+def run_duckdb_job(configuration, database, lake_path, **kwargs):
+    """
+    Run a BigQueryInsertJobOperator configuration (a query or a load job) against a local DuckDB database.
+
+    Jobs take turns on the database file, which DuckDB opens for one
+    writer process at a time.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+    with file_lock(f"{database}.lock"):
+        conn = duckdb.connect(database)
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS _warehouse_partitions (table_name VARCHAR PRIMARY KEY, column_name VARCHAR)"
+            )
+            if 'query' in configuration:
+                sql, partitions = to_duckdb_sql(configuration['query']['query'], lake_path)
+                conn.execute(sql)
+                for table, column in partitions.items():
+                    conn.execute("INSERT OR REPLACE INTO _warehouse_partitions VALUES (?, ?)", [table, column])
+            elif 'load' in configuration:
+                _load(conn, configuration['load'], lake_path)
+            else:
+                raise Exception(f"Unsupported job configuration {sorted(configuration)}")
+        finally:
+            conn.close()
+    logging.info("Ran %s job on %s", next(iter(configuration)), database)
+
+
+def run_duckdb_query(sql, database, lake_path):
+    """
+    Run a BigQuery SQL query against a local DuckDB database and return its rows as tuples.
+    """
+    sql, _ = to_duckdb_sql(sql, lake_path)
+    with file_lock(f"{database}.lock"):
+        conn = duckdb.connect(database)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+
+class LocalBlob:
+    """
+    An object of a LocalStorageClient bucket, kept as the file <root>/<bucket>/<name>.
+    """
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.path = os.path.join(bucket.path, name)
+
+    @property
+    def crc32c(self):
+        return file_checksums(self.path)[0] if os.path.isfile(self.path) else None
+
+    @property
+    def md5_hash(self):
+        return file_checksums(self.path)[1] if os.path.isfile(self.path) else None
+
+    def _write(self, copy):
+        # Written aside and renamed, so readers never see a partial object
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix='.upload-', dir=os.path.dirname(self.path))
+        with os.fdopen(fd, 'wb') as f:
+            copy(f)
+        os.replace(temp_path, self.path)
+
+    def upload_from_file(self, file_obj, size=None, checksum=None, timeout=None):
+        self._write(lambda f: f.write(file_obj.read(size) if size is not None else file_obj.read()))
+
+    def upload_from_filename(self, filename, checksum=None, timeout=None):
+        with open(filename, 'rb') as source:
+            self._write(lambda f: shutil.copyfileobj(source, f))
+
+    def compose(self, sources, timeout=None):
+        def copy(f):
+            for source in sources:
+                with open(source.path, 'rb') as part:
+                    shutil.copyfileobj(part, f)
+        self._write(copy)
+
+    def download_to_filename(self, filename, timeout=None):
+        shutil.copyfile(self.path, filename)
+
+    def delete(self, timeout=None):
+        os.remove(self.path)
+
+
+class LocalBucket:
+    def __init__(self, root, name):
+        self.name = name
+        self.path = os.path.join(root, name)
+
+    def blob(self, name):
+        return LocalBlob(self, name)
+
+    def get_blob(self, name):
+        blob = LocalBlob(self, name)
+        return blob if os.path.isfile(blob.path) else None
+
+
+class LocalStorageClient:
+    """
+    The part of google.cloud.storage.Client the DAGs use, over a local directory of buckets.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def bucket(self, name):
+        return LocalBucket(self.root, name)
+
+    def list_blobs(self, bucket_name, prefix=''):
+        bucket = self.bucket(bucket_name)
+        blobs = []
+        for directory, _, files in os.walk(bucket.path):
+            for file in files:
+                name = os.path.relpath(os.path.join(directory, file), bucket.path).replace(os.sep, '/')
+                if name.startswith(prefix) and not file.startswith('.upload-'):
+                    blobs.append(LocalBlob(bucket, name))
+        return sorted(blobs, key=lambda blob: blob.name)
+
+
+class Warehouse:
+    """
+    Where the DAGs' BigQuery stage runs: BigQuery and GCS, or a DuckDB database and a lake directory.
+
+    job() builds the task for a BigQueryInsertJobOperator configuration,
+    query() runs a query from inside a task and storage_client() returns
+    the client the upload tasks write through, so the DAGs read the same
+    either way.
+    """
+
+    def __init__(self, backend='bigquery', database=None, lake_path=None, gcp_conn_id="gcp-airflow"):
+        if backend not in WAREHOUSE_BACKENDS:
+            raise Exception(f"Unknown warehouse backend {backend!r}, expected one of {WAREHOUSE_BACKENDS}")
+        self.backend = backend
+        self.database = database
+        self.lake_path = lake_path
+        self.gcp_conn_id = gcp_conn_id
+
+    def job(self, task_id, configuration, **kwargs):
+        if self.backend == 'bigquery':
+            from airflow.providers.google.cloud.operators.bigquery import BigQueryInsertJobOperator
+
+            return BigQueryInsertJobOperator(
+                task_id=task_id, gcp_conn_id=self.gcp_conn_id, configuration=configuration, **kwargs
+            )
+        from airflow.operators.python import PythonOperator
+
+        # op_kwargs are templated like the operator's configuration
+        return PythonOperator(
+            task_id=task_id,
+            python_callable=run_duckdb_job,
+            op_kwargs={'configuration': configuration, 'database': self.database, 'lake_path': self.lake_path},
+            **kwargs,
+        )
+
+    def query(self, sql):
+        """
+        Run a BigQuery SQL query and return its rows as tuples.
+        """
+        if self.backend == 'bigquery':
+            from airflow.providers.google.cloud.hooks.bigquery import BigQueryHook
+
+            client = BigQueryHook(gcp_conn_id=self.gcp_conn_id, use_legacy_sql=False).get_client()
+            return [tuple(row.values()) for row in client.query(sql).result()]
+        return run_duckdb_query(sql, self.database, self.lake_path)
+
+    def storage_client(self):
+        if self.backend == 'bigquery':
+            from airflow.providers.google.cloud.hooks.gcs import GCSHook
+
+            return GCSHook(gcp_conn_id=self.gcp_conn_id).get_conn()
+        return LocalStorageClient(self.lake_path)
@@ -0,0 +1,63 @@
+import json
+import logging
+import os
+import shutil
+
+from cms_utils.cache import file_lock
+
+RESERVATION_FILE = '.reservation.json'
+
+
+def _disk_usage(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def _outstanding_reservations(root, exclude):
+    """
+    Bytes other live workspaces under root have reserved but not written yet.
+    """
+    outstanding = 0
+    for dirpath, _, filenames in os.walk(root):
+        if RESERVATION_FILE not in filenames or os.path.abspath(dirpath) == os.path.abspath(exclude):
+            continue
+        with open(os.path.join(dirpath, RESERVATION_FILE)) as f:
+            reserved = json.load(f)['bytes']
+        outstanding += max(0, reserved - _disk_usage(dirpath))
+    return outstanding
+
+
+def reserve_workspace(root, workspace, required_bytes):
+    """
+    Create a run's workspace after checking the disk can hold required_bytes more.
+
+    Free space is reduced by what concurrently running workspaces under root
+    have reserved but not yet written, so parallel runs cannot all pass the
+    check and then fill the disk together. The reservation is recorded in
+    the workspace and goes away with it. Raises when the budget does not
+    fit, so the task retries once other runs have cleaned up.
+    """
+    os.makedirs(root, exist_ok=True)
+    with file_lock(os.path.join(root, '.workspace.lock')):
+        free = shutil.disk_usage(root).free
+        outstanding = _outstanding_reservations(root, exclude=workspace)
+        # A retried run counts its own files as already reserved
+        existing = _disk_usage(workspace) if os.path.isdir(workspace) else 0
+        available = free - outstanding + existing
+        logging.info("Workspace %s needs %.1f GB: %.1f GB free, %.1f GB reserved by other runs",
+                     workspace, required_bytes / 1e9, free / 1e9, outstanding / 1e9)
+        if available < required_bytes:
+            raise Exception(
+                f"Not enough disk for {workspace}: need {required_bytes / 1e9:.1f} GB, "
+                f"{available / 1e9:.1f} GB available after other runs' reservations"
+            )
+        os.makedirs(workspace, exist_ok=True)
+        with open(os.path.join(workspace, RESERVATION_FILE), 'w') as f:
+            json.dump({'bytes': required_bytes}, f)
+    return workspace
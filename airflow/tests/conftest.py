@@ -0,0 +1,99 @@
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dags'))
+
+
+class FileServer(ThreadingHTTPServer):
+    """
+    Serves files from memory with ETags and single byte ranges, like download.cms.gov.
+
+    ranges=False makes it ignore Range (always 200, no Accept-Ranges);
+    truncate=n ends every GET body at byte n of the file and drops the
+    connection. Every request is recorded in requests as (method, path,
+    headers), and sent counts the body bytes written.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.files = {}
+        self.ranges = True
+        self.truncate = None
+        self.requests = []
+        self.sent = 0
+
+    def serve(self, path, data, etag='"v1"'):
+        self.files[path] = (data, etag)
+        return self.url(path)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, body):
+        server = self.server
+        server.requests.append((self.command, self.path, dict(self.headers)))
+        if self.path not in server.files:
+            self.send_error(404)
+            return
+        data, etag = server.files[self.path]
+        size = len(data)
+        start, end = 0, size - 1
+        status = 200
+
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if_range = self.headers.get('If-Range')
+        if server.ranges and match and (if_range is None or if_range == etag):
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+
+        payload = data[start:end + 1]
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        if server.ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        if server.truncate is None or not body:
+            self.send_header('Content-Length', str(len(payload)))
+        else:
+            # No length, so the dropped connection reads as the end of the body
+            payload = payload[:max(0, server.truncate - start)]
+        self.end_headers()
+        if body:
+            self.wfile.write(payload)
+            server.sent += len(payload)
+
+    def do_HEAD(self):
+        self._respond(body=False)
+
+    def do_GET(self):
+        self._respond(body=True)
+
+
+@pytest.fixture
+def http_server():
+    server = FileServer()
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import threading
+import time
+
+from cms_utils.cache import DownloadCache
+
+DATA = bytes(range(256)) * 40
+
+
+class _Downloads:
+    """
+    A download callable that copies the served bytes and counts its calls.
+    """
+
+    def __init__(self, server, delay=0):
+        self.server = server
+        self.delay = delay
+        self.urls = []
+
+    def __call__(self, url, dest_path):
+        self.urls.append(url)
+        time.sleep(self.delay)
+        data, _ = self.server.files[url[len(self.server.url('')):]]
+        with open(dest_path, 'wb') as f:
+            f.write(data)
+        return hashlib.sha256(data).hexdigest()
+
+
+def test_miss_then_hit(http_server, tmp_path):
+    url = http_server.serve('/PGYR2019.zip', DATA)
+    cache = DownloadCache(str(tmp_path / 'cache'), max_bytes=10 * len(DATA))
+    download = _Downloads(http_server)
+
+    assert cache.lookup(url) is None
+    blob = cache.fetch(url, download)
+    assert cache.fetch(url, download) == blob == cache.lookup(url)
+    assert download.urls == [url]
+    with open(blob, 'rb') as f:
+        assert f.read() == DATA
+
+
+def test_republished_file_is_a_miss(http_server, tmp_path):
+    url = http_server.serve('/PGYR2019.zip', DATA, etag='"v1"')
+    cache = DownloadCache(str(tmp_path / 'cache'), max_bytes=10 * len(DATA))
+    download = _Downloads(http_server)
+    cache.fetch(url, download)
+
+    http_server.serve('/PGYR2019.zip', DATA[::-1], etag='"v2"')
+    with open(cache.fetch(url, download), 'rb') as f:
+        assert f.read() == DATA[::-1]
+    assert download.urls == [url, url]
+
+
+def test_evicts_least_recently_used_past_max_bytes(http_server, tmp_path):
+    urls = {year: http_server.serve(f'/PGYR{year}.zip', bytes([year % 256]) * len(DATA)) for year in (2018, 2019, 2020)}
+    cache = DownloadCache(str(tmp_path / 'cache'), max_bytes=2 * len(DATA))
+    download = _Downloads(http_server)
+    oldest = cache.fetch(urls[2018], download)
+    evicted = cache.fetch(urls[2019], download)
+    # Using 2018 again makes 2019 the least recently used
+    cache.fetch(urls[2018], download)
+
+    newest = cache.fetch(urls[2020], download)
+    assert os.path.exists(oldest) and os.path.exists(newest)
+    assert not os.path.exists(evicted)
+    assert cache.lookup(urls[2019]) is None
+    assert sorted(os.listdir(cache.blob_dir)) == sorted(os.path.basename(blob) for blob in (oldest, newest))
+
+
+def test_concurrent_fetches_download_once(http_server, tmp_path):
+    url = http_server.serve('/PGYR2019.zip', DATA)
+    cache = DownloadCache(str(tmp_path / 'cache'), max_bytes=10 * len(DATA))
+    download = _Downloads(http_server, delay=0.2)
+    blobs = []
+    threads = [threading.Thread(target=lambda: blobs.append(cache.fetch(url, download))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert download.urls == [url]
+    assert len(blobs) == 4 and len(set(blobs)) == 1
@@ -0,0 +1,198 @@
+import os
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from cms_utils.convert import (
+    arrow_column_types,
+    csv_to_parquet,
+    csv_to_parquet_duckdb,
+    csv_to_parquet_duckdb_sharded,
+    RecordCounter,
+    count_records,
+    split_memory_limit,
+)
+from cms_utils.parquet_profile import sort_parquet
+from cms_utils.schemas import DTYPE_DICT_OWNRSHP
+
+DTYPES = {'Record_ID': 'int64', 'Program_Year': 'int64', 'Date_of_Payment': 'date', 'Note': str}
+
+
+def _csv(path, rows=400):
+    lines = ['"Record_ID","Program_Year","Date_of_Payment","Note"']
+    for i in range(rows):
+        year = '20x9' if i % 97 == 5 else '2019'
+        # Quoted commas and newlines, so shard boundaries must respect quoting
+        note = f'line one, {i}\nline "" two' if i % 3 else f'plain {i}'
+        lines.append(f'"{i}","{year}","{i % 12 + 1:02d}/15/2019","{note}"')
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def _rows(path):
+    with duckdb.connect() as conn:
+        return sorted(conn.execute(f"SELECT * FROM read_parquet('{path}')").fetchall())
+
+
+@pytest.mark.parametrize('part_bytes', [None, 4096])
+def test_sharded_matches_single_pass(tmp_path, part_bytes):
+    source = _csv(tmp_path / 'OP_DTL_GNRL_PGYR2019.csv')
+    single = str(tmp_path / 'single') if part_bytes else str(tmp_path / 'single.parquet')
+    expected = csv_to_parquet_duckdb(source, single, DTYPES, part_bytes=part_bytes)
+    assert expected == {'rows_read': 400, 'rows_written': 395, 'rows_rejected': 5}
+
+    sharded = str(tmp_path / 'sharded')
+    report = csv_to_parquet_duckdb_sharded(source, sharded, DTYPES, shards=4, memory_limit='1GB', threads=4,
+                                           temp_directory=str(tmp_path / 'spill'), part_bytes=part_bytes)
+    assert report == expected
+    parts = sorted(os.listdir(sharded))
+    assert {part[:len('part-0000')] for part in parts} == {f'part-{i:04d}' for i in range(4)}
+    assert _rows(f'{sharded}/*.parquet') == _rows(f'{single}/*.parquet' if part_bytes else single)
+    # Each shard's pipe and spill directory are removed
+    assert os.listdir(tmp_path / 'spill') == []
+
+
+def test_sharded_parts_keep_declared_types(tmp_path):
+    source = _csv(tmp_path / 'OP_DTL_GNRL_PGYR2019.csv')
+    csv_to_parquet_duckdb_sharded(source, str(tmp_path / 'sharded'), DTYPES, shards=3)
+    with duckdb.connect() as conn:
+        types = conn.execute(f"DESCRIBE SELECT * FROM '{tmp_path}/sharded/*.parquet'").fetchall()
+    assert [(name, column_type) for name, column_type, *_ in types] == [
+        ('Record_ID', 'BIGINT'), ('Program_Year', 'BIGINT'), ('Date_of_Payment', 'DATE'), ('Note', 'VARCHAR'),
+    ]
+
+
+def test_split_memory_limit():
+    assert split_memory_limit('4GB', 4) == '1000MB'
+    assert split_memory_limit('1GiB', 2) == '536MB'
+    assert split_memory_limit('512 MB', 3) == '170MB'
+    with pytest.raises(Exception, match='Cannot split'):
+        split_memory_limit('80%', 2)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1024 * 1024])
+def test_count_records_ignores_quoted_newlines(tmp_path, chunk_size):
+    source = _csv(tmp_path / 'OP_DTL_GNRL_PGYR2019.csv', rows=10)
+    assert count_records(source, chunk_size=chunk_size) == 11
+    # A last record without its newline still counts
+    data = (tmp_path / 'OP_DTL_GNRL_PGYR2019.csv').read_bytes().rstrip(b'\n')
+    counter = RecordCounter()
+    for start in range(0, len(data), chunk_size):
+        counter.update(data[start:start + chunk_size])
+    assert counter.total() == 11
+
+
+def test_rows_read_is_counted_from_the_file(tmp_path, caplog):
+    source = _csv(tmp_path / 'OP_DTL_GNRL_PGYR2019.csv', rows=10)
+    # A record DuckDB neither writes nor rejects, here a blank line it skips
+    with open(source, 'a') as f:
+        f.write('\n')
+    report = csv_to_parquet_duckdb(source, str(tmp_path / 'out.parquet'), DTYPES)
+    assert report == {'rows_read': 11, 'rows_written': 9, 'rows_rejected': 1}
+    assert 'neither written nor rejected' in caplog.text
+
+
+# GNRL keeps Date_of_Payment as text; as strings 01/05/2020 sorts before 12/20/2019
+TEXT_DATES = ['12/20/2019', '01/05/2020', 'not a date', '02/01/2019', '01/31/2019']
+
+
+def _dates(path):
+    with duckdb.connect() as conn:
+        return [row[0] for row in conn.execute(f"SELECT Date_of_Payment FROM read_parquet('{path}')").fetchall()]
+
+
+def test_sorted_profile_orders_text_dates_chronologically(tmp_path):
+    source = tmp_path / 'OP_DTL_GNRL_PGYR2019.csv'
+    source.write_text('"Record_ID","Date_of_Payment","Recipient_State"\n' + ''.join(
+        f'"{i}","{date}","{"NY" if i % 2 else "CA"}"\n' for i, date in enumerate(TEXT_DATES)
+    ))
+    output = str(tmp_path / 'gnrl.parquet')
+    csv_to_parquet_duckdb(str(source), output, {'Record_ID': 'int64', 'Date_of_Payment': str, 'Recipient_State': str},
+                          profile='sorted')
+    assert _dates(output) == ['01/31/2019', '02/01/2019', '12/20/2019', '01/05/2020', 'not a date']
+
+
+def test_sort_parquet_orders_text_dates_chronologically(tmp_path):
+    path = str(tmp_path / 'gnrl.parquet')
+    pq.write_table(pa.table({
+        'Date_of_Payment': TEXT_DATES,
+        'Recipient_State': ['NY', 'NY', 'NY', 'CA', 'NY'],
+    }), path)
+    sort_parquet(path, profile='sorted')
+    assert _dates(path) == ['01/31/2019', '02/01/2019', '12/20/2019', '01/05/2020', 'not a date']
+
+
+def _ownrshp_csv(path, rows=300):
+    """
+    OWNRSHP-like records whose amounts are whole numbers until the last row.
+    """
+    def value(column, dtype, i):
+        if dtype == 'int64':
+            return str(100_000 + i)
+        if dtype == 'float64':
+            return '1.5' if i == rows - 1 else str(1000 * i)
+        if column.endswith('Zip_Code'):
+            return f'{2115 + i:05d}-1234'
+        if column.endswith('Date'):
+            return '01/30/2025'
+        return f'{column.split("_")[-1]} {i % 7}, Inc.'
+
+    lines = [','.join(f'"{column}"' for column in DTYPE_DICT_OWNRSHP)]
+    for i in range(rows):
+        lines.append(','.join(f'"{value(column, dtype, i)}"' for column, dtype in DTYPE_DICT_OWNRSHP.items()))
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def _parquet_schema(path):
+    return [(column.name, column.physical_type, str(column.logical_type)) for column in pq.ParquetFile(path).schema]
+
+
+def test_ownrshp_declared_types_match_pandas(tmp_path):
+    source = _ownrshp_csv(tmp_path / 'OP_DTL_OWNRSHP_PGYR2019.csv')
+    # Inferred from the first block alone, the amounts become int64 and the last row fails
+    with pytest.raises(pa.ArrowInvalid, match='int64'):
+        csv_to_parquet(source, str(tmp_path / 'inferred.parquet'), block_size=4096)
+
+    output = str(tmp_path / 'ownrshp.parquet')
+    assert csv_to_parquet(source, output, arrow_column_types(DTYPE_DICT_OWNRSHP), block_size=4096) == 300
+    # The schema GCP_ingestion_CMS wrote when it converted OWNRSHP with pandas
+    pandas_output = str(tmp_path / 'pandas.parquet')
+    pd.read_csv(source).to_parquet(pandas_output, index=False)
+    assert _parquet_schema(output) == _parquet_schema(pandas_output)
+    assert pq.read_table(output).equals(pq.read_table(pandas_output).cast(pq.read_schema(output)))
+
+
+def test_declared_amounts_and_dates_are_parsed(tmp_path, caplog):
+    source = tmp_path / 'OP_DTL_RSRCH_PGYR2019.csv'
+    source.write_text(
+        '"Record_ID","Total_Amount_of_Payment_USDollars","Date_of_Payment"\n'
+        '"1","1234.56","01/15/2019"\n'
+        '"2"," 0.123456789 ","12/31/2019"\n'
+        '"3","","2019-02-01"\n'
+        # A decimal comma and a day past the month's end (which strptime alone would roll over to 03/02)
+        '"4","12,50","02/30/2019"\n'
+        '"5","0.0000000001",""\n'
+        '"6",".5","02/01/2019"\n'
+    )
+    dtypes = {'Record_ID': 'int64', 'Total_Amount_of_Payment_USDollars': 'decimal', 'Date_of_Payment': 'date'}
+    output = str(tmp_path / 'rsrch.parquet')
+    assert csv_to_parquet(str(source), output, arrow_column_types(dtypes)) == 6
+
+    table = pq.read_table(output)
+    assert table.schema.field('Total_Amount_of_Payment_USDollars').type == pa.decimal128(38, 9)
+    assert table.schema.field('Date_of_Payment').type == pa.date32()
+    # Amounts are exact; values that do not parse, including ones that would lose digits, are null
+    assert [str(value) if value is not None else None
+            for value in table.column('Total_Amount_of_Payment_USDollars').to_pylist()] == [
+        '1234.560000000', '0.123456789', None, None, None, '0.500000000',
+    ]
+    assert [str(value) if value is not None else None for value in table.column('Date_of_Payment').to_pylist()] == [
+        '2019-01-15', '2019-12-31', None, None, None, '2019-02-01',
+    ]
+    # Empty fields were already null and are not counted as unparsed
+    assert "2 values of Total_Amount_of_Payment_USDollars" in caplog.text
+    assert "2 values of Date_of_Payment" in caplog.text
@@ -0,0 +1,77 @@
+import duckdb
+
+from cms_utils.convert import csv_to_parquet
+from cms_utils.delta import DELTA_OP_COLUMN, build_manifest, compute_delta, manifest_publication
+
+HEADER = 'Record_ID,Change_Type,Payment_Publication_Date,Total_Amount,Note\n'
+
+PREVIOUS = HEADER + (
+    '1,NEW,01/30/2024,10.00,kept\n'
+    '2,NEW,01/30/2024,20.00,amount changes\n'
+    '3,NEW,01/30/2024,30.00,note changes\n'
+    '4,NEW,01/30/2024,40.00,deleted\n'
+    '5,NEW,01/30/2024,50.00,republished\n'
+)
+# 5 only differs in the unhashed columns, so it is unchanged
+CURRENT = HEADER + (
+    '1,NEW,01/30/2024,10.00,kept\n'
+    '2,CHANGED,06/30/2024,25.00,amount changes\n'
+    '3,CHANGED,06/30/2024,30.00,\n'
+    '5,UNCHANGED,06/30/2024,50.00,republished\n'
+    '6,ADD,06/30/2024,60.00,inserted\n'
+)
+
+
+def _dataset(tmp_path, name, text):
+    source = tmp_path / f'{name}.csv'
+    source.write_text(text)
+    output = str(tmp_path / f'{name}.parquet')
+    csv_to_parquet(str(source), output, constant_columns={'filename': f'{name}.csv'})
+    return output
+
+
+def _manifests(tmp_path):
+    previous = _dataset(tmp_path, 'previous', PREVIOUS)
+    current = _dataset(tmp_path, 'current', CURRENT)
+    build_manifest(previous, str(tmp_path / 'previous.manifest.parquet'))
+    build_manifest(current, str(tmp_path / 'current.manifest.parquet'), publication='P06302024')
+    return current, str(tmp_path / 'previous.manifest.parquet'), str(tmp_path / 'current.manifest.parquet')
+
+
+def test_build_manifest_hashes_every_record(tmp_path):
+    _, previous_manifest, current_manifest = _manifests(tmp_path)
+    with duckdb.connect() as conn:
+        rows = conn.execute(f"SELECT key, row_hash FROM '{current_manifest}' ORDER BY key").fetchall()
+    assert [key for key, _ in rows] == [1, 2, 3, 5, 6]
+    assert len({row_hash for _, row_hash in rows}) == 5
+    assert manifest_publication(current_manifest) == 'P06302024'
+    assert manifest_publication(previous_manifest) is None
+
+
+def test_compute_delta_finds_inserts_updates_and_deletes(tmp_path):
+    current, previous_manifest, current_manifest = _manifests(tmp_path)
+    output = str(tmp_path / 'delta')
+    report = compute_delta(current, previous_manifest, current_manifest, output)
+    assert report == {
+        'inserted': 1, 'updated': 2, 'deleted': 1, 'unchanged': 2,
+        'change_types': {'ADD': 1, 'CHANGED': 2},
+    }
+    with duckdb.connect() as conn:
+        rows = conn.execute(
+            f"SELECT Record_ID, {DELTA_OP_COLUMN}, Total_Amount, Note FROM '{output}/*.parquet' ORDER BY Record_ID"
+        ).fetchall()
+    # A deleted record is its key alone; an empty note is null, not unchanged
+    assert rows == [
+        (2, 'UPDATE', 25.0, 'amount changes'),
+        (3, 'UPDATE', 30.0, None),
+        (4, 'DELETE', None, None),
+        (6, 'INSERT', 60.0, 'inserted'),
+    ]
+
+
+def test_compute_delta_writes_nothing_when_unchanged(tmp_path):
+    current, _, current_manifest = _manifests(tmp_path)
+    output = tmp_path / 'delta'
+    report = compute_delta(current, current_manifest, current_manifest, str(output))
+    assert report == {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 5, 'change_types': {}}
+    assert not output.exists()
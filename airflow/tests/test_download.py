@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+from cms_utils.download import parallel_download, stream_download
+
+DATA = bytes(range(256)) * 400
+
+
+def _partial(dest, data, validator):
+    """
+    Leave what an interrupted attempt would: the first bytes in .part and the validator beside it.
+    """
+    with open(dest + '.part', 'wb') as f:
+        f.write(data)
+    with open(dest + '.part.json', 'w') as f:
+        json.dump({'url': 'ignored', 'validator': validator, 'total': len(DATA)}, f)
+
+
+def test_fresh_download(http_server, tmp_path):
+    url = http_server.serve('/PGYR2019.zip', DATA)
+    dest = str(tmp_path / 'PGYR2019.zip')
+
+    assert stream_download(url, dest, chunk_size=1000) == hashlib.sha256(DATA).hexdigest()
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
+    assert sorted(os.listdir(tmp_path)) == ['PGYR2019.zip']
+    assert 'Range' not in http_server.requests[0][2]
+
+
+def test_resumes_from_truncated_part(http_server, tmp_path):
+    url = http_server.serve('/PGYR2019.zip', DATA, etag='"v1"')
+    dest = str(tmp_path / 'PGYR2019.zip')
+    _partial(dest, DATA[:30000], '"v1"')
+
+    assert stream_download(url, dest, expected_sha256=hashlib.sha256(DATA).hexdigest()) \
+        == hashlib.sha256(DATA).hexdigest()
+    _, _, headers = http_server.requests[0]
+    assert headers['Range'] == 'bytes=30000-'
+    assert headers['If-Range'] == '"v1"'
+    assert http_server.sent == len(DATA) - 30000
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
+
+
+def test_changed_etag_restarts_from_zero(http_server, tmp_path):
+    republished = DATA[::-1]
+    url = http_server.serve('/PGYR2019.zip', republished, etag='"v2"')
+    dest = str(tmp_path / 'PGYR2019.zip')
+    _partial(dest, DATA[:30000], '"v1"')
+
+    assert stream_download(url, dest) == hashlib.sha256(republished).hexdigest()
+    assert http_server.requests[0][2]['If-Range'] == '"v1"'
+    assert http_server.sent == len(republished)
+    with open(dest, 'rb') as f:
+        assert f.read() == republished
+
+
+def test_server_ignoring_range_restarts_from_zero(http_server, tmp_path):
+    http_server.ranges = False
+    url = http_server.serve('/PGYR2019.zip', DATA)
+    dest = str(tmp_path / 'PGYR2019.zip')
+    _partial(dest, b'x' * 30000, '"v1"')
+
+    stream_download(url, dest)
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
+
+
+def test_complete_part_is_not_fetched_again(http_server, tmp_path):
+    url = http_server.serve('/PGYR2019.zip', DATA)
+    dest = str(tmp_path / 'PGYR2019.zip')
+    _partial(dest, DATA, '"v1"')
+
+    assert stream_download(url, dest) == hashlib.sha256(DATA).hexdigest()
+    assert http_server.sent == 0
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
+
+
+def test_size_mismatch_fails_and_keeps_part_for_retry(http_server, tmp_path):
+    url = http_server.serve('/PGYR2019.zip', DATA)
+    dest = str(tmp_path / 'PGYR2019.zip')
+    _partial(dest, DATA[:10000], '"v1"')
+    http_server.truncate = 15000
+
+    with pytest.raises(Exception, match='Incomplete download'):
+        stream_download(url, dest)
+    assert not os.path.exists(dest)
+    assert os.path.getsize(dest + '.part') == 15000
+
+    # The retry picks up from the bytes that did arrive
+    http_server.truncate = None
+    http_server.sent = 0
+    stream_download(url, dest)
+    assert http_server.sent == len(DATA) - 15000
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
+
+
+def test_sha256_mismatch_fails_and_discards_part(http_server, tmp_path):
+    url = http_server.serve('/PGYR2019.zip', DATA)
+    dest = str(tmp_path / 'PGYR2019.zip')
+
+    with pytest.raises(Exception, match='Checksum mismatch'):
+        stream_download(url, dest, expected_sha256='0' * 64)
+    assert os.listdir(tmp_path) == []
+
+
+def test_parallel_download_fetches_only_missing_ranges(http_server, tmp_path):
+    url = http_server.serve('/PGYR2019.zip', DATA)
+    dest = str(tmp_path / 'PGYR2019.zip')
+
+    http_server.truncate = 25000
+    with pytest.raises(Exception, match='9 of 11 ranges'):
+        parallel_download(url, dest, connections=4, range_size=10000)
+    with open(dest + '.part.json') as f:
+        assert sorted(json.load(f)['done']) == [[0, 9999], [10000, 19999]]
+
+    http_server.truncate = None
+    http_server.requests.clear()
+    assert parallel_download(url, dest, connections=4, range_size=10000) == hashlib.sha256(DATA).hexdigest()
+    ranges = sorted(headers['Range'] for method, _, headers in http_server.requests if method == 'GET')
+    assert len(ranges) == 9 and 'bytes=0-9999' not in ranges
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
+
+
+def test_parallel_download_falls_back_to_one_stream(http_server, tmp_path):
+    http_server.ranges = False
+    url = http_server.serve('/PGYR2019.zip', DATA)
+    dest = str(tmp_path / 'PGYR2019.zip')
+
+    assert parallel_download(url, dest, connections=4, range_size=10000) == hashlib.sha256(DATA).hexdigest()
+    assert [method for method, _, _ in http_server.requests] == ['HEAD', 'GET']
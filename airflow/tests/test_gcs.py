@@ -0,0 +1,222 @@
+import base64
+import hashlib
+import threading
+
+import google_crc32c
+import pytest
+
+from cms_utils.gcs import COMPOSE_LIMIT, _part_name, file_checksums, upload_dataset, upload_file
+
+PART_SIZE = 1024
+
+
+class FakeBlob:
+    """
+    In-memory stand-in for google.cloud.storage.Blob, recording every upload and compose.
+    """
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+
+    @property
+    def data(self):
+        return self.bucket.objects[self.name]
+
+    @property
+    def crc32c(self):
+        return base64.b64encode(google_crc32c.Checksum(self.data).digest()).decode()
+
+    @property
+    def md5_hash(self):
+        return base64.b64encode(hashlib.md5(self.data).digest()).decode()
+
+    def _store(self, data):
+        with self.bucket.lock:
+            if self.name in self.bucket.fail_uploads:
+                self.bucket.fail_uploads.discard(self.name)
+                raise ConnectionError(f"upload of {self.name} dropped")
+            self.bucket.objects[self.name] = data
+            self.bucket.uploads.append(self.name)
+
+    def upload_from_file(self, f, size, checksum=None, timeout=None):
+        self._store(f.read(size))
+
+    def upload_from_filename(self, path, checksum=None, timeout=None):
+        with open(path, 'rb') as f:
+            self._store(f.read())
+
+    def compose(self, sources, timeout=None):
+        assert len(sources) <= COMPOSE_LIMIT
+        data = b''.join(self.bucket.objects[source.name] for source in sources)
+        self.bucket.objects[self.name] = self.bucket.corrupt_compose(data)
+        self.bucket.composes.append((self.name, len(sources)))
+
+    def delete(self, timeout=None):
+        del self.bucket.objects[self.name]
+
+
+class FakeBucket:
+    def __init__(self):
+        self.objects = {}
+        self.uploads = []
+        self.composes = []
+        self.fail_uploads = set()
+        self.lock = threading.Lock()
+        self.corrupt_compose = lambda data: data
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def get_blob(self, name):
+        return FakeBlob(self, name) if name in self.objects else None
+
+
+class FakeClient:
+    def __init__(self):
+        self.buckets = {}
+
+    def bucket(self, name):
+        return self.buckets.setdefault(name, FakeBucket())
+
+    def list_blobs(self, bucket_name, prefix=''):
+        bucket = self.bucket(bucket_name)
+        return [FakeBlob(bucket, name) for name in sorted(bucket.objects) if name.startswith(prefix)]
+
+
+def _write(path, size, seed=0):
+    data = bytes((seed + i * 7) % 251 for i in range(size))
+    path.write_bytes(data)
+    return data
+
+
+def test_skips_when_crc32c_matches(tmp_path):
+    client = FakeClient()
+    data = _write(tmp_path / 'part-00000.parquet', 5000)
+
+    assert upload_file(client, 'lake', 'raw/a.parquet', str(tmp_path / 'part-00000.parquet'),
+                       part_size=PART_SIZE) is True
+    bucket = client.bucket('lake')
+    uploads = len(bucket.uploads)
+    assert bucket.objects == {'raw/a.parquet': data}
+
+    assert upload_file(client, 'lake', 'raw/a.parquet', str(tmp_path / 'part-00000.parquet'),
+                       part_size=PART_SIZE) is False
+    assert len(bucket.uploads) == uploads
+
+
+def test_small_file_is_one_upload(tmp_path):
+    client = FakeClient()
+    data = _write(tmp_path / 'small.parquet', PART_SIZE)
+
+    upload_file(client, 'lake', 'raw/small.parquet', str(tmp_path / 'small.parquet'), part_size=PART_SIZE)
+    bucket = client.bucket('lake')
+    assert bucket.uploads == ['raw/small.parquet']
+    assert bucket.composes == []
+    assert bucket.objects == {'raw/small.parquet': data}
+
+
+def test_multipart_upload_composes_and_cleans_up(tmp_path):
+    client = FakeClient()
+    data = _write(tmp_path / 'big.parquet', PART_SIZE * 3 + 10)
+
+    upload_file(client, 'lake', 'raw/big.parquet', str(tmp_path / 'big.parquet'), part_size=PART_SIZE)
+    bucket = client.bucket('lake')
+    assert len(bucket.uploads) == 4
+    assert bucket.composes == [('raw/big.parquet', 4)]
+    assert bucket.objects == {'raw/big.parquet': data}
+
+
+def test_more_parts_than_compose_limit_compose_in_rounds(tmp_path):
+    client = FakeClient()
+    parts = COMPOSE_LIMIT * 2 + 5
+    data = _write(tmp_path / 'big.parquet', PART_SIZE * parts - 1)
+
+    upload_file(client, 'lake', 'raw/big.parquet', str(tmp_path / 'big.parquet'), part_size=PART_SIZE)
+    bucket = client.bucket('lake')
+    assert len(bucket.uploads) == parts
+    assert bucket.composes == [
+        ('raw/big.parquet.parts/compose-0-00000', COMPOSE_LIMIT),
+        ('raw/big.parquet.parts/compose-0-00001', COMPOSE_LIMIT),
+        ('raw/big.parquet.parts/compose-0-00002', 5),
+        ('raw/big.parquet', 3),
+    ]
+    # The intermediates are deleted along with the parts
+    assert bucket.objects == {'raw/big.parquet': data}
+
+
+def test_retry_uploads_only_missing_parts(tmp_path):
+    client = FakeClient()
+    path = tmp_path / 'big.parquet'
+    data = _write(path, PART_SIZE * 6)
+    _, _, part_crcs = file_checksums(str(path), PART_SIZE)
+    names = [_part_name('raw/big.parquet', index, crc) for index, crc in enumerate(part_crcs)]
+
+    bucket = client.bucket('lake')
+    bucket.fail_uploads = {names[2], names[4]}
+    with pytest.raises(ConnectionError):
+        upload_file(client, 'lake', 'raw/big.parquet', str(path), part_size=PART_SIZE, parallelism=1)
+    assert 'raw/big.parquet' not in bucket.objects
+    landed = set(bucket.objects)
+    assert names[2] not in landed
+
+    bucket.uploads.clear()
+    assert upload_file(client, 'lake', 'raw/big.parquet', str(path), part_size=PART_SIZE) is True
+    assert sorted(bucket.uploads) == sorted(name for name in names if name not in landed)
+    assert bucket.objects == {'raw/big.parquet': data}
+
+
+def test_retry_reuploads_a_part_whose_bytes_changed(tmp_path):
+    client = FakeClient()
+    path = tmp_path / 'big.parquet'
+    _write(path, PART_SIZE * 3)
+    bucket = client.bucket('lake')
+    # A part left by an earlier run of a different file has another crc in its name
+    stale = _part_name('raw/big.parquet', 1, 'AAAAAA==')
+    bucket.objects[stale] = b'x' * PART_SIZE
+
+    upload_file(client, 'lake', 'raw/big.parquet', str(path), part_size=PART_SIZE)
+    assert len(bucket.uploads) == 3
+    assert bucket.objects['raw/big.parquet'] == path.read_bytes()
+
+
+def test_composed_crc_mismatch_raises(tmp_path):
+    client = FakeClient()
+    path = tmp_path / 'big.parquet'
+    _write(path, PART_SIZE * 3)
+    bucket = client.bucket('lake')
+    bucket.corrupt_compose = lambda data: data[:-1] + bytes([data[-1] ^ 0xFF])
+
+    with pytest.raises(Exception, match='crc32c'):
+        upload_file(client, 'lake', 'raw/big.parquet', str(path), part_size=PART_SIZE)
+    # The parts stay behind for the retry
+    assert sum(name.startswith('raw/big.parquet.parts/') for name in bucket.objects) == 3
+
+
+def test_upload_dataset_deletes_stale_objects(tmp_path):
+    client = FakeClient()
+    bucket = client.bucket('lake')
+    local = tmp_path / 'RSRCH'
+    local.mkdir()
+    kept = _write(local / 'part-00000.parquet', 100, seed=1)
+    changed = _write(local / 'part-00001.parquet', 100, seed=2)
+    bucket.objects = {
+        'raw/RSRCH/program_year=2019/part-00000.parquet': kept,
+        'raw/RSRCH/program_year=2019/part-00001.parquet': b'old bytes',
+        'raw/RSRCH/program_year=2019/part-00002.parquet': b'from a run with more parts',
+        'raw/RSRCH/program_year=2019/part-00003.parquet.parts/00000-abc': b'interrupted upload',
+        'raw/RSRCH/program_year=2020/part-00000.parquet': b'another year',
+    }
+
+    assert upload_dataset(client, 'lake', 'raw/RSRCH/program_year=2019', str(local)) == 1
+    assert bucket.uploads == ['raw/RSRCH/program_year=2019/part-00001.parquet']
+    assert bucket.objects == {
+        'raw/RSRCH/program_year=2019/part-00000.parquet': kept,
+        'raw/RSRCH/program_year=2019/part-00001.parquet': changed,
+        'raw/RSRCH/program_year=2020/part-00000.parquet': b'another year',
+    }
+
+
+def test_upload_dataset_rejects_empty_dir(tmp_path):
+    with pytest.raises(Exception, match='no parts'):
+        upload_dataset(FakeClient(), 'lake', 'raw/RSRCH/program_year=2019', str(tmp_path))
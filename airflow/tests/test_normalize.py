@@ -0,0 +1,71 @@
+import duckdb
+import pytest
+
+from cms_utils.convert import csv_to_parquet
+from cms_utils.normalize import repeated_column_groups, split_repeated_columns
+
+# Two principal investigator blocks; the second lacks State and is empty on most records
+RSRCH = (
+    'Record_ID,Program_Year,Date_of_Payment,Principal_Investigator_1_Name,Principal_Investigator_1_State,'
+    'Principal_Investigator_2_Name,Note\n'
+    '1,2019,01/15/2019,Ada,NY,Grace,first\n'
+    '2,2019,02/15/2019,Alan,,,second\n'
+    '3,2019,03/15/2019,,,,third\n'
+)
+
+
+def _dataset(tmp_path):
+    source = tmp_path / 'OP_DTL_RSRCH_PGYR2019.csv'
+    source.write_text(RSRCH)
+    dataset = str(tmp_path / 'rsrch')
+    csv_to_parquet(str(source), dataset, part_bytes=1024 ** 2)
+    return dataset
+
+
+def _rows(dataset):
+    with duckdb.connect() as conn:
+        result = conn.execute(f"SELECT * FROM '{dataset}/*.parquet' ORDER BY ALL")
+        return [column[0] for column in result.description], result.fetchall()
+
+
+def test_repeated_column_groups():
+    columns = ['Record_ID', 'PI_2_Name', 'PI_1_Name', 'PI_1_State', 'PI_10_Name', 'PI_Name']
+    assert repeated_column_groups(columns, 'PI_') == {
+        1: {'Name': 'PI_1_Name', 'State': 'PI_1_State'},
+        2: {'Name': 'PI_2_Name'},
+        10: {'Name': 'PI_10_Name'},
+    }
+
+
+def test_split_repeated_columns(tmp_path):
+    dataset = _dataset(tmp_path)
+    wide, long = str(tmp_path / 'wide'), str(tmp_path / 'long')
+    rows = split_repeated_columns(dataset, wide, long, prefix='Principal_Investigator_',
+                                  keys=['Record_ID', 'Program_Year'], index_column='pi_index',
+                                  columns=['Record_ID', 'Program_Year', 'Missing', 'Note'])
+    assert rows == (3, 3)
+    # Only the requested columns the dataset has, in the requested order
+    assert _rows(wide) == (
+        ['Record_ID', 'Program_Year', 'Note'],
+        [(1, 2019, 'first'), (2, 2019, 'second'), (3, 2019, 'third')],
+    )
+    # One row per block with a value; a field a block lacks is null
+    assert _rows(long) == (
+        ['Record_ID', 'Program_Year', 'pi_index', 'Name', 'State'],
+        [(1, 2019, 1, 'Ada', 'NY'), (1, 2019, 2, 'Grace', None), (2, 2019, 1, 'Alan', None)],
+    )
+
+
+def test_split_repeated_columns_keeps_every_other_column_by_default(tmp_path):
+    dataset = _dataset(tmp_path)
+    split_repeated_columns(dataset, str(tmp_path / 'wide'), str(tmp_path / 'long'),
+                           prefix='Principal_Investigator_', keys=['Record_ID'], index_column='pi_index')
+    columns, _ = _rows(str(tmp_path / 'wide'))
+    assert columns == ['Record_ID', 'Program_Year', 'Date_of_Payment', 'Note']
+
+
+def test_split_repeated_columns_needs_repeated_columns(tmp_path):
+    dataset = _dataset(tmp_path)
+    with pytest.raises(Exception, match='no Other_<n>_<field> columns'):
+        split_repeated_columns(dataset, str(tmp_path / 'wide'), str(tmp_path / 'long'),
+                               prefix='Other_', keys=['Record_ID'], index_column='other_index')
@@ -0,0 +1,119 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from cms_utils.archive import extract_members
+from cms_utils.download import parallel_download
+from cms_utils.remote_zip import _TAIL_SIZE, fetch_remote_member, fetch_remote_members, list_remote_members
+
+RSRCH = 'OP_DTL_RSRCH_PGYR2019_P01302025_01212025.csv'
+GNRL = 'OP_DTL_GNRL_PGYR2019_P01302025_01212025.csv'
+README = 'OP_PGYR2019_README_P01302025.txt'
+
+
+def _archive(monkeypatch=None, zip64=False):
+    """
+    A PGYR-like archive: a deflated RSRCH CSV, a stored GNRL CSV larger than the tail read, and a readme.
+    """
+    members = {
+        RSRCH: b''.join(b'"%d","2019","RSRCH row %d"\n' % (i, i) for i in range(2000)),
+        GNRL: b''.join(b'"%d","2019","GNRL row"\n' % i for i in range(10000)),
+        README: b'Open Payments 2019\n',
+    }
+    if zip64:
+        # Pushes every size and offset into the zip64 extra fields and end of central directory
+        monkeypatch.setattr(zipfile, 'ZIP64_LIMIT', 16)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(RSRCH, members[RSRCH])
+        archive.writestr(GNRL, members[GNRL], compress_type=zipfile.ZIP_STORED)
+        archive.writestr(README, members[README])
+    if zip64:
+        monkeypatch.undo()
+    return buffer.getvalue(), members
+
+
+@pytest.mark.parametrize('zip64', [False, True])
+def test_lists_central_directory(http_server, monkeypatch, zip64):
+    data, _ = _archive(monkeypatch, zip64)
+    assert (b'PK\x06\x06' in data) == zip64
+    url = http_server.serve('/PGYR2019.zip', data)
+
+    members = list_remote_members(url)
+    expected = zipfile.ZipFile(io.BytesIO(data)).infolist()
+    assert [(m.name, m.compressed_size, m.file_size, m.crc, m.header_offset, m.compress_type) for m in members] \
+        == [(i.filename, i.compress_size, i.file_size, i.CRC, i.header_offset, i.compress_type) for i in expected]
+    # Only the tail and the central directory went over the wire
+    assert http_server.sent < _TAIL_SIZE + 1024 < len(data)
+    assert all(method == 'HEAD' or 'Range' in headers for method, _, headers in http_server.requests)
+
+
+@pytest.mark.parametrize('zip64', [False, True])
+def test_fetches_members_with_crc_check(http_server, monkeypatch, tmp_path, zip64):
+    data, contents = _archive(monkeypatch, zip64)
+    url = http_server.serve('/PGYR2019.zip', data)
+
+    for member in list_remote_members(url):
+        target = tmp_path / os.path.basename(member.name)
+        fetch_remote_member(url, member, str(target), chunk_size=1000)
+        assert target.read_bytes() == contents[member.name]
+
+
+def test_crc_mismatch_fails(http_server, tmp_path):
+    data, _ = _archive()
+    url = http_server.serve('/PGYR2019.zip', data)
+    member = next(m for m in list_remote_members(url) if m.name == GNRL)
+
+    # A stored member's bytes changed in place, as a corrupt mirror would serve them
+    start = data.index(b'GNRL row')
+    http_server.serve('/PGYR2019.zip', data[:start] + b'gnrl' + data[start + 4:])
+    target = tmp_path / GNRL
+    with pytest.raises(Exception, match='Verification failed'):
+        fetch_remote_member(url, member, str(target))
+    assert os.listdir(tmp_path) == []
+
+
+def test_fetches_only_wanted_members(http_server, tmp_path):
+    data, contents = _archive()
+    url = http_server.serve('/PGYR2019.zip', data)
+
+    assert fetch_remote_members(url, str(tmp_path), ['RSRCH']) == [RSRCH]
+    assert os.listdir(tmp_path) == [RSRCH]
+    assert (tmp_path / RSRCH).read_bytes() == contents[RSRCH]
+    # The tail, the directory and RSRCH's compressed bytes; the stored GNRL member was skipped
+    rsrch = zipfile.ZipFile(io.BytesIO(data)).getinfo(RSRCH)
+    assert http_server.sent < _TAIL_SIZE + 1024 + rsrch.compress_size + 1024 < len(data)
+
+
+def test_server_ignoring_range_falls_back_to_full_download(http_server, tmp_path):
+    """
+    The steps download_and_unzip falls back through when the server ignores Range.
+
+    The DAG callable needs Airflow, so this calls its helpers in the same
+    order: the ranged fetch fails before writing anything, then the whole
+    archive downloads and its members extract.
+    """
+    data, contents = _archive()
+    http_server.ranges = False
+    url = http_server.serve('/PGYR2019.zip', data)
+
+    with pytest.raises(Exception, match='does not support HTTP Range'):
+        fetch_remote_members(url, str(tmp_path), ['RSRCH'])
+    assert os.listdir(tmp_path) == []
+
+    zip_path = str(tmp_path / 'downloaded_file.zip')
+    parallel_download(url, zip_path, connections=4)
+    assert extract_members(zip_path, str(tmp_path), ['RSRCH']) == [RSRCH]
+    assert (tmp_path / RSRCH).read_bytes() == contents[RSRCH]
+
+
+def test_server_advertising_but_ignoring_range_is_detected(http_server, tmp_path):
+    data, _ = _archive()
+    url = http_server.serve('/PGYR2019.zip', data)
+    members = list_remote_members(url)
+    http_server.ranges = False
+
+    with pytest.raises(Exception, match='does not support HTTP Range'):
+        fetch_remote_member(url, members[0], str(tmp_path / RSRCH))
@@ -0,0 +1,59 @@
+import json
+import os
+import shutil
+from collections import namedtuple
+
+import pytest
+
+from cms_utils.workspace import RESERVATION_FILE, reserve_workspace
+
+GB = 1000 ** 3
+_Usage = namedtuple('_Usage', 'total used free')
+
+
+@pytest.fixture
+def free_space(monkeypatch):
+    """
+    Pretend the disk has free_space.bytes free, whatever is written.
+    """
+    class Free:
+        bytes = 10 * GB
+    monkeypatch.setattr(shutil, 'disk_usage', lambda path: _Usage(100 * GB, 100 * GB - Free.bytes, Free.bytes))
+    return Free
+
+
+def test_reserves_when_the_disk_has_room(tmp_path, free_space):
+    workspace = str(tmp_path / 'runs' / '2019')
+    assert reserve_workspace(str(tmp_path / 'runs'), workspace, 4 * GB) == workspace
+    with open(os.path.join(workspace, RESERVATION_FILE)) as f:
+        assert json.load(f) == {'bytes': 4 * GB}
+
+
+def test_refuses_when_free_space_is_short(tmp_path, free_space):
+    workspace = str(tmp_path / 'runs' / '2019')
+    with pytest.raises(Exception, match='Not enough disk'):
+        reserve_workspace(str(tmp_path / 'runs'), workspace, 11 * GB)
+    assert not os.path.exists(workspace)
+
+
+def test_counts_other_runs_reservations(tmp_path, free_space):
+    root = str(tmp_path / 'runs')
+    reserve_workspace(root, os.path.join(root, '2018'), 6 * GB)
+    # 10 GB free, but 6 GB is promised to 2018 and not written yet
+    with pytest.raises(Exception, match='4.0 GB available'):
+        reserve_workspace(root, os.path.join(root, '2019'), 5 * GB)
+
+    # Once 2018 is cleaned up its reservation is gone
+    shutil.rmtree(os.path.join(root, '2018'))
+    reserve_workspace(root, os.path.join(root, '2019'), 5 * GB)
+
+
+def test_retry_counts_its_own_files(tmp_path, free_space):
+    root = str(tmp_path / 'runs')
+    workspace = os.path.join(root, '2019')
+    reserve_workspace(root, workspace, 1000)
+    with open(os.path.join(workspace, 'PGYR2019.zip'), 'wb') as f:
+        f.write(b'x' * 600)
+    # The first attempt's files already use part of the disk the retry needs
+    free_space.bytes = 500
+    reserve_workspace(root, workspace, 1000)
@@ -0,0 +1,136 @@
+{#
+    The program years an incremental run of fact_rsrch_all_partitioned_clustered rebuilds,
+    as one predicate per year on program_year and a literal date_of_payment range, for the
+    run's pre-hook DELETE and its SELECT. A year is rebuilt when its count of dated records
+    or its row signature (row_signature over every column target shares with source) in
+    staging differs from the table's, so a record corrected in place is picked up too; when
+    the year is only in the table, its rows are deleted; and when it is listed in
+    var('program_years'). A year's range covers its calendar year and every payment date it
+    has in staging and in the table, so the table is only cleared through partition
+    filters. Records without a date_of_payment are only rebuilt by --full-refresh.
+#}
+{% macro fact_rebuild_predicates(source, target) %}
+    {#- Also evaluated in the pre-hook of a first or --full-refresh run, when target may not exist -#}
+    {% if not (is_incremental() and execute) %}
+        {{ return([]) }}
+    {% endif %}
+
+    {% set columns = [] %}
+    {% for column in adapter.get_columns_in_relation(target) %}
+        {% if column.name | lower != 'fact_loaded_at' %}
+            {% do columns.append(column.name) %}
+        {% endif %}
+    {% endfor %}
+    {% set years_query %}
+        {% for relation in [source, target] %}
+        select
+            '{{ loop.index }}' as side,
+            program_year,
+            count(*) as records,
+            cast({{ row_signature(columns) }} as {{ dbt.type_string() }}) as signature,
+            cast(min(date_of_payment) as {{ dbt.type_string() }}) as first_payment,
+            cast(max(date_of_payment) as {{ dbt.type_string() }}) as last_payment
+        from {{ relation }}
+        {#- Every dated record, through a filter on the partition column, which target requires #}
+        where date_of_payment >= date '1900-01-01'
+        group by 2
+        {{ 'union all' if not loop.last }}
+        {% endfor %}
+    {% endset %}
+    {% set years = ({}, {}) %}
+    {% set ranges = {} %}
+    {% for row in run_query(years_query) %}
+        {% set year = row[1] | int %}
+        {% do years[(row[0] | int) - 1].update({year: (row[2] | int, row[3])}) %}
+        {% set range = ranges.get(year, (year ~ '-01-01', year ~ '-12-31')) %}
+        {% do ranges.update({year: ([range[0], row[4]] | min, [range[1], row[5]] | max)}) %}
+    {% endfor %}
+
+    {% set predicates = [] %}
+    {% for year, range in ranges.items() | sort %}
+        {% if years[0].get(year) != years[1].get(year) or year in var('program_years', []) %}
+            {% do predicates.append(
+                "(program_year = " ~ year ~ " and date_of_payment >= date '" ~ range[0]
+                ~ "' and date_of_payment <= date '" ~ range[1] ~ "')"
+            ) %}
+        {% endif %}
+    {% endfor %}
+    {{ return(predicates) }}
+{% endmacro %}
+
+
+{#
+    An order-independent signature of the rows of a group: the bitwise XOR of a hash of
+    each row's columns, so changing any value of any row changes it.
+#}
+{% macro row_signature(columns) %}
+    {{ return(adapter.dispatch('row_signature')(columns)) }}
+{% endmacro %}
+
+{% macro default__row_signature(columns) %}
+    bit_xor(hash(row({{ columns | join(', ') }})))
+{% endmacro %}
+
+{% macro bigquery__row_signature(columns) %}
+    bit_xor(farm_fingerprint(to_json_string(struct({{ columns | join(', ') }}))))
+{% endmacro %}
+
+
+{#
+    The calendar years analytical_data re-aggregates, as predicates on column
+    (payment_month for its pre-hook DELETE, date_of_payment for its SELECT): the years
+    holding fact rows written after the newest fact_loaded_at it has aggregated, and the
+    years whose count of fact records differs from the records it has aggregated, which
+    covers rows deleted from fact and years no longer in fact (whose months are then only
+    deleted). When the table is empty, every year in fact is aggregated.
+#}
+{% macro analytical_rebuild_predicates(fact, column) %}
+    {% set predicates = [] %}
+    {% if is_incremental() and execute %}
+        {% set changed_years_query %}
+            with fact_years as (
+                select
+                    extract(year from date_of_payment) as year,
+                    count(record_id) as records,
+                    max(fact_loaded_at) as fact_loaded_at
+                from {{ fact }}
+                {#- Every dated fact row, through a filter on the partition column, which fact requires #}
+                where date_of_payment >= date '1900-01-01'
+                group by 1
+            ),
+            aggregated_years as (
+                select extract(year from payment_month) as year, sum(total_records) as records
+                from {{ this }}
+                where payment_month is not null
+                group by 1
+            ),
+            aggregated as (
+                select max(fact_loaded_at) as fact_loaded_at from {{ this }}
+            )
+            select coalesce(fact_years.year, aggregated_years.year)
+            from fact_years
+            full outer join aggregated_years on fact_years.year = aggregated_years.year
+            cross join aggregated
+            where aggregated.fact_loaded_at is null
+                or fact_years.fact_loaded_at > aggregated.fact_loaded_at
+                or coalesce(fact_years.records, -1) != coalesce(aggregated_years.records, -1)
+        {% endset %}
+        {% for year in run_query(changed_years_query).columns[0].values() | map('int') | sort %}
+            {% do predicates.append(
+                "(" ~ column ~ " >= date '" ~ year ~ "-01-01' and " ~ column ~ " < date '" ~ (year + 1) ~ "-01-01')"
+            ) %}
+        {% endfor %}
+    {% endif %}
+    {{ return(predicates) }}
+{% endmacro %}
+
+
+{#
+    Pre-hook of an incremental model: delete the rows matching any of predicates, so
+    dates or months left with no rows by the rebuild do not keep stale ones.
+#}
+{% macro delete_rebuilt_rows(predicates) %}
+    {% if is_incremental() and predicates %}
+        delete from {{ this }} where {{ predicates | join(' or ') }}
+    {% endif %}
+{% endmacro %}
@@ -0,0 +1,30 @@
+{#
+    Name the smallest table that answers a dashboard query grouped or filtered by
+    dimensions and reading the metrics, from the models' config.meta.cube:
+        dbt run-operation summary_for --args '{dimensions: [recipient_state, payment_year], metrics: [total_amount_payment]}'
+    A table answers when it has all the dimensions and metrics (and the query asks for
+    what it requires); the one with the fewest rows wins. Queries no table answers go
+    to the fact table.
+#}
+{% macro summary_for(dimensions=[], metrics=[]) %}
+    {% set candidates = [] %}
+    {% for node in graph.nodes.values() if node.resource_type == 'model' and node.config.meta.get('cube') %}
+        {% set cube = node.config.meta['cube'] %}
+        {% if dimensions | reject('in', cube.dimensions) | list | length == 0
+            and metrics | reject('in', cube.metrics) | list | length == 0
+            and cube.get('requires', []) | reject('in', dimensions) | list | length == 0 %}
+            {% set relation = api.Relation.create(database=node.database, schema=node.schema, identifier=node.alias) %}
+            {% set rows = run_query('select count(*) from ' ~ relation).columns[0].values()[0] %}
+            {% do candidates.append((rows, node.name, relation)) %}
+        {% endif %}
+    {% endfor %}
+
+    {% if candidates %}
+        {% set relation = (candidates | sort | first)[2] %}
+    {% else %}
+        {% set node = graph.nodes.values() | selectattr('name', 'equalto', 'fact_rsrch_all_partitioned_clustered') | first %}
+        {% set relation = api.Relation.create(database=node.database, schema=node.schema, identifier=node.alias) %}
+    {% endif %}
+    {{ log(relation, info=True) }}
+    {{ return(relation | string) }}
+{% endmacro %}
@@ -1,14 +1,41 @@
-{{ config(materialized='table') }}
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy=('insert_overwrite' if target.type == 'bigquery' else 'append'),
+        partition_by={
+          "field": "payment_month",
+          "data_type": "date",
+          "granularity": "month"
+        },
+        cluster_by=['recipient_state', 'submitting_manufacturer_or_gpo_name'],
+        pre_hook="{{ delete_rebuilt_rows(analytical_rebuild_predicates(ref('fact_rsrch_all_partitioned_clustered'), 'payment_month')) }}"
+    )
+}}
+
+{#
+    Incremental runs re-aggregate every month of the calendar years that hold fact rows
+    written after the newest fact_loaded_at this table has aggregated (the fact table
+    rebuilds whole program years), or whose fact record count no longer matches this
+    table's. Those years are looked up first and inlined as date ranges, so only their
+    fact partitions are scanned, and the pre-hook deletes their months here first, so a
+    month or year left with no fact rows does not keep its old totals (see
+    macros/incremental_rebuild.sql).
+#}
+{% set rebuild_predicates = analytical_rebuild_predicates(ref('fact_rsrch_all_partitioned_clustered'), 'date_of_payment') %}
 
 with rsrch_data as (
     select * from {{ ref('fact_rsrch_all_partitioned_clustered') }}
+    {% if is_incremental() %}
+    where {{ rebuild_predicates | join(' or ') if rebuild_predicates else 'false' }}
+    {% endif %}
 )
     select 
         hospital_or_entity_name,
         recipient_state,
         submitting_manufacturer_or_gpo_name,
-        {{ dbt.date_trunc("month", "date_of_payment") }} as payment_month,
+        cast({{ dbt.date_trunc("month", "date_of_payment") }} as date) as payment_month,
         sum(total_amount_payment_usdollars) as total_amount_payment,
-        count(record_id) as total_records
+        count(record_id) as total_records,
+        max(fact_loaded_at) as fact_loaded_at
     from rsrch_data
     group by 1,2,3,4
\ No newline at end of file
@@ -1,6 +1,7 @@
 {{
     config(
-        materialized='table',
+        materialized='incremental',
+        incremental_strategy=('insert_overwrite' if target.type == 'bigquery' else 'append'),
         partition_by={
           "field": "date_of_payment",
           "data_type": "date",
@@ -9,10 +10,18 @@
         cluster_by=['recipient_state', 'submitting_manufacturer_or_gpo_name', 'hospital_or_entity_name'],
         options={
           "require_partition_filter": True
-        }
+        },
+        pre_hook="{{ delete_rebuilt_rows(fact_rebuild_predicates(ref('stg_rsrch_all'), this)) }}"
     )
 }}
 
+{#
+    Incremental runs rebuild only the program years that changed since the last run (see
+    macros/incremental_rebuild.sql). The pre-hook deletes those years' rows by date
+    range first, so dates whose records were all deleted or moved are cleared too; the
+    SELECT below then writes the years' current rows.
+#}
+{% set rebuild_predicates = fact_rebuild_predicates(ref('stg_rsrch_all'), this) %}
 SELECT
   record_id,
   program_year,
@@ -41,6 +50,11 @@ SELECT
   total_amount_payment_usdollars,
   date_of_payment,
   form_of_payment,
-  payment_publication_date
+  payment_publication_date,
+  -- When this run wrote the row; analytical_data re-aggregates the months of rows newer than it has seen
+  {{ dbt.current_timestamp() }} as fact_loaded_at
 FROM
-  {{ ref('stg_rsrch_all') }}
\ No newline at end of file
+  {{ ref('stg_rsrch_all') }}
+{% if is_incremental() %}
+WHERE {{ rebuild_predicates | join(' or ') if rebuild_predicates else 'false' }}
+{% endif %}
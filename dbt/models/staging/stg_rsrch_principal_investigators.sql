@@ -0,0 +1,45 @@
+{{
+    config(
+        materialized='view'
+    )
+}}
+
+with source_data as (
+
+    select * from {{ source('staging','RSRCH_PRINCIPAL_INVESTIGATORS') }}
+
+),
+
+renamed as (
+    select
+
+        cast(Record_ID as {{ dbt.type_string() }}) as record_id,
+        Program_Year as program_year,
+        pi_index,
+
+        Covered_Recipient_Type as covered_recipient_type,
+        Profile_ID as profile_id,
+        NPI as npi,
+        -- Combine first and last names, handle potential nulls
+        trim(
+            coalesce(First_Name, '') || ' ' ||
+            coalesce(Last_Name, '')
+        ) as full_name,
+        City as city,
+        State as state,
+        Zip_Code as zip_code,
+        Country as country,
+        Primary_Type_1 as primary_type_1,
+        Specialty_1 as specialty_1
+
+    from source_data
+)
+
+select * from renamed
+
+-- dbt build --select <model_name> --vars '{'is_test_run': 'false'}'
+{% if var('is_test_run', default=true) %}
+
+  limit 100
+
+{% endif %}
@@ -0,0 +1,9 @@
+{{ config(materialized='table') }}
+
+select
+    submitting_manufacturer_or_gpo_name,
+    extract(year from payment_month) as payment_year,
+    sum(total_amount_payment) as total_amount_payment,
+    sum(total_records) as total_records
+from {{ ref('analytical_data') }}
+group by 1,2
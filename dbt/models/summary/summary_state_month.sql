@@ -0,0 +1,9 @@
+{{ config(materialized='table') }}
+
+select
+    recipient_state,
+    payment_month,
+    sum(total_amount_payment) as total_amount_payment,
+    sum(total_records) as total_records
+from {{ ref('analytical_data') }}
+group by 1,2
@@ -0,0 +1,25 @@
+{{ config(materialized='table') }}
+
+-- The var('top_manufacturers') manufacturers with the largest total payment in each month
+with manufacturer_month as (
+    select
+        payment_month,
+        submitting_manufacturer_or_gpo_name,
+        sum(total_amount_payment) as total_amount_payment,
+        sum(total_records) as total_records
+    from {{ ref('analytical_data') }}
+    group by 1,2
+),
+
+ranked as (
+    select
+        *,
+        row_number() over (
+            partition by payment_month
+            order by total_amount_payment desc, submitting_manufacturer_or_gpo_name
+        ) as manufacturer_rank
+    from manufacturer_month
+)
+
+select * from ranked
+where manufacturer_rank <= {{ var('top_manufacturers', 10) }}